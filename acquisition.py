@@ -0,0 +1,796 @@
+# sciopy is imported on first use, importing it takes more than a second.
+from __future__ import annotations
+
+import dataclasses
+import logging
+import os
+import queue
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from deviceconfig import apply_config, burst_count_command, changed_fields
+from framebus import FrameBus
+from frameparser import Burst, FrameParser
+from metrics import Metrics
+from reconstruction import Reconstructor
+from replay import ReplayScioSpec, is_replay
+from runstats import OnlineStats
+from simdevice import SimulatedScioSpec, is_simulated
+from storage import WriteBehind, new_run_id, open_writer
+from workingvariables import ReconstructionConfig, StoreConfig
+
+if TYPE_CHECKING:
+    from sciopy.sciopy_dataclasses import ScioSpecMeasurementSetup
+
+logger = logging.getLogger(__name__)
+
+START_MEASUREMENT = bytearray([0xB4, 0x01, 0x01, 0xB4])
+STOP_MEASUREMENT = bytearray([0xB4, 0x01, 0x00, 0xB4])
+
+acquisition_modes = ["block", "stream"]
+
+
+def adjust_channel_group(smc: ScioSpecMeasurementSetup) -> list:
+    """
+    Depending on the number of electrodes a list of used channel groups is created.
+    # n_el = 16 -> [1]
+    # n_el = 32 -> [1, 2]
+    # n_el = 48 -> [1, 2, 3]
+    # n_el = 64 -> [1, 2, 3, 4]
+
+    Parameters
+    ----------
+    smc : ScioSpecMeasurementSetup
+        Set up dataclass
+
+    Returns
+    -------
+    list
+        list of used channel groups
+    """
+    return list(np.arange(smc.n_el // 16) + 1)
+
+
+def connect_port(port: str):
+    """
+    Open the serial connection of a port from `available_serial_ports`, a
+    simulated device, see `simdevice.parse_sim_port`, or the replay of a
+    recorded run, see `replay.parse_replay_port`.
+
+    Parameters
+    ----------
+    port : str
+        port name
+
+    Returns
+    -------
+    serial
+        a serial connection
+    """
+    if is_simulated(port):
+        ser = SimulatedScioSpec.from_port(port)
+        logger.info("Connection to %s is established.", ser.name)
+        return ser
+    if is_replay(port):
+        ser = ReplayScioSpec.from_port(port)
+        logger.info("Replaying %d samples of %s.", len(ser), ser.reader.file_name)
+        return ser
+    from sciopy import connect_COM_port
+
+    return connect_COM_port(port)
+
+
+class BlockPacer:
+    """
+    Schedules the start commands of a block measurement.
+
+    Block `i` is due `i * burst_count / framerate` seconds after the first
+    block, so a run of N bursts takes close to N / framerate seconds. A block
+    that is late starts right away and the following blocks catch up instead
+    of adding up the delay. `drift` is the delay of the latest start.
+
+    Parameters
+    ----------
+    ssms : ScioSpecMeasurementSetup
+        measurement setup
+    """
+
+    def __init__(self, ssms: ScioSpecMeasurementSetup) -> None:
+        self.period = ssms.burst_count / ssms.framerate if ssms.framerate > 0 else 0.0
+        self.t_start = None
+        self.t_block = 0.0
+        self.drift = 0.0
+        self.max_drift = 0.0
+        self.response = None
+        self.warned = False
+
+    def delay(self, i: int) -> float:
+        """
+        Seconds until block `i` is due.
+        """
+        if self.t_start is None:
+            return 0.0
+        return max(0.0, self.t_start + i * self.period - time.perf_counter())
+
+    def started(self, i: int) -> None:
+        self.t_block = time.perf_counter()
+        if self.t_start is None:
+            self.t_start = self.t_block
+        self.drift = self.t_block - (self.t_start + i * self.period)
+        self.max_drift = max(self.max_drift, self.drift)
+
+    def finished(self) -> None:
+        """
+        Measure the response time of the device from start to ready.
+        """
+        response = time.perf_counter() - self.t_block
+        # Exponential moving average, a single slow block does not dominate.
+        self.response = (
+            response if self.response is None else 0.8 * self.response + 0.2 * response
+        )
+        if self.response > 1.5 * self.period and not self.warned:
+            logger.warning(
+                f"The device needs {self.response:.3f} s per block of "
+                f"{self.period:.3f} s, the framerate can not be reached."
+            )
+            self.warned = True
+
+
+class MeasurementWorker(threading.Thread):
+    """
+    Runs the acquisition loop of a measurement on a separate thread.
+
+    The worker never touches any tkinter widget. Everything the GUI has to know
+    is put into `events` as a tuple `(kind, payload)`:
+
+    - ("progress", (done, total)) after every finished block or burst
+    - ("burst", (sample_idx, burst)) for every burst passed to the writer
+    - ("difference", (sample_idx, data)) for every stored burst after the
+      reference is complete, if `store_config.online_stats` is set
+    - ("step", (step_idx, n_steps)) before every step
+    - ("error", exception) if the loop was aborted by an exception
+    - ("done", n_samples) once the worker has finished and all queued bursts
+      are written, always the last event
+
+    Parameters
+    ----------
+    serial :
+        serial connection to the ScioSpec device
+    ssms : ScioSpecMeasurementSetup
+        measurement setup
+    store_config : StoreConfig
+        export configuration, the writer is selected by `save_format`, the
+        write-behind queue by `queue_size` and `queue_policy`. With
+        `online_stats`, running statistics of the stored bursts are saved to
+        `run_<run_id>_stats.npz`, see `runstats.OnlineStats`. With
+        `reconstruct`, the differences to the reference are reconstructed to
+        images, see `reconstruction.Reconstructor`.
+    events : queue.Queue
+        thread-safe queue the events are put into
+    mode : str
+        "block" starts and stops the device for every `burst_count` bursts,
+        "stream" starts the device once and reads the bursts as they arrive
+    run_id : str, optional
+        identifier of the run, defaults to the current time
+    start_barrier : threading.Barrier, optional
+        barrier passed before every start command, lets several devices start
+        at the same time
+    metrics : Metrics, optional
+        records counters and the latency of every stage, a new instance is
+        created if not given
+    steps : list, optional
+        setups measured one after the other into the same run, e.g. from
+        `deviceconfig.sweep_steps`. Before every step only the parameters
+        that differ from the previous step are written to the device, `ssms`
+        is the setup the device is configured with at the start.
+    resume : bool
+        continue the interrupted run `run_id` at the next sample, see
+        `storage.recover_run`. Steps that are already complete are skipped.
+    reconstruction : ReconstructionConfig, optional
+        mesh, solver and batch parameters of the reconstruction
+    frame_bus : FrameBus, optional
+        every burst passed to the writer is published to other processes, see
+        `framebus`
+    device : int
+        index of the device on the frame bus
+    """
+
+    def __init__(
+        self,
+        serial,
+        ssms: ScioSpecMeasurementSetup,
+        store_config: StoreConfig,
+        events: queue.Queue,
+        mode: str = "block",
+        run_id: str = None,
+        start_barrier: threading.Barrier = None,
+        metrics: Metrics = None,
+        steps: list = None,
+        resume: bool = False,
+        reconstruction: ReconstructionConfig = None,
+        frame_bus: FrameBus = None,
+        device: int = 0,
+    ) -> None:
+        super().__init__(name="MeasurementWorker", daemon=True)
+        if mode not in acquisition_modes:
+            raise ValueError(f"Unknown acquisition mode {mode!r}")
+        self.serial = serial
+        self.ssms = ssms
+        self.store_config = store_config
+        self.events = events
+        self.mode = mode
+        self.run_id = run_id
+        self.start_barrier = start_barrier
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.steps = steps
+        self.resume = resume
+        self.online_stats = None
+        if store_config.online_stats:
+            self.online_stats = OnlineStats(
+                (ssms.n_el, 16 * len(ssms.channel_group)),
+                reference_bursts=store_config.reference_bursts,
+            )
+        if store_config.reconstruct and (
+            self.online_stats is None or store_config.reference_bursts <= 0
+        ):
+            raise ValueError(
+                "The reconstruction needs the online statistics with reference bursts."
+            )
+        self.reconstruction = reconstruction
+        if isinstance(serial, ReplayScioSpec):
+            serial.check_setup(ssms)
+        # Setup the device is configured with, None if unknown
+        self.configured_setup = ssms
+        self.reconstructor = None
+        self.frame_bus = frame_bus
+        self.device = device
+        self.stop_event = threading.Event()
+        self.writer = None
+        self.files_offset = 0
+        self.first_offset = 0
+        self.n_stored = 0
+        self.drift = 0.0
+
+    def stop(self) -> None:
+        """
+        Request the worker to stop after the block or burst that is currently read.
+        """
+        self.stop_event.set()
+        if self.start_barrier is not None:
+            self.start_barrier.abort()
+
+    @property
+    def stopped(self) -> bool:
+        return self.stop_event.is_set()
+
+    def run(self) -> None:
+        try:
+            # Disk I/O runs on the thread of the write-behind queue.
+            self.writer = WriteBehind(
+                open_writer(
+                    self.store_config,
+                    self.ssms,
+                    self.run_id,
+                    self.metrics,
+                    resume=self.resume,
+                ),
+                maxsize=self.store_config.queue_size,
+                policy=self.store_config.queue_policy,
+                metrics=self.metrics,
+            )
+            # A resumed run continues behind the recovered samples.
+            self.files_offset = self.first_offset = self.writer.n_samples
+            run_info = self.writer.writer.info
+            run_info["mode"] = self.mode
+            if self.steps is not None:
+                run_info["steps"] = [dataclasses.asdict(step) for step in self.steps]
+            if self.store_config.reconstruct:
+                self.reconstructor = Reconstructor(
+                    self.store_config.s_path,
+                    self.writer.writer.run_id,
+                    self.reconstruction,
+                    self.metrics,
+                )
+            with self.writer:
+                self.run_steps()
+        except BaseException as err:
+            if self.start_barrier is not None:
+                # Do not leave the other devices waiting for this one.
+                self.start_barrier.abort()
+            self.events.put(("error", err))
+        finally:
+            if self.reconstructor is not None:
+                self.reconstructor.close()
+            if self.writer is not None:
+                self.n_stored = self.writer.n_samples
+            self.events.put(("done", self.n_stored))
+
+    def wait_for_start(self) -> bool:
+        """
+        Wait until all devices sharing the start barrier are ready.
+
+        Returns
+        -------
+        bool
+            False if the measurement was stopped meanwhile
+        """
+        if self.start_barrier is None:
+            return True
+        try:
+            with self.metrics.timer("barrier"):
+                self.start_barrier.wait()
+        except threading.BrokenBarrierError:
+            # Stopping all devices aborts the barrier as well.
+            if self.stop_event.wait(0.5):
+                return False
+            raise
+        return True
+
+    def store_burst(self, burst: Burst) -> None:
+        if self.files_offset == self.first_offset:
+            # Maps the device timestamps onto the host clock, see `storage.shared_time`
+            sync = {
+                "host_time_ns": time.time_ns(),
+                "timestamp_ms": int(burst.timestamps[-1]),
+            }
+            run_info = self.writer.writer.info
+            if "sync" in run_info:
+                # The device clock restarts with the resumed part of the run.
+                run_info["resumed"][-1]["sync"] = sync
+            else:
+                run_info["sync"] = sync
+        if self.frame_bus is not None:
+            # Before the writer, which may block with the policy "block"
+            with self.metrics.timer("publish"):
+                self.frame_bus.publish(self.files_offset, burst, self.device)
+        stored = self.writer.write(burst)
+        self.metrics.count("bursts")
+        self.events.put(("burst", (self.files_offset, burst)))
+        if stored and self.online_stats is not None:
+            with self.metrics.timer("stats"):
+                difference = self.online_stats.update(burst.data)
+            if difference is not None:
+                self.events.put(("difference", (self.files_offset, difference)))
+                if self.reconstructor is not None:
+                    self.reconstructor.add(
+                        self.files_offset,
+                        difference,
+                        self.online_stats.references[-1].mean,
+                    )
+        self.files_offset += 1
+
+    def run_steps(self) -> None:
+        steps = self.steps or [self.ssms]
+        for step in steps:
+            if step.n_el != self.ssms.n_el:
+                raise ValueError("All steps need the same number of electrodes.")
+        total = sum(step.total_meas_num for step in steps)
+        # One parser for the whole run keeps the offsets of a raw capture valid.
+        parser = self.new_parser()
+        sweep = []
+        configured = self.ssms
+        first_sample = 0
+        for i, step in enumerate(steps):
+            if self.stop_event.is_set():
+                break
+            done = self.files_offset - first_sample
+            if done >= step.total_meas_num:
+                # Measured before the run was resumed
+                sweep.append(
+                    {
+                        "step": i,
+                        "changes": changed_fields(self.ssms, step),
+                        "first_sample": first_sample,
+                        "n_commands": 0,
+                        "n_samples": done
+                        if i == len(steps) - 1
+                        else step.total_meas_num,
+                    }
+                )
+                first_sample += step.total_meas_num
+                continue
+            # Unknown until all commands are acknowledged
+            self.configured_setup = None
+            with self.metrics.timer("configure"):
+                n_commands = apply_config(self.serial, step, configured)
+            configured = self.configured_setup = step
+            if len(steps) > 1:
+                logger.info(
+                    f"Step {i + 1}/{len(steps)}: "
+                    f"{changed_fields(self.ssms, step)}, {n_commands} commands"
+                )
+            sweep.append(
+                {
+                    "step": i,
+                    "changes": changed_fields(self.ssms, step),
+                    "first_sample": first_sample,
+                    "n_commands": n_commands,
+                }
+            )
+            if self.online_stats is not None:
+                self.online_stats.next_step()
+            if self.reconstructor is not None:
+                self.reconstructor.next_step(step.n_el, step.inj_skip)
+            self.events.put(("step", (i, len(steps))))
+            if done:
+                logger.info(f"Resuming step {i} after {done} samples.")
+                step = dataclasses.replace(
+                    step, total_meas_num=step.total_meas_num - done
+                )
+            if self.mode == "stream":
+                self.stream(step, parser, total)
+            else:
+                self.measure(step, parser, total)
+            sweep[-1]["n_samples"] = self.files_offset - first_sample
+            first_sample = self.files_offset
+        if self.steps is not None:
+            self.writer.writer.info["sweep"] = sweep
+        if self.online_stats is not None:
+            self.save_stats()
+        if self.reconstructor is not None:
+            self.writer.writer.info["images"] = self.reconstructor.close()
+
+    def save_stats(self) -> None:
+        run_writer = self.writer.writer
+        file_name = f"run_{run_writer.run_id}_stats.npz"
+        self.online_stats.save(os.path.join(run_writer.s_path, file_name))
+        run_writer.info["stats"] = {
+            "file": file_name,
+            "reference_bursts": self.online_stats.reference_bursts,
+        }
+
+    def new_parser(self) -> FrameParser:
+        # The raw capture needs the stream offsets of the decoded frames.
+        return FrameParser(
+            self.ssms.n_el,
+            self.ssms.channel_group,
+            record_offsets=self.store_config.save_format == "raw",
+        )
+
+    def feed(self, parser: FrameParser, chunk: bytes) -> None:
+        """
+        Parse a chunk of the byte stream and store the finished bursts.
+        """
+        n_frames, n_skipped = parser.n_frames, parser.n_skipped
+        with self.metrics.timer("parse"):
+            bursts = parser.feed(chunk)
+        self.metrics.count("bytes_read", len(chunk))
+        self.metrics.count("frames", parser.n_frames - n_frames)
+        self.metrics.count("bytes_skipped", parser.n_skipped - n_skipped)
+        # Includes the time waiting for free space in the write-behind queue
+        with self.metrics.timer("enqueue"):
+            if parser.record_offsets:
+                self.writer.write_raw(chunk, parser.frame_offsets)
+                parser.frame_offsets = []
+            for burst in bursts:
+                self.store_burst(burst)
+
+    def read_block(self, parser: FrameParser, burst_count: int) -> None:
+        """
+        Start the device, read until `burst_count` bursts are complete, stop it
+        and wait until the stop command is acknowledged.
+        """
+        target = self.files_offset + burst_count
+        logger.debug("Starting measurement.")
+        self.serial.write(START_MEASUREMENT)
+        while self.files_offset < target:
+            with self.metrics.timer("read"):
+                chunk = self.serial.read(max(1, self.serial.in_waiting))
+            if not chunk:
+                logger.warning("The device did not send the complete block.")
+                break
+            self.feed(parser, chunk)
+
+        logger.debug("Stopping measurement.")
+        self.serial.write(STOP_MEASUREMENT)
+        # The device is ready as soon as it acknowledged the stop command.
+        with self.metrics.timer("ack"):
+            n_acks = parser.n_acks
+            while parser.n_acks == n_acks:
+                chunk = self.serial.read(max(1, self.serial.in_waiting))
+                if not chunk:
+                    break
+                # Frames sent until the stop command was executed are kept.
+                self.feed(parser, chunk)
+
+    def measure(
+        self, ssms: ScioSpecMeasurementSetup, parser: FrameParser, total: int
+    ) -> None:
+        n_blocks = ssms.total_meas_num // ssms.burst_count
+        pacer = BlockPacer(ssms)
+        for i in range(n_blocks):
+            with self.metrics.timer("wait"):
+                if self.stop_event.wait(pacer.delay(i)):
+                    break
+            if not self.wait_for_start():
+                break
+            pacer.started(i)
+            self.metrics.observe("drift", max(pacer.drift, 0.0))
+            self.read_block(parser, ssms.burst_count)
+            pacer.finished()
+            self.events.put(("progress", (self.files_offset, total)))
+        self.drift = pacer.drift
+        logger.info(
+            f"Block pacing: period {pacer.period:.3f} s, "
+            f"final drift {pacer.drift:.3f} s, maximum drift {pacer.max_drift:.3f} s"
+        )
+
+    def stream(
+        self, ssms: ScioSpecMeasurementSetup, parser: FrameParser, total: int
+    ) -> None:
+        n_bursts = ssms.total_meas_num
+        target = self.files_offset + n_bursts
+
+        # The device stops by itself after `n_bursts`, 0 runs until stopped.
+        self.serial.write(burst_count_command(n_bursts if n_bursts <= 0xFFFF else 0))
+        if not self.wait_for_start():
+            self.serial.write(burst_count_command(ssms.burst_count))
+            return
+        logger.info("Starting measurement.")
+        self.serial.write(START_MEASUREMENT)
+        try:
+            while self.files_offset < target and not self.stop_event.is_set():
+                # Blocks until at least one byte arrived or the serial timeout passed.
+                with self.metrics.timer("read"):
+                    chunk = self.serial.read(max(1, self.serial.in_waiting))
+                if chunk:
+                    self.feed(parser, chunk)
+                    self.events.put(("progress", (self.files_offset, total)))
+        finally:
+            logger.info("Stopping measurement.")
+            self.serial.write(STOP_MEASUREMENT)
+            self.serial.write(burst_count_command(ssms.burst_count))
+            # Drop the frames that were sent until the stop command was
+            # executed, the device is ready once both commands are acknowledged.
+            drain = FrameParser(ssms.n_el, ssms.channel_group)
+            with self.metrics.timer("ack"):
+                while drain.n_acks < 2:
+                    chunk = self.serial.read(max(1, self.serial.in_waiting))
+                    if not chunk:
+                        break
+                    drain.feed(chunk)
+
+
+def device_name(port: str) -> str:
+    """
+    Name of the subdirectory the data of a device is written to.
+    """
+    return re.sub(r"[^A-Za-z0-9_.]+", "-", os.path.basename(port)).strip("-")
+
+
+class TaggedQueue:
+    """
+    Puts the events of a worker as `(tag, event)` into a shared queue.
+    """
+
+    def __init__(self, tag, events: queue.Queue) -> None:
+        self.tag = tag
+        self.events = events
+
+    def put(self, event) -> None:
+        self.events.put((self.tag, event))
+
+
+def run_devices(
+    devices: dict,
+    ssms: ScioSpecMeasurementSetup,
+    store_config: StoreConfig,
+    mode: str = "stream",
+    configure: bool = True,
+    on_event=None,
+    subdirectories: bool = True,
+    metrics: Metrics = None,
+    steps: list = None,
+    run_id: str = None,
+    resume: bool = False,
+    reconstruction: ReconstructionConfig = None,
+    frame_bus: FrameBus = None,
+) -> dict:
+    """
+    Run the same measurement on several devices in parallel.
+
+    Every device gets its own `MeasurementWorker` and writer, all devices
+    share the run id. The devices are started together and the run
+    description of every device holds a "sync" entry to align their samples
+    afterwards, see `storage.shared_time`. A KeyboardInterrupt stops all
+    devices after the current block or burst.
+
+    Parameters
+    ----------
+    devices : dict
+        serial connections by device name, e.g. by port
+    ssms : ScioSpecMeasurementSetup
+        measurement setup of all devices
+    store_config : StoreConfig
+        export configuration
+    mode : str
+        acquisition mode, see `MeasurementWorker`
+    configure : bool
+        if true, the setup is written to all devices before the measurement
+    on_event : callable, optional
+        called with `(name, kind, payload)` for every event of a worker
+    subdirectories : bool
+        if true, the data of every device is written to the subdirectory
+        `device_name(name)` of the save path
+    metrics : Metrics, optional
+        shared by the workers of all devices, a new instance is created if not
+        given
+    steps : list, optional
+        setups measured one after the other, see `MeasurementWorker`
+    run_id : str, optional
+        identifier of the run, by default the current time
+    resume : bool
+        continue the interrupted run `run_id` on every device
+    reconstruction : ReconstructionConfig, optional
+        parameters of the reconstruction, if `store_config.reconstruct` is set
+    frame_bus : FrameBus, optional
+        publishes the stored bursts to other processes, see `framebus`
+
+    Returns
+    -------
+    dict
+        aggregated statistics of the run, the statistics of every device are
+        found under "devices"
+    """
+    setups = {name: dataclasses.replace(ssms) for name in devices}
+    if configure:
+
+        def configure_device(name):
+            apply_config(devices[name], setups[name])
+
+        with ThreadPoolExecutor(max_workers=len(devices)) as pool:
+            list(pool.map(configure_device, devices))
+
+    if metrics is None:
+        metrics = Metrics()
+    if run_id is None:
+        run_id = new_run_id()
+    start_barrier = threading.Barrier(len(devices)) if len(devices) > 1 else None
+    events = queue.Queue()
+    workers = {}
+    for name, serial in devices.items():
+        device_config = store_config
+        if subdirectories:
+            s_path = os.path.join(store_config.s_path, device_name(name), "")
+            os.makedirs(s_path, exist_ok=True)
+            device_config = dataclasses.replace(store_config, s_path=s_path)
+        workers[name] = MeasurementWorker(
+            serial,
+            setups[name],
+            device_config,
+            TaggedQueue(name, events),
+            mode=mode,
+            run_id=run_id,
+            start_barrier=start_barrier,
+            metrics=metrics,
+            steps=steps,
+            resume=resume,
+            reconstruction=reconstruction,
+            frame_bus=frame_bus,
+            device=len(workers),
+        )
+
+    errors = {}
+    durations = {}
+    t_start = time.perf_counter()
+    for worker in workers.values():
+        worker.start()
+    while len(durations) < len(workers):
+        try:
+            name, (kind, payload) = events.get(timeout=0.5)
+        except queue.Empty:
+            continue
+        except KeyboardInterrupt:
+            logger.info("Stopping measurement after the current block.")
+            for worker in workers.values():
+                worker.stop()
+            continue
+        if on_event is not None:
+            on_event(name, kind, payload)
+        if kind == "error":
+            errors[name] = payload
+        elif kind == "done":
+            durations[name] = time.perf_counter() - t_start
+    duration = time.perf_counter() - t_start
+
+    stats = {}
+    for name, worker in workers.items():
+        error = errors.get(name)
+        stats[name] = {
+            "n_samples": worker.n_stored,
+            "duration_s": durations[name],
+            "frames_per_s": worker.n_stored / durations[name],
+            "n_dropped": worker.writer.n_dropped if worker.writer else 0,
+            "max_queue_depth": worker.writer.max_depth if worker.writer else 0,
+            "compression": (
+                worker.writer.writer.info.get("compression") if worker.writer else None
+            ),
+            "stopped": worker.stopped,
+            "error": repr(error) if error is not None else None,
+        }
+    n_samples = sum(device["n_samples"] for device in stats.values())
+    return {
+        "run_id": run_id,
+        "n_samples": n_samples,
+        "duration_s": duration,
+        "frames_per_s": n_samples / duration,
+        "errors": sum(device["error"] is not None for device in stats.values()),
+        "devices": stats,
+        "metrics": metrics.snapshot(),
+    }
+
+
+def run_measurement(
+    serial,
+    ssms: ScioSpecMeasurementSetup,
+    store_config: StoreConfig,
+    mode: str = "stream",
+    configure: bool = True,
+    on_event=None,
+    metrics: Metrics = None,
+    steps: list = None,
+    run_id: str = None,
+    resume: bool = False,
+    reconstruction: ReconstructionConfig = None,
+    frame_bus: FrameBus = None,
+) -> dict:
+    """
+    Run a whole measurement without GUI and wait until all bursts are written.
+
+    The measurement runs on a `MeasurementWorker`, a KeyboardInterrupt stops it
+    after the current block or burst.
+
+    Parameters
+    ----------
+    serial :
+        serial connection to the ScioSpec device
+    ssms : ScioSpecMeasurementSetup
+        measurement setup
+    store_config : StoreConfig
+        export configuration
+    mode : str
+        acquisition mode, see `MeasurementWorker`
+    configure : bool
+        if true, the setup is written to the device before the measurement
+    on_event : callable, optional
+        called with `(kind, payload)` for every event of the worker
+    metrics : Metrics, optional
+        records counters and the latency of every stage
+    steps : list, optional
+        setups measured one after the other, see `MeasurementWorker`
+    run_id : str, optional
+        identifier of the run, by default the current time
+    resume : bool
+        continue the interrupted run `run_id`
+    reconstruction : ReconstructionConfig, optional
+        parameters of the reconstruction, if `store_config.reconstruct` is set
+    frame_bus : FrameBus, optional
+        publishes the stored bursts to other processes, see `framebus`
+
+    Returns
+    -------
+    dict
+        statistics of the run
+    """
+    stats = run_devices(
+        {serial.name: serial},
+        ssms,
+        store_config,
+        mode=mode,
+        configure=configure,
+        on_event=None if on_event is None else lambda _, *event: on_event(*event),
+        subdirectories=False,
+        metrics=metrics,
+        steps=steps,
+        run_id=run_id,
+        resume=resume,
+        reconstruction=reconstruction,
+        frame_bus=frame_bus,
+    )
+    return {**stats["devices"][serial.name], "metrics": stats["metrics"]}
@@ -0,0 +1,217 @@
+"""
+End-to-end benchmark of the acquisition pipeline against the simulated device.
+
+    python benchmarks/bench_acquisition.py --out results.json
+
+Every case runs connect -> apply_config -> measure -> parse -> save
+in a fresh process and reports:
+
+- sustained frames (bursts) per second from the start until all are written
+- latency from the device sending a burst until it is parsed and queued for
+  storage (percentiles in ms)
+- bytes written per second
+- peak resident set size of the process
+
+The sweep covers electrode counts, burst counts, acquisition modes and save
+formats. The results are written as JSON so they can be compared between
+versions.
+"""
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import queue
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_mib():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is given in bytes on macOS and in KiB on Linux
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def dir_size(path: str) -> int:
+    return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+
+
+def run_case(case: dict) -> dict:
+    """
+    Run a single benchmark case. Is executed inside a fresh process.
+    """
+    from sciopy.sciopy_dataclasses import ScioSpecMeasurementSetup
+
+    from acquisition import MeasurementWorker, connect_port
+    from deviceconfig import apply_config
+    from simdevice import SimulatedScioSpec
+    from workingvariables import StoreConfig
+
+    ssms = ScioSpecMeasurementSetup(
+        burst_count=case["burst_count"],
+        total_meas_num=case["n_frames"],
+        n_el=case["n_el"],
+        channel_group=list(np.arange(case["n_el"] // 16) + 1),
+        exc_freq=10_000,
+        framerate=case["framerate"],
+        amplitude=0.001,
+        inj_skip=0,
+        gain=1,
+        adc_range=1,
+        notes=None,
+        configured=True,
+    )
+
+    # The status messages of the acquisition are not part of the report.
+    with tempfile.TemporaryDirectory() as s_path, contextlib.redirect_stdout(
+        io.StringIO()
+    ):
+        t_connect = time.perf_counter()
+        serial = connect_port(f"SIM:speed={case['speed']},timeout=0.05")
+        assert isinstance(serial, SimulatedScioSpec)
+        serial.record_times = True
+        apply_config(serial, ssms)
+        t_configured = time.perf_counter()
+
+        events = queue.Queue()
+        worker = MeasurementWorker(
+            serial=serial,
+            ssms=ssms,
+            store_config=StoreConfig(s_path + "/", case["save_format"]),
+            events=events,
+            mode=case["mode"],
+        )
+        received = {}
+        error = None
+        t_start = time.perf_counter()
+        worker.start()
+        while True:
+            kind, payload = events.get()
+            if kind == "burst":
+                received[payload[0]] = time.perf_counter()
+            elif kind == "error":
+                error = repr(payload)
+            elif kind == "done":
+                n_stored = payload
+                break
+        duration = time.perf_counter() - t_start
+        bytes_written = dir_size(s_path)
+
+    latency = [
+        1000 * (t_parsed - serial.burst_times[idx])
+        for idx, t_parsed in received.items()
+        if idx < len(serial.burst_times)
+    ]
+    return {
+        **case,
+        "error": error,
+        "n_stored": n_stored,
+        "connect_config_s": t_configured - t_connect,
+        "duration_s": duration,
+        "frames_per_s": n_stored / duration,
+        "latency_ms": {
+            f"p{p}": float(np.percentile(latency, p)) if latency else None
+            for p in (50, 90, 99, 100)
+        },
+        "bytes_read": serial.n_bytes_sent,
+        "bytes_written": bytes_written,
+        "bytes_written_per_s": bytes_written / duration,
+        "peak_rss_mib": peak_rss_mib(),
+    }
+
+
+def git_version() -> str:
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+    except OSError:
+        return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--n-el", type=int, nargs="+", default=[16, 32, 48, 64])
+    parser.add_argument("--burst-count", type=int, nargs="+", default=[1, 10])
+    parser.add_argument("--formats", nargs="+", default=[".npz", "hdf5", "raw"])
+    parser.add_argument("--modes", nargs="+", default=["stream"])
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--framerate", type=float, default=10)
+    parser.add_argument(
+        "--speed", type=float, default=0, help="0 runs the device as fast as possible"
+    )
+    parser.add_argument("--out", default="bench_acquisition.json")
+    args = parser.parse_args()
+
+    cases = [
+        {
+            "n_el": n_el,
+            "burst_count": burst_count,
+            "save_format": save_format,
+            "mode": mode,
+            "n_frames": args.frames,
+            "framerate": args.framerate,
+            "speed": args.speed,
+        }
+        for n_el, burst_count, save_format, mode in itertools.product(
+            args.n_el, args.burst_count, args.formats, args.modes
+        )
+    ]
+
+    print(
+        f"{'n_el':>5} {'burst':>5} {'format':>7} {'mode':>7} {'frames/s':>9} "
+        f"{'p50 [ms]':>9} {'p99 [ms]':>9} {'MiB/s':>7} {'RSS [MiB]':>10}"
+    )
+    results = []
+    ctx = multiprocessing.get_context("spawn")
+    for case in cases:
+        # A fresh process per case keeps the peak RSS of the cases apart.
+        with ctx.Pool(1) as pool:
+            result = pool.apply(run_case, (case,))
+        results.append(result)
+        rss = result["peak_rss_mib"]
+        print(
+            f"{case['n_el']:>5} {case['burst_count']:>5} {case['save_format']:>7} "
+            f"{case['mode']:>7} {result['frames_per_s']:>9.1f} "
+            f"{result['latency_ms']['p50'] or float('nan'):>9.2f} "
+            f"{result['latency_ms']['p99'] or float('nan'):>9.2f} "
+            f"{result['bytes_written_per_s'] / 2**20:>7.2f} "
+            f"{rss if rss is not None else float('nan'):>10.1f}"
+            + (f"  {result['error']}" if result["error"] else "")
+        )
+
+    report = {
+        "version": git_version(),
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": np.__version__,
+        "results": results,
+    }
+    with open(args.out, "w") as file:
+        json.dump(report, file, indent=2)
+    print(f"Results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+Compression ratio and throughput of the codecs of the save format "compressed".
+
+    python benchmarks/bench_compression.py
+    python benchmarks/bench_compression.py --run data/run_<run_id>.json
+
+The bursts are taken from a recorded run or produced by the simulated device.
+They are split into chunks like in `CompressedWriter` and every available
+codec (zstd, lz4 and blosc need requirements-optional.txt) compresses them at
+several levels, with and without the byte-shuffle filter. Reported are the
+compression ratio, the throughput of a single thread and of a thread pool with
+one worker per CPU, and the decompression throughput. Simulated data is mostly noise, recorded data usually compresses
+better.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from acquisition import START_MEASUREMENT  # noqa: E402
+from compression import Codec, available_codecs  # noqa: E402
+from deviceconfig import config_commands, write_commands  # noqa: E402
+from frameparser import FrameParser  # noqa: E402
+from simdevice import SimulatedScioSpec  # noqa: E402
+from storage import load_run, setup_from_dict  # noqa: E402
+
+levels = {
+    "none": [0],
+    "zlib": [1, 6],
+    "zstd": [1, 3, 9],
+    "lz4": [0, 9],
+    "blosc": [1, 5, 9],
+}
+
+
+def simulated_chunks(n_el: int, n_bursts: int, chunk_size: int) -> list:
+    """
+    Chunks of bursts measured with the simulated device.
+    """
+    ssms = setup_from_dict(
+        {
+            "burst_count": n_bursts,
+            "total_meas_num": n_bursts,
+            "n_el": n_el,
+            "exc_freq": 10_000,
+            "framerate": 10,
+            "amplitude": 0.001,
+            "inj_skip": 0,
+            "gain": 1,
+            "adc_range": 1,
+        }
+    )
+    device = SimulatedScioSpec(speed=0, timeout=0.05)
+    write_commands(device, config_commands(ssms))
+    device.write(START_MEASUREMENT)
+    parser = FrameParser(ssms.n_el, ssms.channel_group)
+    bursts = []
+    while len(bursts) < n_bursts:
+        bursts += parser.feed(device.read(max(1, device.in_waiting)))
+    arrays = {
+        "data": np.stack([burst.data for burst in bursts]),
+        "timestamps": np.stack([burst.timestamps for burst in bursts]),
+        "excitation_stgs": np.stack([burst.excitation_stgs for burst in bursts]),
+    }
+    return split_chunks(arrays, chunk_size)
+
+
+def split_chunks(arrays: dict, chunk_size: int) -> list:
+    n_samples = len(arrays["data"])
+    return [
+        {name: array[start : start + chunk_size] for name, array in arrays.items()}
+        for start in range(0, n_samples, chunk_size)
+    ]
+
+
+def bench_codec(codec: Codec, chunks: list, n_workers: int) -> dict:
+    def compress(chunk):
+        return {name: codec.compress(array) for name, array in chunk.items()}
+
+    n_raw = sum(array.nbytes for chunk in chunks for array in chunk.values())
+
+    t_start = time.perf_counter()
+    blobs = [compress(chunk) for chunk in chunks]
+    t_single = time.perf_counter() - t_start
+
+    with ThreadPoolExecutor(n_workers) as pool:
+        t_start = time.perf_counter()
+        list(pool.map(compress, chunks))
+        t_pool = time.perf_counter() - t_start
+
+    t_start = time.perf_counter()
+    for chunk, blob in zip(chunks, blobs):
+        for name, array in chunk.items():
+            restored = codec.decompress(blob[name], array.dtype, array.shape)
+    t_decompress = time.perf_counter() - t_start
+    # The last chunk has to survive the round trip.
+    assert np.array_equal(restored, array)
+
+    n_compressed = sum(len(b) for blob in blobs for b in blob.values())
+    return {
+        **codec.to_dict(),
+        "ratio": n_raw / n_compressed,
+        "compress_mib_s": n_raw / 2**20 / t_single,
+        "pool_mib_s": n_raw / 2**20 / t_pool,
+        "decompress_mib_s": n_raw / 2**20 / t_decompress,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--run", help="run description of a recorded run")
+    parser.add_argument("--n-el", type=int, default=64)
+    parser.add_argument("--bursts", type=int, default=512)
+    parser.add_argument("--chunk-size", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--out", help="write the results as JSON")
+    args = parser.parse_args()
+
+    if args.run:
+        run = load_run(args.run)
+        arrays = {
+            "data": run.data,
+            "timestamps": run.timestamps,
+            "excitation_stgs": run.excitation_stgs,
+        }
+        chunks = split_chunks(arrays, args.chunk_size)
+    else:
+        chunks = simulated_chunks(args.n_el, args.bursts, args.chunk_size)
+    n_raw = sum(array.nbytes for chunk in chunks for array in chunk.values())
+    print(f"{len(chunks)} chunks, {n_raw / 2**20:.1f} MiB, {args.workers} workers")
+
+    print(
+        f"{'codec':>6} {'level':>5} {'shuffle':>7} {'ratio':>6} "
+        f"{'MiB/s':>8} {'pool MiB/s':>10} {'decomp MiB/s':>12}"
+    )
+    results = []
+    for name in available_codecs():
+        for level in levels[name]:
+            for shuffle in [False, True] if name != "none" else [False]:
+                result = bench_codec(Codec(name, level, shuffle), chunks, args.workers)
+                results.append(result)
+                print(
+                    f"{name:>6} {level:>5} {str(shuffle):>7} {result['ratio']:>6.2f} "
+                    f"{result['compress_mib_s']:>8.0f} {result['pool_mib_s']:>10.0f} "
+                    f"{result['decompress_mib_s']:>12.0f}"
+                )
+
+    if args.out:
+        with open(args.out, "w") as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
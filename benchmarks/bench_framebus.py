@@ -0,0 +1,127 @@
+"""
+Publishing bursts on the shared memory frame bus.
+
+    python benchmarks/bench_framebus.py --n-el 16 --bursts 20000 --subscribers 2
+
+Random bursts are published as fast as possible, once without and once with
+subscriber processes reading every burst. Reported are the p50/p99 time of a
+publication, the latency from the publication until a subscriber has copied
+the burst, the bursts the subscribers lost and whether the received values
+match the published ones.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+
+from framebus import FrameBus  # noqa: E402
+from frameparser import Burst  # noqa: E402
+from workingvariables import FrameBusConfig  # noqa: E402
+
+subscriber = """
+import json, sys, time
+import numpy as np
+from framebus import FrameSubscriber
+
+with FrameSubscriber(int(sys.argv[1])) as bus:
+    print("ready", flush=True)
+    latency, checksum, n_frames = [], 0.0, 0
+    for frame in bus.frames(timeout=5):
+        latency.append(time.time_ns() - frame.host_time_ns)
+        checksum += float(np.abs(frame.data).sum())
+        n_frames += 1
+    print(json.dumps({
+        "frames": n_frames,
+        "lost": bus.n_lost,
+        "latency_us": [np.percentile(latency, q) / 1e3 for q in (50, 99)],
+        "checksum": checksum,
+    }))
+"""
+
+
+def publish(bus: FrameBus, bursts: list, rate: float) -> np.ndarray:
+    """
+    Publish the bursts, at `rate` bursts per second or as fast as possible.
+    """
+    times = np.empty(len(bursts))
+    t_start = time.perf_counter()
+    for i, burst in enumerate(bursts):
+        if rate > 0:
+            while time.perf_counter() < t_start + i / rate:
+                pass
+        t = time.perf_counter()
+        bus.publish(i, burst)
+        times[i] = time.perf_counter() - t
+    return times
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--n-el", type=int, default=16)
+    parser.add_argument("--bursts", type=int, default=20_000)
+    parser.add_argument("--subscribers", type=int, default=2)
+    parser.add_argument(
+        "--rate", type=float, default=0, help="bursts per second, 0 is unpaced"
+    )
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    shape = (args.n_el, args.n_el)
+    bursts = [
+        Burst(
+            (rng.standard_normal(shape) + 1j * rng.standard_normal(shape)).astype(
+                np.complex64
+            ),
+            np.arange(args.n_el, dtype=np.uint32),
+            np.zeros((args.n_el, 2), dtype=np.uint8),
+        )
+        for _ in range(min(args.bursts, 1000))
+    ]
+    bursts = [bursts[i % len(bursts)] for i in range(args.bursts)]
+    checksum = sum(float(np.abs(burst.data).sum()) for burst in bursts)
+
+    with FrameBus(FrameBusConfig(port=0)) as bus:
+        times = publish(bus, bursts, args.rate)
+        p50, p99 = np.percentile(times, [50, 99]) * 1e6
+        print(f"publish, no subscribers: p50 {p50:.1f} us, p99 {p99:.1f} us")
+
+        processes = [
+            subprocess.Popen(
+                [sys.executable, "-c", subscriber, str(bus.port)],
+                cwd=root,
+                stdout=subprocess.PIPE,
+                text=True,
+            )
+            for _ in range(args.subscribers)
+        ]
+        for process in processes:
+            process.stdout.readline()
+        times = publish(bus, bursts, args.rate)
+        p50, p99 = np.percentile(times, [50, 99]) * 1e6
+        print(
+            f"publish, {args.subscribers} subscribers: "
+            f"p50 {p50:.1f} us, p99 {p99:.1f} us, "
+            f"dropped notifications {bus.n_dropped}"
+        )
+    for i, process in enumerate(processes):
+        result = json.loads(process.communicate()[0])
+        lat50, lat99 = result["latency_us"]
+        match = result["frames"] == args.bursts and np.isclose(
+            result["checksum"], checksum
+        )
+        print(
+            f"subscriber {i}: {result['frames']} bursts, lost {result['lost']}, "
+            f"latency p50 {lat50:.0f} us, p99 {lat99:.0f} us, "
+            f"values {'match' if match else 'incomplete'}"
+        )
+
+
+if __name__ == "__main__":
+    main()
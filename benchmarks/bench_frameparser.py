@@ -0,0 +1,119 @@
+"""
+Compares the raw byte `FrameParser` with the sciopy parsing path.
+
+    python benchmarks/bench_frameparser.py
+
+For every electrode count a synthetic message buffer of a block measurement is
+parsed by both paths. The sciopy path starts with the list of hexadecimal
+strings `StartStopMeasurement` returns and runs `del_hex_in_list`,
+`reshape_full_message_in_bursts` and `split_bursts_in_frames`. Run time and the
+peak memory allocated while parsing (second, traced run) are reported.
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+from sciopy import (
+    del_hex_in_list,
+    reshape_full_message_in_bursts,
+    split_bursts_in_frames,
+)
+from sciopy.sciopy_dataclasses import ScioSpecMeasurementSetup
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from frameparser import FrameParser, encode_frame  # noqa: E402
+
+n_el_poss = [16, 32, 48, 64]
+burst_count = 10
+n_channel_groups = 4  # The device sends all channel groups
+chunk_size = 4096
+
+
+def synthetic_block(n_el: int, burst_count: int) -> bytes:
+    """
+    Message buffer of a block measurement: acknowledge followed by the frames.
+    """
+    rng = np.random.default_rng(0)
+    msg = bytearray([0x18, 0x01, 0x83, 0x18])
+    timestamp = 0
+    for _ in range(burst_count):
+        for stg in range(1, n_el + 1):
+            for cg in range(1, n_channel_groups + 1):
+                values = rng.normal(size=16) + 1j * rng.normal(size=16)
+                msg += encode_frame(cg, [stg, stg % n_el + 1], timestamp, values)
+                timestamp += 1
+    return bytes(msg)
+
+
+def sciopy_path(raw: bytes, ssms: ScioSpecMeasurementSetup):
+    measurement_data_hex = [hex(b) for b in raw]
+    measurement_data = del_hex_in_list(measurement_data_hex)
+    split_measurement_data = reshape_full_message_in_bursts(measurement_data, ssms)
+    return split_bursts_in_frames(split_measurement_data, ssms)
+
+
+def frameparser_path(raw: bytes, ssms: ScioSpecMeasurementSetup):
+    parser = FrameParser(ssms.n_el, ssms.channel_group)
+    view = memoryview(raw)
+    bursts = []
+    for pos in range(0, len(raw), chunk_size):
+        bursts += parser.feed(view[pos : pos + chunk_size])
+    return bursts
+
+
+def measure(func, *args) -> tuple:
+    t_start = time.perf_counter()
+    result = func(*args)
+    duration = time.perf_counter() - t_start
+
+    # Tracing slows down the allocations, the peak is taken from a second run.
+    tracemalloc.start()
+    func(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, duration, peak
+
+
+def main() -> None:
+    print(
+        f"{'n_el':>5} {'bytes':>9} {'sciopy [s]':>11} {'parser [s]':>11} "
+        f"{'speedup':>8} {'sciopy [MiB]':>13} {'parser [MiB]':>13}"
+    )
+    for n_el in n_el_poss:
+        ssms = ScioSpecMeasurementSetup(
+            burst_count=burst_count,
+            total_meas_num=burst_count,
+            n_el=n_el,
+            channel_group=list(np.arange(n_el // 16) + 1),
+            exc_freq=10_000,
+            framerate=5,
+            amplitude=0.01,
+            inj_skip=0,
+            gain=1,
+            adc_range=1,
+            notes="None",
+            configured=True,
+        )
+        raw = synthetic_block(n_el, burst_count)
+
+        ref, t_sciopy, m_sciopy = measure(sciopy_path, raw, ssms)
+        bursts, t_parser, m_parser = measure(frameparser_path, raw, ssms)
+
+        # Both paths have to return the same channel values.
+        assert len(bursts) == len(ref) == burst_count
+        frames = [frame for frame in ref[-1] if frame.channel_group == 1]
+        for stg, frame in enumerate(frames):
+            assert bursts[-1].data[stg, 0] == frame.ch_1
+
+        print(
+            f"{n_el:>5} {len(raw):>9} {t_sciopy:>11.4f} {t_parser:>11.4f} "
+            f"{t_sciopy / t_parser:>8.1f} {m_sciopy / 2**20:>13.2f} "
+            f"{m_parser / 2**20:>13.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Random access to a recorded run with `RunReader`.
+
+    python benchmarks/bench_reader.py --bursts 100000 --format compressed
+
+A run of random bursts is written with the writer of the save format into a
+temporary directory. Reported are the time to open the run (load the index),
+to read all samples, 1000 random samples, 100 time windows of one second and
+a channel subset, and, for comparison, the time of `storage.load_run`.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from frameparser import Burst  # noqa: E402
+from runreader import RunReader  # noqa: E402
+from storage import load_run, open_writer, setup_from_dict  # noqa: E402
+from workingvariables import StoreConfig  # noqa: E402
+
+
+def write_run(s_path: str, save_format: str, n_el: int, n_bursts: int) -> str:
+    ssms = setup_from_dict(
+        {
+            "burst_count": 1,
+            "total_meas_num": n_bursts,
+            "n_el": n_el,
+            "exc_freq": 10_000,
+            "framerate": 10,
+            "amplitude": 0.001,
+            "inj_skip": 0,
+            "gain": 1,
+            "adc_range": 1,
+        }
+    )
+    rng = np.random.default_rng(0)
+    shape = (n_el, 16 * len(ssms.channel_group))
+    data = (rng.standard_normal(shape) + 1j * rng.standard_normal(shape)).astype(
+        np.complex64
+    )
+    excitation_stgs = np.stack(
+        [np.arange(1, n_el + 1), np.arange(1, n_el + 1) % n_el + 1], axis=1
+    ).astype(np.uint8)
+    with open_writer(StoreConfig(s_path, save_format), ssms, "bench") as writer:
+        for idx in range(n_bursts):
+            # Bursts at 10 fps, one excitation stage after the other
+            timestamps = 100 * idx + np.arange(n_el, dtype=np.uint32) * 100 // n_el
+            writer.write(Burst(data, timestamps.astype(np.uint32), excitation_stgs))
+    return os.path.join(s_path, "run_bench.json")
+
+
+def timed(func, *args, **kwargs) -> float:
+    t_start = time.perf_counter()
+    func(*args, **kwargs)
+    return time.perf_counter() - t_start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--format", default="compressed", dest="save_format")
+    parser.add_argument("--n-el", type=int, default=16)
+    parser.add_argument("--bursts", type=int, default=20_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as s_path:
+        t_start = time.perf_counter()
+        file_name = write_run(s_path + "/", args.save_format, args.n_el, args.bursts)
+        print(f"write {args.bursts} bursts: {time.perf_counter() - t_start:.2f} s")
+
+        rng = np.random.default_rng(1)
+        t_start = time.perf_counter()
+        with RunReader(file_name) as reader:
+            print(f"open: {time.perf_counter() - t_start:.4f} s")
+            print(f"all samples: {timed(reader.frames):.2f} s")
+            samples = rng.integers(0, len(reader), 1000)
+            t = sum(timed(reader.select, [sample]) for sample in samples)
+            print(f"1000 random samples: {t:.2f} s")
+            duration = reader.elapsed()[-1]
+            starts = rng.uniform(0, max(duration - 1, 0), 100)
+            t = sum(timed(reader.time_window, start, start + 1) for start in starts)
+            print(f"100 windows of 1 s: {t:.2f} s")
+            print(f"channels [0, 1]: {timed(reader.frames, channels=[0, 1]):.2f} s")
+            print(f"cache hits/misses: {reader.n_hits}/{reader.n_misses}")
+        print(f"load_run: {timed(load_run, file_name):.2f} s")
+
+
+if __name__ == "__main__":
+    main()
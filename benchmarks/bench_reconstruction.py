@@ -0,0 +1,64 @@
+"""
+Reconstruction of difference frames.
+
+    python benchmarks/bench_reconstruction.py --n-el 16 --bursts 2000
+
+Reported are the time to compute the reconstruction matrix with pyeit, to
+load it from the cache, and the frames per second of reconstructing the
+bursts one by one and in batches of `--batch-size` with one matrix
+multiplication each.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from reconstruction import difference_matrix, load_matrix, reconstruct  # noqa: E402
+from workingvariables import ReconstructionConfig  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--n-el", type=int, default=16)
+    parser.add_argument("--inj-skip", type=int, default=0)
+    parser.add_argument("--bursts", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=32)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        config = ReconstructionConfig(cache_dir=cache_dir)
+        t_start = time.perf_counter()
+        load_matrix(args.n_el, args.inj_skip, config)
+        print(f"compute matrix: {time.perf_counter() - t_start:.2f} s")
+        t_start = time.perf_counter()
+        matrix = load_matrix(args.n_el, args.inj_skip, config)
+        print(f"cached matrix: {time.perf_counter() - t_start:.4f} s")
+
+    rng = np.random.default_rng(0)
+    shape = (args.n_el, args.n_el)
+    reference = (1 + rng.random(shape)).astype(np.complex64)
+    differences = 0.01 * rng.standard_normal((args.bursts, *shape)).astype(np.complex64)
+    t_start = time.perf_counter()
+    weights = difference_matrix(matrix, reference)
+    print(f"difference matrix: {time.perf_counter() - t_start:.4f} s")
+
+    t_start = time.perf_counter()
+    for difference in differences:
+        reconstruct(weights, difference[np.newaxis])
+    t = time.perf_counter() - t_start
+    print(f"one by one: {args.bursts / t:.0f} frames/s")
+
+    t_start = time.perf_counter()
+    for start in range(0, args.bursts, args.batch_size):
+        reconstruct(weights, differences[start : start + args.batch_size])
+    t = time.perf_counter() - t_start
+    print(f"batches of {args.batch_size}: {args.bursts / t:.0f} frames/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Cold start of the GUI.
+
+    python benchmarks/bench_startup.py --repeat 5
+
+Every measurement runs in a fresh interpreter. Reported are the start of a bare
+interpreter, the import of the modules `main.py` imports before its window is
+shown (read from its top-level imports), and the work that is deferred until
+after the window is shown: importing sciopy, probing the serial ports and
+detecting the monitor. `main.py` logs the time until its window was shown.
+"""
+import argparse
+import ast
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+probes = {
+    "import sciopy": "import sciopy",
+    "probe ports": "from sciopy import available_serial_ports as p; p()",
+    "detect monitor": "from screeninfo import get_monitors as m; m()",
+}
+
+
+def startup_imports() -> str:
+    """
+    Top-level import statements of `main.py`.
+    """
+    with open(os.path.join(root, "main.py")) as file:
+        tree = ast.parse(file.read())
+    return "\n".join(
+        ast.unparse(node)
+        for node in tree.body
+        if isinstance(node, (ast.Import, ast.ImportFrom))
+    )
+
+
+def run(code: str, repeat: int) -> float:
+    """
+    Median wall time of `code` in a fresh interpreter, in seconds.
+    """
+    times = []
+    for _ in range(repeat):
+        t_start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, "-c", code], cwd=root, check=True, capture_output=True
+        )
+        times.append(time.perf_counter() - t_start)
+    return statistics.median(times)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    baseline = run("pass", args.repeat)
+    print(f"{'interpreter':>16}: {baseline:.3f} s")
+    t = run(startup_imports(), args.repeat)
+    print(f"{'startup imports':>16}: {t - baseline:.3f} s")
+    for name, code in probes.items():
+        try:
+            t = run(code, args.repeat)
+        except subprocess.CalledProcessError:
+            print(f"{name:>16}: failed")
+            continue
+        print(f"{name:>16}: {t - baseline:.3f} s (deferred)")
+
+
+if __name__ == "__main__":
+    main()
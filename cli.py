@@ -0,0 +1,303 @@
+"""
+Run a measurement without the GUI.
+
+    python cli.py config.json
+    python cli.py config.json --port SIM:speed=0 --frames 1000 --format hdf5
+
+The configuration is a JSON file:
+
+    {
+        "port": "COM3",
+        "mode": "stream",
+        "setup": {
+            "burst_count": 1,
+            "total_meas_num": 100,
+            "n_el": 16,
+            "exc_freq": 10000,
+            "framerate": 5,
+            "amplitude": 0.001,
+            "inj_skip": 0,
+            "gain": 1,
+            "adc_range": 1
+        },
+        "store": {"s_path": "data/", "save_format": ".npz", "online_stats": false}
+    }
+
+The "setup" holds the fields of `ScioSpecMeasurementSetup`, the amplitude is
+given in A (100 nA to 10 mA, see `deviceconfig.AMPLITUDE_MAX`). The run
+description `run_<run_id>.json` of a previous measurement can be used as
+configuration as well, it repeats the measurement with the same setup.
+
+"port" can be a list of ports to measure with several devices in parallel,
+the data of every device is written to a subdirectory named after its port.
+
+An optional "sweep" measures all combinations of the given parameter values
+one after the other into the same run, e.g.
+
+    "sweep": {"exc_freq": [100, 1000, 10000, 100000, 1000000], "inj_skip": [0, 1]}
+
+Only the parameters that change between two steps are written to the device.
+
+--profile takes the setup from a configuration profile saved in the GUI, see
+`profiles.py`:
+
+    python cli.py config.json --profile tank_16
+
+A recorded run is fed through the acquisition again without a device by
+replaying it, in real time, accelerated (speed=10) or as fast as possible
+(speed=0), e.g. to profile the processing of production data:
+
+    python cli.py data/run_<run_id>.json --port REPLAY:data/run_<run_id>.json,speed=0
+
+An interrupted run is continued at the next sample with its run description
+and --resume:
+
+    python cli.py data/run_<run_id>.json --port COM3 --resume
+
+The save format "compressed" stores the bursts in chunks compressed with
+"codec" at "compression_level", e.g.
+
+    "store": {"s_path": "data/", "save_format": "compressed", "codec": "zstd"}
+
+With --reconstruct, the difference of every burst to the reference of
+--reference is reconstructed to an image while measuring. An optional
+"reconstruction" holds the fields of `ReconstructionConfig`, e.g.
+
+    "reconstruction": {"batch_size": 64, "lamb": 0.01, "cache_dir": "cache/"}
+
+--frame-bus PORT publishes every burst to other local processes through
+shared memory, see `framebus.FrameSubscriber`.
+"""
+import argparse
+import dataclasses
+import json
+import os
+import sys
+
+from acquisition import (
+    acquisition_modes,
+    connect_port,
+    run_devices,
+    run_measurement,
+)
+from deviceconfig import sweep_steps
+from framebus import FrameBus
+from logconfig import console_handler, log_levels, setup_logging
+from metrics import Metrics, MetricsExporter
+from profiles import load_profile
+from compression import available_codecs
+from replay import ReplayScioSpec
+from storage import save_formats, setup_from_dict
+from workingvariables import (
+    FrameBusConfig,
+    LogConfig,
+    MetricsConfig,
+    ReconstructionConfig,
+    StoreConfig,
+)
+
+
+def load_config(path: str, profile: str = None) -> dict:
+    with open(path) as file:
+        config = json.load(file)
+    if profile is not None:
+        config["setup"] = load_profile(profile)
+    if "setup" not in config:
+        raise ValueError(f"{path} does not contain a measurement setup")
+    return config
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1].strip())
+    parser.add_argument("config", help="JSON configuration or run description")
+    parser.add_argument(
+        "--port",
+        nargs="+",
+        help="serial ports, e.g. COM3, SIM:speed=0 or REPLAY:data/run.json,speed=0",
+    )
+    parser.add_argument(
+        "--profile",
+        help="name or file of a configuration profile, replaces the setup",
+    )
+    parser.add_argument("--frames", type=int, help="total number of measurements")
+    parser.add_argument("--mode", choices=acquisition_modes)
+    parser.add_argument("--format", choices=save_formats, dest="save_format")
+    parser.add_argument("--out", help="directory the run is written to")
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="continue the interrupted run of the given run description",
+    )
+    parser.add_argument(
+        "--codec",
+        choices=available_codecs(),
+        help="codec of the save format compressed",
+    )
+    parser.add_argument("--level", type=int, help="compression level of the codec")
+    parser.add_argument(
+        "--reference",
+        type=int,
+        metavar="N",
+        help="compute running statistics, the first N bursts are the reference",
+    )
+    parser.add_argument(
+        "--reconstruct",
+        action="store_true",
+        help="reconstruct the differences to the reference to images",
+    )
+    parser.add_argument("--stats-json", help="write the run statistics to a file")
+    parser.add_argument("--metrics-log", help="rolling log file of the metrics")
+    parser.add_argument(
+        "--metrics-port", type=int, help="serve the metrics on localhost:PORT/metrics"
+    )
+    parser.add_argument(
+        "--frame-bus",
+        type=int,
+        metavar="PORT",
+        help="publish the bursts to shared memory, subscribers connect to PORT",
+    )
+    parser.add_argument("--log-level", choices=log_levels, default="INFO")
+    parser.add_argument("--log-file", help="rotating log file")
+    args = parser.parse_args(argv)
+
+    log_listener = setup_logging(
+        LogConfig(level=args.log_level, log_file=args.log_file),
+        handlers=[console_handler()],
+    )
+    try:
+        return measure(parser, args)
+    finally:
+        log_listener.stop()
+
+
+def measure(parser: argparse.ArgumentParser, args: argparse.Namespace) -> int:
+    config = load_config(args.config, args.profile)
+    setup = dict(config["setup"])
+    if args.frames is not None:
+        setup["total_meas_num"] = args.frames
+    ssms = setup_from_dict(setup)
+    steps = None
+    if config.get("steps"):
+        # run description of a sweep, its "sweep" entry lists the measured steps
+        steps = [setup_from_dict(step) for step in config["steps"]]
+    elif config.get("sweep"):
+        steps = sweep_steps(ssms, **config["sweep"])
+    run_id = None
+    if args.resume:
+        if "run_id" not in config:
+            parser.error("--resume needs the run description of the interrupted run")
+        run_id = config["run_id"]
+
+    store = {"s_path": "data/", "save_format": ".npz", **config.get("store", {})}
+    if config.get("save_format"):
+        # run description of a previous measurement
+        store["save_format"] = config["save_format"]
+    if config.get("compression"):
+        store["codec"] = config["compression"]["codec"]
+        store["compression_level"] = config["compression"]["level"]
+        store["shuffle"] = config["compression"]["shuffle"]
+    if args.save_format is not None:
+        store["save_format"] = args.save_format
+    if args.codec is not None:
+        store["codec"] = args.codec
+    if args.level is not None:
+        store["compression_level"] = args.level
+    if args.out is not None:
+        store["s_path"] = args.out
+    if args.resume:
+        store["s_path"] = os.path.dirname(os.path.abspath(args.config))
+    if args.reference is not None:
+        store["online_stats"] = True
+        store["reference_bursts"] = args.reference
+    if args.reconstruct:
+        if not store.get("online_stats") or store.get("reference_bursts", 0) <= 0:
+            parser.error("--reconstruct needs a reference, see --reference")
+        store["reconstruct"] = True
+    reconstruction = config.get("reconstruction")
+    if reconstruction is None and config.get("images"):
+        # run description of a previous measurement
+        reconstruction = config["images"]["reconstruction"]
+    store["s_path"] = os.path.join(store["s_path"], "")
+    os.makedirs(store["s_path"], exist_ok=True)
+    store_config = StoreConfig(**store)
+    reconstruction = ReconstructionConfig(**(reconstruction or {}))
+
+    ports = args.port or config.get("port")
+    if not ports:
+        parser.error("no port given")
+    if isinstance(ports, str):
+        ports = [ports]
+    if args.resume and len(ports) > 1:
+        parser.error("--resume continues the run of a single device")
+    mode = args.mode or config.get("mode", "stream")
+
+    metrics = Metrics()
+    exporter = MetricsExporter(
+        MetricsConfig(log_file=args.metrics_log, prometheus_port=args.metrics_port)
+    )
+    exporter.track(metrics)
+    frame_bus = None
+    if args.frame_bus is not None:
+        frame_bus = FrameBus(FrameBusConfig(port=args.frame_bus))
+    devices = {}
+    try:
+        for port in ports:
+            devices[port] = connect_port(port)
+        if len(devices) == 1:
+            (device,) = devices.values()
+            if (
+                isinstance(device, ReplayScioSpec)
+                and not device.loop
+                and args.frames is None
+                and steps is None
+            ):
+                # The replay ends with the recorded samples.
+                ssms = dataclasses.replace(
+                    ssms, total_meas_num=min(ssms.total_meas_num, len(device))
+                )
+            stats = run_measurement(
+                device,
+                ssms,
+                store_config,
+                mode=mode,
+                metrics=metrics,
+                steps=steps,
+                run_id=run_id,
+                resume=args.resume,
+                reconstruction=reconstruction,
+                frame_bus=frame_bus,
+            )
+        else:
+            stats = run_devices(
+                devices,
+                ssms,
+                store_config,
+                mode=mode,
+                metrics=metrics,
+                steps=steps,
+                reconstruction=reconstruction,
+                frame_bus=frame_bus,
+            )
+    finally:
+        for serial in devices.values():
+            serial.close()
+        exporter.close()
+        if frame_bus is not None:
+            frame_bus.close()
+
+    for key, value in stats.items():
+        if key == "metrics":
+            print(metrics.summary())
+        elif key == "devices":
+            for port, device in value.items():
+                print(f"{port}: {device}")
+        else:
+            print(f"{key}: {value}")
+    if args.stats_json:
+        with open(args.stats_json, "w") as file:
+            json.dump(stats, file, indent=2)
+    return 1 if stats.get("error") or stats.get("errors") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
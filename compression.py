@@ -0,0 +1,177 @@
+"""
+Codecs for the chunk-wise compression of stored bursts.
+
+zlib is always available. zstd, lz4 and blosc are used if the optional modules
+zstandard, lz4 and blosc are installed, see requirements-optional.txt. They
+are imported when a `Codec` of them is created, not at the start of the GUI.
+All of them release the GIL while compressing, so chunks can be compressed in
+parallel by a thread pool.
+"""
+import importlib
+import importlib.util
+import logging
+import zlib
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def shuffle(buffer: bytes, itemsize: int) -> bytes:
+    """
+    Byte-shuffle filter: store the first bytes of all items, then the second
+    bytes and so on. Slowly varying values then compress much better.
+    """
+    if itemsize == 1:
+        return bytes(buffer)
+    data = np.frombuffer(buffer, dtype=np.uint8)
+    return data.reshape(-1, itemsize).T.tobytes()
+
+
+def unshuffle(buffer: bytes, itemsize: int) -> bytes:
+    """
+    Inverse of `shuffle`.
+    """
+    if itemsize == 1:
+        return bytes(buffer)
+    data = np.frombuffer(buffer, dtype=np.uint8)
+    return data.reshape(itemsize, -1).T.tobytes()
+
+
+def zstd_compress(buffer: bytes, level: int) -> bytes:
+    import zstandard
+
+    # Compressor objects must not be shared between threads.
+    return zstandard.ZstdCompressor(level=level).compress(buffer)
+
+
+def zstd_decompress(buffer: bytes) -> bytes:
+    import zstandard
+
+    return zstandard.ZstdDecompressor().decompress(buffer)
+
+
+def lz4_compress(buffer: bytes, level: int) -> bytes:
+    import lz4.frame
+
+    return lz4.frame.compress(buffer, compression_level=level)
+
+
+def lz4_decompress(buffer: bytes) -> bytes:
+    import lz4.frame
+
+    return lz4.frame.decompress(buffer)
+
+
+def blosc_compress(buffer: bytes, level: int, itemsize: int, shuffle: bool) -> bytes:
+    import blosc
+
+    return blosc.compress(
+        buffer,
+        typesize=itemsize,
+        clevel=level,
+        shuffle=blosc.SHUFFLE if shuffle else blosc.NOSHUFFLE,
+        cname="zstd",
+    )
+
+
+def blosc_decompress(buffer: bytes) -> bytes:
+    import blosc
+
+    return blosc.decompress(buffer)
+
+
+# name: (module, compress, decompress, default level, level range)
+codecs = {
+    "none": (None, None, None, 0, (0, 0)),
+    "zlib": ("zlib", zlib.compress, zlib.decompress, 1, (0, 9)),
+    "zstd": ("zstandard", zstd_compress, zstd_decompress, 3, (-7, 22)),
+    "lz4": ("lz4.frame", lz4_compress, lz4_decompress, 0, (0, 16)),
+    "blosc": ("blosc", blosc_compress, blosc_decompress, 5, (0, 9)),
+}
+
+
+def available_codecs() -> list:
+    """
+    Names of the codecs whose modules are installed, found without importing
+    them.
+    """
+    return [
+        name
+        for name, (module, *_) in codecs.items()
+        if module is None
+        or importlib.util.find_spec(module.partition(".")[0]) is not None
+    ]
+
+
+class Codec:
+    """
+    Compresses arrays with a codec of `codecs`.
+
+    Before compressing, the bytes are byte-shuffled with the size of the scalar
+    values, complex values are shuffled as pairs of floats. blosc brings its
+    own shuffle filter.
+
+    Parameters
+    ----------
+    name : str
+        codec name, see `available_codecs`
+    level : int, optional
+        compression level, by default the default level of the codec
+    shuffle : bool
+        apply the byte-shuffle filter
+    """
+
+    def __init__(self, name: str = "zlib", level: int = None, shuffle: bool = True):
+        if name not in codecs:
+            raise ValueError(f"Unknown codec {name!r}")
+        module, self._compress, self._decompress, default, (low, high) = codecs[name]
+        if module is not None:
+            try:
+                importlib.import_module(module)
+            except ImportError:
+                raise ImportError(
+                    f"The module {module} of the codec {name} is not installed, "
+                    "see requirements-optional.txt."
+                ) from None
+        if level is None:
+            level = default
+        if not low <= level <= high:
+            raise ValueError(f"Level {level} of {name} outside of [{low}, {high}]")
+        self.name = name
+        self.level = level
+        self.shuffle = shuffle
+
+    def __repr__(self) -> str:
+        return f"Codec({self.name!r}, level={self.level}, shuffle={self.shuffle})"
+
+    @staticmethod
+    def itemsize(dtype: np.dtype) -> int:
+        dtype = np.dtype(dtype)
+        if dtype.kind == "c":
+            return dtype.itemsize // 2
+        return dtype.itemsize
+
+    def compress(self, array: np.ndarray) -> bytes:
+        buffer = np.ascontiguousarray(array).tobytes()
+        itemsize = self.itemsize(array.dtype)
+        if self.name == "none":
+            return buffer
+        if self.name == "blosc":
+            return self._compress(buffer, self.level, itemsize, self.shuffle)
+        if self.shuffle:
+            buffer = shuffle(buffer, itemsize)
+        return self._compress(buffer, self.level)
+
+    def decompress(self, buffer: bytes, dtype, shape: tuple) -> np.ndarray:
+        """
+        Array of type `dtype` and shape `shape` compressed by `compress`.
+        """
+        if self.name != "none":
+            buffer = self._decompress(buffer)
+            if self.shuffle and self.name != "blosc":
+                buffer = unshuffle(buffer, self.itemsize(dtype))
+        return np.frombuffer(buffer, dtype=dtype).reshape(shape)
+
+    def to_dict(self) -> dict:
+        return {"codec": self.name, "level": self.level, "shuffle": self.shuffle}
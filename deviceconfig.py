@@ -0,0 +1,241 @@
+"""
+Commands to configure a ScioSpec device, one builder per parameter.
+
+`config_commands` returns the command sequence of
+`sciopy.set_measurement_config`, `diff_commands` only the commands of the
+parameters that differ between two setups. Unlike sciopy, the amplitude is
+always taken in A and never rescaled; every path that configures a device goes
+through `apply_config`.
+"""
+# Importing sciopy takes more than a second, the setup is only needed for the
+# type annotations.
+from __future__ import annotations
+
+import itertools
+import struct
+from dataclasses import asdict, replace
+from typing import TYPE_CHECKING, List
+
+from frameparser import ACK
+
+if TYPE_CHECKING:
+    from sciopy.sciopy_dataclasses import ScioSpecMeasurementSetup
+
+adc_ranges = {1: 0x01, 5: 0x02, 10: 0x03}
+gains = {1: 0x00, 10: 0x01, 100: 0x02, 1_000: 0x03}
+
+# Excitation amplitude range of the device in A
+AMPLITUDE_MIN = 100e-9
+AMPLITUDE_MAX = 10e-3
+
+# Changing these parameters resets the measurement setup of the device and
+# requires the complete configuration.
+reset_fields = ["n_el", "inj_skip"]
+
+
+def reset_setup() -> bytes:
+    return bytes([0xB0, 0x01, 0x01, 0xB0])
+
+
+def burst_count_command(burst_count: int) -> bytes:
+    """
+    Number of bursts after a start command, 0 measures until the stop command.
+    """
+    return bytes([0xB0, 0x03, 0x02, burst_count >> 8, burst_count & 0xFF, 0xB0])
+
+
+def amplitude_command(amplitude: float) -> bytes:
+    """
+    Excitation amplitude in A, double precision.
+    """
+    if not AMPLITUDE_MIN <= amplitude <= AMPLITUDE_MAX:
+        raise ValueError(
+            f"Amplitude {amplitude} A outside of [{AMPLITUDE_MIN}, {AMPLITUDE_MAX}] A"
+        )
+    return bytes([0xB0, 0x09, 0x05]) + struct.pack(">d", amplitude) + bytes([0xB0])
+
+
+def adc_range_command(adc_range: int) -> bytes:
+    """
+    ADC range of +/-1, +/-5 or +/-10 V.
+    """
+    return bytes([0xB0, 0x02, 0x0D, adc_ranges[adc_range], 0xB0])
+
+
+def gain_command(gain: int) -> bytes:
+    return bytes([0xB0, 0x03, 0x09, 0x01, gains[gain], 0xB0])
+
+
+def framerate_command(framerate: float) -> bytes:
+    return bytes([0xB0, 0x05, 0x03]) + struct.pack(">f", framerate) + bytes([0xB0])
+
+
+def frequency_command(exc_freq: float) -> bytes:
+    """
+    Single excitation frequency in Hz: [CT] 0C 04 [fmin] [fmax] [fcount] [ftype] [CT]
+    """
+    f = struct.pack(">f", exc_freq)
+    return bytes([0xB0, 0x0C, 0x04]) + f + f + bytes([0x00, 0x01, 0x00, 0xB0])
+
+
+def injection_commands(n_el: int, inj_skip: int) -> List[bytes]:
+    commands = []
+    for v_el in range(1, n_el + 1):
+        g_el = (v_el + inj_skip) % n_el + 1
+        commands.append(bytes([0xB0, 0x03, 0x06, v_el, g_el, 0xB0]))
+    return commands
+
+
+parameter_commands = {
+    "burst_count": burst_count_command,
+    "amplitude": amplitude_command,
+    "adc_range": adc_range_command,
+    "gain": gain_command,
+    "framerate": framerate_command,
+    "exc_freq": frequency_command,
+}
+
+
+def config_commands(ssms: ScioSpecMeasurementSetup) -> List[bytes]:
+    """
+    All commands to configure the device.
+    """
+    return [
+        reset_setup(),
+        burst_count_command(ssms.burst_count),
+        amplitude_command(ssms.amplitude),
+        adc_range_command(ssms.adc_range),
+        gain_command(ssms.gain),
+        # Single ended mode
+        bytes([0xB0, 0x03, 0x08, 0x01, 0x01, 0xB0]),
+        # Excitation switch type
+        bytes([0xB0, 0x02, 0x0C, 0x01, 0xB0]),
+        framerate_command(ssms.framerate),
+        frequency_command(ssms.exc_freq),
+        *injection_commands(ssms.n_el, ssms.inj_skip),
+        # Get measurement setup
+        bytes([0xB1, 0x01, 0x03, 0xB1]),
+        # Output configuration
+        bytes([0xB2, 0x02, 0x01, 0x01, 0xB2]),
+        bytes([0xB2, 0x02, 0x03, 0x01, 0xB2]),
+        bytes([0xB2, 0x02, 0x02, 0x01, 0xB2]),
+    ]
+
+
+def changed_fields(
+    old: ScioSpecMeasurementSetup, new: ScioSpecMeasurementSetup
+) -> dict:
+    """
+    Parameters of `new` that differ from `old`.
+    """
+    old, new = asdict(old), asdict(new)
+    return {
+        name: new[name]
+        for name in [*parameter_commands, *reset_fields]
+        if old[name] != new[name]
+    }
+
+
+def diff_commands(
+    old: ScioSpecMeasurementSetup, new: ScioSpecMeasurementSetup
+) -> List[bytes]:
+    """
+    Commands to change the configuration of the device from `old` to `new`.
+
+    Parameters
+    ----------
+    old : ScioSpecMeasurementSetup
+        setup the device is configured with, None if unknown
+    new : ScioSpecMeasurementSetup
+        setup to configure
+
+    Returns
+    -------
+    List[bytes]
+        commands, all commands of `config_commands` if a parameter of
+        `reset_fields` changed or the old setup is unknown
+    """
+    if old is None:
+        return config_commands(new)
+    changes = changed_fields(old, new)
+    if any(name in changes for name in reset_fields):
+        return config_commands(new)
+    return [
+        build(changes[name])
+        for name, build in parameter_commands.items()
+        if name in changes
+    ]
+
+
+def write_commands(serial, commands: List[bytes]) -> int:
+    """
+    Write the commands and read until every command is acknowledged or the
+    serial timeout passes without data.
+
+    Returns
+    -------
+    int
+        number of acknowledged commands
+    """
+    for command in commands:
+        serial.write(command)
+    received = bytearray()
+    while received.count(ACK) < len(commands):
+        chunk = serial.read(max(1, serial.in_waiting))
+        if not chunk:
+            break
+        received += chunk
+    return received.count(ACK)
+
+
+def apply_config(
+    serial, new: ScioSpecMeasurementSetup, old: ScioSpecMeasurementSetup = None
+) -> int:
+    """
+    Configure the device with `new`, only writing the parameters that differ
+    from `old`.
+
+    Returns
+    -------
+    int
+        number of written commands
+    """
+    commands = diff_commands(old, new)
+    n_acks = write_commands(serial, commands)
+    if n_acks < len(commands):
+        raise TimeoutError(
+            f"Only {n_acks} of {len(commands)} configuration commands acknowledged."
+        )
+    return len(commands)
+
+
+def sweep_steps(base: ScioSpecMeasurementSetup, **grid) -> list:
+    """
+    Setups of all combinations of the given parameter values.
+
+    Parameters of `reset_fields` vary slowest, so the complete configuration
+    is written as rarely as possible. Example:
+
+        sweep_steps(ssms, exc_freq=np.geomspace(100, 1e6, 9), inj_skip=[0, 1])
+
+    Parameters
+    ----------
+    base : ScioSpecMeasurementSetup
+        setup the other parameters are taken from
+    **grid :
+        lists of values by parameter name
+
+    Returns
+    -------
+    list
+        one `ScioSpecMeasurementSetup` per step
+    """
+    # The number of electrodes is fixed, it defines the shape of the samples.
+    unknown = set(grid) - set(parameter_commands) - {"inj_skip"}
+    if unknown:
+        raise ValueError(f"Parameters can not be swept: {', '.join(sorted(unknown))}")
+    names = sorted(grid, key=lambda name: name not in reset_fields)
+    return [
+        replace(base, **dict(zip(names, values)))
+        for values in itertools.product(*(list(grid[name]) for name in names))
+    ]
@@ -0,0 +1,434 @@
+"""
+Live bursts for other local processes.
+
+`FrameBus` publishes every stored burst into a ring buffer of
+`FrameBusConfig.n_slots` slots in shared memory. Every slot has a header with
+the sequence number, the sample, the device, the device timestamp, the host
+time and the shape of the burst, followed by the complex64 channel values.
+Slots are sized for the largest setup (64 electrodes), so the bus outlives
+changes of the setup. A subscriber connects to the local TCP port of the bus,
+receives a JSON line describing the shared memory and then the sequence
+number of every published burst as 8 byte little-endian integer:
+
+    with FrameSubscriber(5600) as bus:
+        for frame in bus.frames():
+            print(frame.sample, frame.data.shape)
+
+The producer never waits for subscribers. A notification that does not fit
+into the socket buffer of a slow subscriber is dropped, and a slot is
+overwritten after `n_slots` newer bursts. Subscribers detect both by the
+sequence numbers: the sequence number of a slot is set to 0 while it is
+written, so a read is valid if the sequence number is unchanged afterwards.
+`FrameSubscriber.view` maps a slot without copying for consumers that check
+`FrameSubscriber.valid` after they are done with it.
+"""
+import json
+import logging
+import os
+import socket
+import struct
+import threading
+import time
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from frameparser import Burst
+from workingvariables import FrameBusConfig
+
+logger = logging.getLogger(__name__)
+
+FRAME_BUS_VERSION = 1
+HOST = "127.0.0.1"
+
+# Largest burst: 64 electrodes with 4 channel groups of 16 channels
+MAX_SHAPE = (64, 64)
+SLOT_DATA_SIZE = MAX_SHAPE[0] * MAX_SHAPE[1] * np.dtype(np.complex64).itemsize
+
+bus_dtype = np.dtype(
+    {
+        "names": ["magic", "version", "n_slots", "slot_size", "write_seq"],
+        "formats": ["S4", "<u4", "<u4", "<u8", "<u8"],
+        "offsets": [0, 4, 8, 16, 24],
+        "itemsize": 64,
+    }
+)
+slot_dtype = np.dtype(
+    {
+        "names": [
+            "seq",
+            "sample",
+            "host_time_ns",
+            "timestamp",
+            "device",
+            "n_el",
+            "n_channels",
+        ],
+        "formats": ["<u8", "<u8", "<i8", "<u4", "<u2", "<u2", "<u2"],
+        "offsets": [0, 8, 16, 24, 28, 30, 32],
+        "itemsize": 64,
+    }
+)
+SLOT_SIZE = slot_dtype.itemsize + SLOT_DATA_SIZE
+MAGIC = b"SSFB"
+notification = struct.Struct("<Q")
+
+
+def map_slots(buffer, n_slots: int) -> tuple:
+    """
+    Header, slot headers and slot data inside the shared memory.
+    """
+    header = np.ndarray((), dtype=bus_dtype, buffer=buffer)
+    slots = np.ndarray(
+        n_slots,
+        dtype=slot_dtype,
+        buffer=buffer,
+        offset=bus_dtype.itemsize,
+        strides=(SLOT_SIZE,),
+    )
+    data = np.ndarray(
+        (n_slots, SLOT_DATA_SIZE),
+        dtype=np.uint8,
+        buffer=buffer,
+        offset=bus_dtype.itemsize + slot_dtype.itemsize,
+        strides=(SLOT_SIZE, 1),
+    )
+    return header, slots, data
+
+
+@dataclass
+class Frame:
+    """
+    A burst read from the frame bus.
+
+    Parameters
+    ----------
+    seq : int
+        sequence number, counts all published bursts from 1
+    sample : int
+        sample of the burst in its run
+    device : int
+        index of the device of the burst
+    timestamp : int
+        device timestamp of the last excitation stage in milli seconds
+    host_time_ns : int
+        host time of the publication in nano seconds since the epoch
+    data : np.ndarray
+        complex channel values, shape (n_el, n_channels)
+    """
+
+    seq: int
+    sample: int
+    device: int
+    timestamp: int
+    host_time_ns: int
+    data: np.ndarray
+
+
+class FrameBus:
+    """
+    Publishes bursts into a shared memory ring buffer, see the module
+    docstring.
+
+    Parameters
+    ----------
+    config : FrameBusConfig
+        name of the shared memory, port of the notifications (0 selects a free
+        port) and number of slots
+
+    Raises
+    ------
+    FileExistsError
+        if a shared memory of the name exists, it is never removed because it
+        may belong to another producer
+    """
+
+    def __init__(self, config: FrameBusConfig) -> None:
+        self.config = config
+        self.server = socket.create_server((HOST, config.port))
+        self.port = self.server.getsockname()[1]
+        # Subscribers learn the name from the hello line, it only has to be
+        # unique among the running producers.
+        name = config.name or f"sciospec_frames_{os.getpid()}_{self.port}"
+        size = bus_dtype.itemsize + config.n_slots * SLOT_SIZE
+        try:
+            self.shm = shared_memory.SharedMemory(name, create=True, size=size)
+        except FileExistsError:
+            self.server.close()
+            raise FileExistsError(
+                f"The shared memory {name} exists, another frame bus uses the name "
+                "or a crashed producer left it behind."
+            ) from None
+        self.header, self.slots, self.data = map_slots(self.shm.buf, config.n_slots)
+        self.slots["seq"] = 0
+        self.header["magic"] = MAGIC
+        self.header["version"] = FRAME_BUS_VERSION
+        self.header["n_slots"] = config.n_slots
+        self.header["slot_size"] = SLOT_DATA_SIZE
+        self.header["write_seq"] = 0
+        self.seq = 0
+        self.lock = threading.Lock()
+        self.n_dropped = 0
+
+        self.subscribers = []
+        self.subscribers_lock = threading.Lock()
+        self.hello = (
+            json.dumps(
+                {
+                    "version": FRAME_BUS_VERSION,
+                    "name": self.shm.name,
+                    "n_slots": config.n_slots,
+                }
+            )
+            + "\n"
+        ).encode()
+        threading.Thread(target=self.accept, name="FrameBus", daemon=True).start()
+        logger.info(
+            f"Publishing bursts to shared memory {self.shm.name}, "
+            f"notifications on {HOST}:{self.port}"
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def accept(self) -> None:
+        while True:
+            try:
+                connection, _ = self.server.accept()
+            except OSError:
+                # closed
+                return
+            try:
+                connection.sendall(self.hello)
+                connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                connection.setblocking(False)
+            except OSError:
+                connection.close()
+                continue
+            with self.subscribers_lock:
+                self.subscribers.append(connection)
+
+    @property
+    def n_subscribers(self) -> int:
+        return len(self.subscribers)
+
+    def publish(self, sample: int, burst: Burst, device: int = 0) -> int:
+        """
+        Copy a burst into the next slot and notify the subscribers.
+
+        Parameters
+        ----------
+        sample : int
+            sample of the burst in its run
+        burst : Burst
+            the burst
+        device : int
+            index of the device, if several devices share the bus
+
+        Returns
+        -------
+        int
+            sequence number of the burst
+        """
+        data = np.ascontiguousarray(burst.data, dtype=np.complex64)
+        if data.nbytes > SLOT_DATA_SIZE:
+            raise ValueError(f"Bursts of shape {data.shape} exceed {MAX_SHAPE}.")
+        with self.lock:
+            self.seq += 1
+            seq = self.seq
+            slot = self.slots[seq % self.config.n_slots]
+            # 0 marks the slot as being written
+            slot["seq"] = 0
+            slot["sample"] = sample
+            slot["host_time_ns"] = time.time_ns()
+            slot["timestamp"] = int(burst.timestamps[-1])
+            slot["device"] = device
+            slot["n_el"], slot["n_channels"] = data.shape
+            self.data[seq % self.config.n_slots, : data.nbytes] = data.view(
+                np.uint8
+            ).ravel()
+            slot["seq"] = seq
+            self.header["write_seq"] = seq
+        self.notify(seq)
+        return seq
+
+    def notify(self, seq: int) -> None:
+        if not self.subscribers:
+            return
+        message = notification.pack(seq)
+        with self.subscribers_lock:
+            for connection in list(self.subscribers):
+                try:
+                    sent = connection.send(message)
+                except BlockingIOError:
+                    # The subscriber is behind, it notices the gap.
+                    self.n_dropped += 1
+                    continue
+                except OSError:
+                    self.subscribers.remove(connection)
+                    connection.close()
+                    continue
+                if sent < len(message):
+                    # A partial notification would corrupt the stream.
+                    self.subscribers.remove(connection)
+                    connection.close()
+
+    def close(self) -> None:
+        self.server.close()
+        with self.subscribers_lock:
+            for connection in self.subscribers:
+                connection.close()
+            self.subscribers = []
+        del self.header, self.slots, self.data
+        self.shm.close()
+        self.shm.unlink()
+
+
+def attach(name: str) -> shared_memory.SharedMemory:
+    """
+    Open the shared memory of a bus without taking over its cleanup.
+    """
+    shm = shared_memory.SharedMemory(name)
+    if os.name == "posix":
+        # The resource tracker would unlink it when the subscriber exits.
+        from multiprocessing import resource_tracker
+
+        resource_tracker.unregister(shm._name, "shared_memory")
+    return shm
+
+
+class FrameSubscriber:
+    """
+    Reads the bursts of a `FrameBus` of another process.
+
+    Parameters
+    ----------
+    port : int
+        notification port of the bus
+    host : str
+        host of the bus, only local buses share memory
+    timeout : float
+        timeout of the connection in seconds
+    """
+
+    def __init__(self, port: int, host: str = HOST, timeout: float = 5.0) -> None:
+        self.socket = socket.create_connection((host, port), timeout=timeout)
+        self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        received = b""
+        while b"\n" not in received:
+            chunk = self.socket.recv(4096)
+            if not chunk:
+                raise ConnectionError("The frame bus closed the connection.")
+            received += chunk
+        line = received.partition(b"\n")[0]
+        info = json.loads(line)
+        if info["version"] > FRAME_BUS_VERSION:
+            raise ValueError(f"Unsupported frame bus version {info['version']}")
+        self.n_slots = info["n_slots"]
+        self.shm = attach(info["name"])
+        self.header, self.slots, self.data = map_slots(self.shm.buf, self.n_slots)
+        # Start with the bursts published from now on.
+        self.last_seq = int(self.header["write_seq"])
+        self.n_lost = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.socket.close()
+        del self.header, self.slots, self.data
+        self.shm.close()
+
+    def wait(self, timeout: float = None) -> int:
+        """
+        Wait for a notification.
+
+        Returns
+        -------
+        int
+            sequence number of the last published burst, None after the
+            timeout
+        """
+        if self.header["write_seq"] > self.last_seq:
+            return int(self.header["write_seq"])
+        self.socket.settimeout(timeout)
+        try:
+            chunk = self.socket.recv(65536)
+        except socket.timeout:
+            return None
+        if not chunk:
+            raise ConnectionError("The frame bus closed the connection.")
+        # The notifications only wake up the subscriber, all pending ones are
+        # covered by the sequence number in the shared memory.
+        return int(self.header["write_seq"])
+
+    def valid(self, seq: int) -> bool:
+        """
+        True if the slot of `seq` still holds this burst.
+        """
+        return int(self.slots[seq % self.n_slots]["seq"]) == seq
+
+    def view(self, seq: int) -> Frame:
+        """
+        A burst without copying its values, None if it was overwritten. The
+        values stay valid until `n_slots` newer bursts are published, check
+        with `valid` after using them.
+        """
+        slot = self.slots[seq % self.n_slots].copy()
+        if slot["seq"] != seq:
+            return None
+        shape = (int(slot["n_el"]), int(slot["n_channels"]))
+        n_bytes = shape[0] * shape[1] * np.dtype(np.complex64).itemsize
+        data = self.data[seq % self.n_slots, :n_bytes].view(np.complex64)
+        return Frame(
+            seq=seq,
+            sample=int(slot["sample"]),
+            device=int(slot["device"]),
+            timestamp=int(slot["timestamp"]),
+            host_time_ns=int(slot["host_time_ns"]),
+            data=data.reshape(shape),
+        )
+
+    def read(self, seq: int) -> Frame:
+        """
+        A copy of a burst, None if it was overwritten.
+        """
+        frame = self.view(seq)
+        if frame is None:
+            return None
+        frame.data = frame.data.copy()
+        return frame if self.valid(seq) else None
+
+    def frames(self, timeout: float = None):
+        """
+        Yield the published bursts in order. Bursts that were overwritten
+        before they were read are counted in `n_lost`. Ends after `timeout`
+        seconds without a new burst or when the bus is closed.
+        """
+        closed = False
+        while not closed:
+            try:
+                latest = self.wait(timeout)
+            except ConnectionError:
+                # The bursts published before are still mapped.
+                closed = True
+                latest = int(self.header["write_seq"])
+            if latest is None:
+                return
+            if latest - self.last_seq > self.n_slots:
+                self.n_lost += latest - self.last_seq - self.n_slots
+                self.last_seq = latest - self.n_slots
+            for seq in range(self.last_seq + 1, latest + 1):
+                frame = self.read(seq)
+                if frame is None:
+                    self.n_lost += 1
+                else:
+                    yield frame
+                self.last_seq = seq
@@ -0,0 +1,202 @@
+import struct
+from dataclasses import dataclass
+from typing import List, Union
+
+import numpy as np
+
+# Every device message is framed as [CT] [LE] [data] [CT].
+MEASUREMENT_TAG = 0xB4
+MSG_LEN = 140  # Length of a single measurement frame
+N_CH = 16  # Channels of a single channel group
+TS_OFFSET = 7  # First byte of the timestamp inside a measurement frame
+CH_OFFSET = 11  # First byte of the channel values inside a measurement frame
+ACK = bytes([0x18, 0x01, 0x83, 0x18])  # Command-Acknowledge system message
+
+# Parser states
+SEEK_TAG = 0
+READ_BODY = 1
+
+
+@dataclass
+class Burst:
+    """
+    A single burst, i.e. all excitation stages of the used channel groups.
+
+    Parameters
+    ----------
+    data : np.ndarray
+        complex channel values, shape (n_el, 16 * len(channel_group))
+    timestamps : np.ndarray
+        timestamp of every excitation stage in milli seconds
+    excitation_stgs : np.ndarray
+        excitation setting [ESout, ESin] of every excitation stage
+    """
+
+    data: np.ndarray
+    timestamps: np.ndarray
+    excitation_stgs: np.ndarray
+
+
+def encode_frame(
+    channel_group: int, excitation_stgs: list, timestamp: int, values: np.ndarray
+) -> bytes:
+    """
+    Encode a single measurement frame like the device sends it.
+
+    Parameters
+    ----------
+    channel_group : int
+        channel group of the frame
+    excitation_stgs : list
+        excitation setting [ESout, ESin]
+    timestamp : int
+        timestamp in milli seconds
+    values : np.ndarray
+        16 complex channel values
+
+    Returns
+    -------
+    bytes
+        measurement frame of length `MSG_LEN`
+    """
+    ch = np.empty(2 * N_CH, dtype=">f4")
+    ch[0::2] = np.real(values)
+    ch[1::2] = np.imag(values)
+    body = (
+        bytes([channel_group, excitation_stgs[0], excitation_stgs[1], 0, 0])
+        + struct.pack(">I", timestamp & 0xFFFFFFFF)
+        + ch.tobytes()
+    )
+    return bytes([MEASUREMENT_TAG, len(body)]) + body + bytes([MEASUREMENT_TAG])
+
+
+class FrameParser:
+    """
+    Incremental parser for the raw byte stream of a ScioSpec device.
+
+    Chunks of any size are passed to `feed`. A small state machine searches the
+    message boundaries: in SEEK_TAG it waits for the two header bytes [CT] [LE],
+    in READ_BODY for the rest of the message. A message whose closing tag does
+    not match is treated as garbage and the search restarts at the next byte.
+    System messages are skipped, acknowledges are counted in `n_acks`.
+
+    The channel values of a measurement frame are decoded with `np.frombuffer`
+    straight into the preallocated array of the current burst. A burst is
+    finished with the last excitation stage of the highest used channel group,
+    frames of unused channel groups are dropped.
+
+    Parameters
+    ----------
+    n_el : int
+        number of electrodes
+    channel_group : list
+        used channel groups
+    record_offsets : bool
+        if true, the stream offset of every decoded frame is appended to
+        `frame_offsets`
+    """
+
+    def __init__(
+        self, n_el: int, channel_group: list, record_offsets: bool = False
+    ) -> None:
+        self.n_el = n_el
+        self.channel_group = list(channel_group)
+        self.n_channels = N_CH * len(self.channel_group)
+        # Column of the first channel of a channel group, -1 if unused
+        self.cg_col = np.full(256, -1, dtype=np.int64)
+        for i, cg in enumerate(self.channel_group):
+            self.cg_col[cg] = 2 * N_CH * i
+        self.last_cg = self.channel_group[-1]
+
+        self.state = SEEK_TAG
+        self.buffer = bytearray()
+        self.msg_end = 0
+        self.n_frames = 0
+        self.n_skipped = 0
+        self.n_acks = 0
+        # Stream offset of the first byte inside the buffer
+        self.stream_pos = 0
+        self.record_offsets = record_offsets
+        self.frame_offsets = []
+        self.new_burst()
+
+    def new_burst(self) -> None:
+        self.data = np.zeros((self.n_el, self.n_channels), dtype=np.complex64)
+        # Real and imaginary parts in the order they arrive
+        self.data_f = self.data.view(np.float32)
+        self.timestamps = np.zeros(self.n_el, dtype=np.uint32)
+        self.excitation_stgs = np.zeros((self.n_el, 2), dtype=np.uint8)
+
+    def feed(self, chunk: Union[bytes, bytearray, memoryview]) -> List[Burst]:
+        """
+        Parse the next chunk of the byte stream.
+
+        Parameters
+        ----------
+        chunk : Union[bytes, bytearray, memoryview]
+            raw bytes read from the serial connection
+
+        Returns
+        -------
+        List[Burst]
+            bursts finished by this chunk
+        """
+        buf = self.buffer
+        buf += chunk
+        bursts = []
+        pos = 0
+        n = len(buf)
+        while True:
+            if self.state == SEEK_TAG:
+                if n - pos < 2:
+                    break
+                self.msg_end = pos + buf[pos + 1] + 3
+                self.state = READ_BODY
+            end = self.msg_end
+            if end > n:
+                break
+            self.state = SEEK_TAG
+            tag = buf[pos]
+            if buf[end - 1] != tag:
+                # Out of sync, search the next message start
+                self.n_skipped += 1
+                pos += 1
+                continue
+            if tag == MEASUREMENT_TAG and end - pos == MSG_LEN:
+                burst = self.decode_frame(buf, pos)
+                if burst is not None:
+                    bursts.append(burst)
+            elif buf[pos:end] == ACK:
+                self.n_acks += 1
+            pos = end
+        del buf[:pos]
+        self.msg_end -= pos
+        self.stream_pos += pos
+        return bursts
+
+    def decode_frame(self, buf: bytearray, pos: int) -> Union[None, Burst]:
+        cg = buf[pos + 2]
+        col = self.cg_col[cg]
+        stg = buf[pos + 3] - 1
+        if col < 0 or not 0 <= stg < self.n_el:
+            return None
+        self.n_frames += 1
+        if self.record_offsets:
+            self.frame_offsets.append(self.stream_pos + pos)
+        self.data_f[stg, col : col + 2 * N_CH] = np.frombuffer(
+            buf, dtype=">f4", count=2 * N_CH, offset=pos + CH_OFFSET
+        )
+        self.excitation_stgs[stg] = (buf[pos + 3], buf[pos + 4])
+        self.timestamps[stg] = int.from_bytes(
+            buf[pos + TS_OFFSET : pos + CH_OFFSET], "big"
+        )
+
+        if stg == self.n_el - 1 and cg == self.last_cg:
+            burst = Burst(
+                data=self.data,
+                timestamps=self.timestamps,
+                excitation_stgs=self.excitation_stgs,
+            )
+            self.new_burst()
+            return burst
+        return None
@@ -0,0 +1,184 @@
+import time
+from tkinter import Canvas, Label, Toplevel
+
+import numpy as np
+
+from frameparser import Burst
+
+# Plot areas of the canvas: (title, x0, y0, x1, y1)
+plot_areas = {
+    "magnitude": ("|U| per channel [V]", 40, 20, 600, 150),
+    "phase": ("Phase per channel [rad]", 40, 190, 600, 320),
+    "ushape": ("U-shape |U| [V]", 40, 360, 600, 490),
+}
+
+
+def decimate(y: np.ndarray, n_max: int) -> tuple:
+    """
+    Reduce a curve to at most `n_max` points while keeping its envelope.
+
+    Every bucket of consecutive samples is replaced by its minimum and maximum,
+    so peaks stay visible if there are more samples than pixels.
+
+    Parameters
+    ----------
+    y : np.ndarray
+        curve
+    n_max : int
+        maximum number of points
+
+    Returns
+    -------
+    tuple
+        x positions relative to the length of `y` and the decimated values
+    """
+    n = len(y)
+    if n <= n_max:
+        return np.arange(n, dtype=float), y
+    n_buckets = n_max // 2
+    edges = np.linspace(0, n, n_buckets + 1).astype(int)
+    y_min = np.minimum.reduceat(y, edges[:-1])
+    y_max = np.maximum.reduceat(y, edges[:-1])
+    x = np.repeat(edges[:-1], 2).astype(float)
+    return x, np.column_stack([y_min, y_max]).ravel()
+
+
+class LiveView:
+    """
+    Window that shows the latest burst of a running measurement.
+
+    `show` only keeps a reference to the burst, it is called for every burst
+    and returns immediately. The window redraws itself with at most
+    `max_fps` frames per second from the latest burst and skips all others.
+    The plot lines are created once and only their coordinates are updated.
+
+    Parameters
+    ----------
+    app :
+        tkinter root
+    max_fps : float
+        maximum refresh rate of the plots
+    stage : int
+        index of the excitation stage shown in the channel plots
+    """
+
+    def __init__(self, app, max_fps: float = 10, stage: int = 0) -> None:
+        self.app = app
+        self.max_fps = max_fps
+        self.stage = stage
+        self.window = None
+        self.latest = None
+        self.drawn = None
+        self.n_received = 0
+        self.rate_count = 0
+        self.rate_t0 = time.perf_counter()
+        self.acq_fps = 0.0
+        self.draw_fps = 0.0
+        self.n_drawn = 0
+
+    @property
+    def is_open(self) -> bool:
+        return self.window is not None
+
+    def open(self) -> None:
+        if self.is_open:
+            self.window.lift()
+            return
+        self.window = Toplevel(self.app)
+        self.window.title("Live view")
+        self.window.geometry("640x560")
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+
+        self.canvas = Canvas(self.window, width=640, height=520, background="white")
+        self.canvas.place(x=0, y=0, width=640, height=520)
+        self.rate_label = Label(self.window, text="")
+        self.rate_label.place(x=10, y=525, width=620, height=30)
+
+        self.lines = {}
+        self.range_labels = {}
+        for name, (title, x0, y0, x1, y1) in plot_areas.items():
+            self.canvas.create_rectangle(x0, y0, x1, y1, outline="grey")
+            self.canvas.create_text(x0, y0 - 2, text=title, anchor="sw")
+            self.range_labels[name] = (
+                self.canvas.create_text(x0 - 2, y0, text="", anchor="ne"),
+                self.canvas.create_text(x0 - 2, y1, text="", anchor="se"),
+            )
+            self.lines[name] = self.canvas.create_line(x0, y1, x1, y1, fill="#1A5175")
+
+        self.drawn = None
+        self.schedule(0)
+
+    def close(self) -> None:
+        if self.window is not None:
+            self.window.destroy()
+        self.window = None
+
+    def reset(self) -> None:
+        """
+        Reset the frame rates at the start of a measurement.
+        """
+        self.latest = None
+        self.n_received = 0
+        self.rate_count = 0
+        self.n_drawn = 0
+        self.rate_t0 = time.perf_counter()
+        self.acq_fps = self.draw_fps = 0.0
+
+    def show(self, burst: Burst) -> None:
+        self.latest = burst
+        self.n_received += 1
+
+    def schedule(self, delay_ms: float) -> None:
+        self.window.after(int(delay_ms), self.refresh)
+
+    def refresh(self) -> None:
+        if not self.is_open:
+            return
+        t_start = time.perf_counter()
+        self.update_rates(t_start)
+        if self.latest is not None and self.latest is not self.drawn:
+            self.draw(self.latest)
+            self.drawn = self.latest
+            self.n_drawn += 1
+        # A slow machine gets a lower refresh rate instead of a blocked GUI.
+        draw_ms = 1000 * (time.perf_counter() - t_start)
+        self.schedule(max(1000 / self.max_fps, 2 * draw_ms))
+
+    def update_rates(self, now: float) -> None:
+        elapsed = now - self.rate_t0
+        if elapsed < 1:
+            return
+        self.acq_fps = (self.n_received - self.rate_count) / elapsed
+        self.draw_fps = self.n_drawn / elapsed
+        self.rate_count = self.n_received
+        self.n_drawn = 0
+        self.rate_t0 = now
+        self.rate_label["text"] = (
+            f"Received: {self.n_received} bursts | "
+            f"acquisition: {self.acq_fps:.1f} bursts/s | "
+            f"display: {self.draw_fps:.1f} fps"
+        )
+
+    def draw(self, burst: Burst) -> None:
+        stage = min(self.stage, burst.data.shape[0] - 1)
+        channels = burst.data[stage]
+        self.plot("magnitude", np.abs(channels))
+        self.plot("phase", np.angle(channels))
+        self.plot("ushape", np.abs(burst.data).ravel())
+
+    def plot(self, name: str, y: np.ndarray) -> None:
+        _, x0, y0, x1, y1 = plot_areas[name]
+        x, y = decimate(y, x1 - x0)
+        y_min, y_max = float(y.min()), float(y.max())
+        span = y_max - y_min or 1.0
+
+        xy = np.empty((len(y), 2))
+        xy[:, 0] = x0 + (x1 - x0) * x / max(x[-1], 1)
+        xy[:, 1] = y1 - (y1 - y0) * (y - y_min) / span
+        if len(y) == 1:
+            xy = np.repeat(xy, 2, axis=0)
+        self.canvas.coords(self.lines[name], xy.ravel().tolist())
+
+        label_max, label_min = self.range_labels[name]
+        self.canvas.itemconfigure(label_max, text=f"{y_max:.3g}")
+        self.canvas.itemconfigure(label_min, text=f"{y_min:.3g}")
@@ -0,0 +1,116 @@
+import collections
+import logging
+import logging.handlers
+import queue
+import sys
+
+from workingvariables import LogConfig
+
+log_levels = ["DEBUG", "INFO", "WARNING", "ERROR"]
+
+LOG_FORMAT = "%(asctime)s %(levelname)-7s %(name)s: %(message)s"
+WIDGET_FORMAT = "%(asctime)s %(levelname)s: %(message)s"
+
+
+class BufferHandler(logging.Handler):
+    """
+    Collects formatted records in a ring buffer until they are drained.
+
+    Used by the log widget of the GUI: `emit` runs on the thread of the queue
+    listener and only appends to the buffer, the Tk thread drains it in
+    batches. If more than `max_lines` records arrive between two drains, the
+    oldest are discarded.
+
+    Parameters
+    ----------
+    max_lines : int
+        size of the ring buffer
+    """
+
+    def __init__(self, max_lines: int = 1000) -> None:
+        super().__init__()
+        self.lines = collections.deque(maxlen=max_lines)
+        self.setFormatter(logging.Formatter(WIDGET_FORMAT, datefmt="%H:%M:%S"))
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            self.lines.append(self.format(record))
+        except Exception:
+            self.handleError(record)
+
+    def drain(self) -> list:
+        lines = []
+        while self.lines:
+            lines.append(self.lines.popleft())
+        return lines
+
+
+class StreamToLogger:
+    """
+    File-like object passing every written line to a logger, e.g. to catch
+    the output of libraries that `print`.
+    """
+
+    def __init__(self, logger: logging.Logger, level: int = logging.INFO) -> None:
+        self.logger = logger
+        self.level = level
+        self.buffer = ""
+
+    def write(self, text: str) -> int:
+        self.buffer += text
+        *lines, self.buffer = self.buffer.split("\n")
+        for line in lines:
+            if line.strip():
+                self.logger.log(self.level, line.rstrip())
+        return len(text)
+
+    def flush(self) -> None:
+        pass
+
+
+def setup_logging(config: LogConfig, handlers: list = ()):
+    """
+    Route all records through a queue to the given handlers.
+
+    Loggers only put the records into a queue, formatting and output happen on
+    the thread of a `QueueListener`. Logging from the acquisition threads is
+    therefore cheap and never touches a tkinter widget.
+
+    Parameters
+    ----------
+    config : LogConfig
+        log level and optional rotating log file
+    handlers : list
+        additional handlers, e.g. a `BufferHandler` or a console handler
+
+    Returns
+    -------
+    logging.handlers.QueueListener
+        started listener, `stop` it to flush the handlers on exit
+    """
+    handlers = list(handlers)
+    if config.log_file:
+        file_handler = logging.handlers.RotatingFileHandler(
+            config.log_file,
+            maxBytes=config.max_bytes,
+            backupCount=config.backup_count,
+        )
+        file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        handlers.append(file_handler)
+
+    records = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(records))
+    root.setLevel(config.level)
+
+    listener = logging.handlers.QueueListener(records, *handlers)
+    listener.start()
+    return listener
+
+
+def console_handler() -> logging.Handler:
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    return handler
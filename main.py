@@ -1,3 +1,8 @@
+import time
+
+# Cold start, see `log_startup`
+t_start = time.perf_counter()
+
 from tkinter import (
     END,
     NW,
@@ -12,26 +17,43 @@ from tkinter import (
     filedialog,
 )
 
-import time
 from datetime import date
+import dataclasses
+import json
+import logging
+import platform
 import sys
-import numpy as np
+import threading
+import queue
 import os
-from sciopy import (
-    SetLEDControl,
-    GetLEDControl,
-    connect_COM_port,
-    available_serial_ports,
-    StartStopMeasurement,
-    del_hex_in_list,
-    reshape_full_message_in_bursts,
-    split_bursts_in_frames,
-    set_measurement_config,
-    SystemMessageCallback,
+
+from acquisition import (
+    MeasurementWorker,
+    acquisition_modes,
+    adjust_channel_group,
+    connect_port,
 )
-from sciopy.sciopy_dataclasses import ScioSpecMeasurementSetup
+from compression import available_codecs
+from deviceconfig import apply_config, diff_commands, sweep_steps
+from framebus import FrameBus
+from liveview import LiveView
+from logconfig import BufferHandler, StreamToLogger, log_levels, setup_logging
+from metrics import Metrics, MetricsExporter
+from profiles import (
+    LAST_PROFILE,
+    list_profiles,
+    load_profile,
+    save_profile,
+    validate_setup,
+)
+from replay import REPLAY_PORT, ReplayScioSpec
+from simdevice import SIM_PORT
+from storage import queue_policies, read_run_info, save_formats, setup_from_dict
 
 from workingvariables import (
+    FrameBusConfig,
+    LogConfig,
+    MetricsConfig,
     StoreConfig,
     ScioSpecDeviceInfo,
     OperatingSystem,
@@ -53,44 +75,62 @@ Contct: jacob.thoenes@uni-rostock.de \n\
 
 n_el_poss = [16, 32, 48, 64]
 
-sciospec_measurement_setup = ScioSpecMeasurementSetup(
+default_setup = dict(
     burst_count=1,
     total_meas_num=10,
     n_el=16,
     channel_group=[1],
     exc_freq=10_000,
     framerate=5,
-    amplitude=10,
+    # in A, the configuration window shows mA
+    amplitude=0.001,
     inj_skip=0,
     gain=1,
     adc_range=1,
-    notes="None",
+    notes=None,
     configured=False,
 )
 
+# Created by `load_measurement_setup` on first use, importing sciopy takes
+# more than a second.
+sciospec_measurement_setup = None
+
 
-def adjust_channel_group(smc: ScioSpecMeasurementSetup) -> list:
+def load_measurement_setup() -> None:
+    global sciospec_measurement_setup
+    if sciospec_measurement_setup is None:
+        from sciopy.sciopy_dataclasses import ScioSpecMeasurementSetup
+
+        sciospec_measurement_setup = ScioSpecMeasurementSetup(**default_setup)
+        if LAST_PROFILE in list_profiles():
+            try:
+                apply_profile(load_profile(LAST_PROFILE))
+            except (OSError, ValueError, ImportError) as err:
+                logger.warning(f"Could not restore the last setup: {err}")
+
+
+def apply_profile(setup: dict) -> None:
     """
-    Depending on the number of electrodes a list of used channel groups is created.
-    # n_el = 16 -> [1]
-    # n_el = 32 -> [1, 2]
-    # n_el = 48 -> [1, 2, 3]
-    # n_el = 64 -> [1, 2, 3, 4]
-
-    Parameters
-    ----------
-    smc : ScioSpecMeasurementSetup
-        Set up dataclass
-
-    Returns
-    -------
-    list
-        list of used channel groups
+    Take over a validated setup, see `profiles.validate_setup`.
     """
-    return list(np.arange(smc.n_el // 16) + 1)
+    for name, value in setup.items():
+        setattr(sciospec_measurement_setup, name, value)
+    sciospec_measurement_setup.channel_group = adjust_channel_group(
+        smc=sciospec_measurement_setup
+    )
 
 
 store_config = StoreConfig("data/", ".npz")
+# Set a log_file to keep the metrics snapshots, e.g. "data/metrics.log"
+metrics_config = MetricsConfig()
+# Set a port to publish the bursts to other processes, see framebus.py
+frame_bus_config = FrameBusConfig()
+log_config = LogConfig()
+
+# Records of all threads are collected here and shown by the log widget.
+log_buffer = BufferHandler(max_lines=log_config.max_lines)
+log_listener = setup_logging(log_config, handlers=[log_buffer])
+logger = logging.getLogger("sciospecgui")
 
 
 ### Constants:
@@ -104,49 +144,76 @@ btn_height = 50
 # Initializing
 sciospec_device_info = ScioSpecDeviceInfo(com_port="", connection_established=False)
 
-available_ports = available_serial_ports()
+# Set by `detect_monitor`
+op_system = None
 
-if available_ports:
-    print(f"{available_ports=}")
-else:
-    print(
-        "No serial ports found. Restart Programm after connection the ScioSpec Device"
-    )
 
-""" Read resolution and set for visualization. """
-import platform
-from screeninfo import get_monitors
+def detect_monitor() -> None:
+    """
+    Read the resolution of the primary monitor, runs in the background.
+    """
+    global op_system
+    from screeninfo import get_monitors
 
-monitor = get_monitors()
+    t_probe = time.perf_counter()
+    try:
+        monitor = get_monitors()
+    except Exception as err:
+        logger.warning(f"Can not detect the monitor: {err}")
+        return
 
-if type(monitor) == list:
-    monitor = monitor[0]
+    if type(monitor) == list:
+        monitor = monitor[0]
 
-print(monitor)
+    logger.info(monitor)
+
+    op_system = OperatingSystem(
+        system=str(platform.system()),
+        resolution_width=int(monitor.width),
+        resolution_height=int(monitor.height),
+    )
+    logger.info(
+        f"{op_system.system}, monitor detected in {time.perf_counter() - t_probe:.2f} s"
+    )
+
+
+def log_startup() -> None:
+    logger.info(f"Window shown {time.perf_counter() - t_start:.2f} s after start.")
 
-op_system = OperatingSystem(
-    system=str(platform.system()),
-    resolution_width=int(monitor.width),
-    resolution_height=int(monitor.height),
-)
-print(op_system.system)
 
 ###
 
 
 class Log:
-    def __init__(self, app) -> None:
+    def __init__(self, app, buffer: BufferHandler, max_lines: int = 1000) -> None:
         self.log = Text(app, height=10, width=100)
         self.log.place(x=10, y=590, width=500, height=200)
+        self.buffer = buffer
+        self.max_lines = max_lines
+
+        self.level_dropdown = ttk.Combobox(app, values=log_levels, state="readonly")
+        self.level_dropdown.set(logging.getLevelName(logging.getLogger().level))
+        self.level_dropdown.bind("<<ComboboxSelected>>", self.set_level)
+        self.level_dropdown.place(x=520, y=740, height=25, width=150)
 
         self.clear_button = Button(app, text="Clear Log", command=self.clear_log)
-        self.clear_button.place(x=520, y=740, height=50, width=150)
+        self.clear_button.place(x=520, y=765, height=25, width=150)
 
-    def write(self, text):
-        self.log.insert(END, text)
+        self.log.after(100, self.drain)
 
-    def flush(self):
-        pass
+    def drain(self):
+        # All records since the last drain are inserted at once.
+        lines = self.buffer.drain()
+        if lines:
+            self.log.insert(END, "\n".join(lines) + "\n")
+            n_lines = int(self.log.index("end-1c").split(".")[0]) - 1
+            if n_lines > self.max_lines:
+                self.log.delete("1.0", f"{n_lines - self.max_lines + 1}.0")
+            self.log.see(END)
+        self.log.after(100, self.drain)
+
+    def set_level(self, event=None):
+        logging.getLogger().setLevel(self.level_dropdown.get())
 
     def clear_log(self):
         self.log.delete("1.0", END)
@@ -154,12 +221,25 @@ class Log:
 
 class ScioSpecConnect:
     def __init__(self, app) -> None:
-        self.com_dropdown_sciospec = ttk.Combobox(values=available_ports)
+        # The simulated device is always available, the serial ports are added
+        # by `refresh_ports`.
+        self.com_dropdown_sciospec = ttk.Combobox(values=[SIM_PORT])
         self.com_dropdown_sciospec.bind("<<ComboboxSelected>>", self.dropdown_callback)
         self.com_dropdown_sciospec.place(
             x=spacer, y=spacer, width=btn_width + spacer, height=btn_height
         )
 
+        self.refresh_button = Button(
+            app, text="Refresh ports", command=self.refresh_ports
+        )
+        self.refresh_button.place(
+            x=spacer,
+            y=2 * spacer + btn_height,
+            width=btn_width + spacer,
+            height=btn_height,
+        )
+        self.ports = queue.Queue()
+
         self.connect_interact_button = Button(
             app,
             text="Connect ScioSpec",
@@ -174,38 +254,105 @@ class ScioSpecConnect:
             height=btn_height,
         )
 
+    def refresh_ports(self):
+        """
+        Enumerate the serial ports in the background, e.g. after plugging in a
+        device. Probing every port may take seconds.
+        """
+        self.refresh_button["state"] = "disabled"
+        threading.Thread(target=self.probe_ports, daemon=True).start()
+        app.after(100, self.poll_ports)
+
+    def probe_ports(self):
+        # The first probe imports sciopy as well.
+        from sciopy import available_serial_ports
+
+        t_probe = time.perf_counter()
+        try:
+            ports = available_serial_ports()
+        except BaseException:
+            logger.exception("Can not list the serial ports")
+            ports = []
+        logger.info(f"Ports probed in {time.perf_counter() - t_probe:.2f} s")
+        self.ports.put(ports)
+
+    def poll_ports(self):
+        try:
+            available_ports = self.ports.get_nowait()
+        except queue.Empty:
+            app.after(100, self.poll_ports)
+            return
+        if available_ports:
+            logger.info(f"{available_ports=}")
+        else:
+            logger.warning(
+                "No serial ports found. Connect the ScioSpec device and refresh."
+            )
+        self.com_dropdown_sciospec["values"] = available_ports + [SIM_PORT]
+        self.refresh_button["state"] = "normal"
+
     def dropdown_callback(self, event=None):
         if event:
-            print(f"Selected: {self.com_dropdown_sciospec.get()}")
+            logger.info(f"Selected: {self.com_dropdown_sciospec.get()}")
             sciospec_device_info.com_port = self.com_dropdown_sciospec.get()
             self.connect_interact_button["state"] = "normal"
         else:
             pass
 
+    def select_replay(self):
+        """
+        Select a recorded run as port, it is replayed through the acquisition
+        like a device, see `replay.ReplayScioSpec`. The speed can be edited in
+        the port name, speed=0 replays as fast as possible.
+        """
+        file_name = filedialog.askopenfilename(
+            title="Select run to replay",
+            filetypes=[("Run description", "run_*.json")],
+        )
+        if not file_name:
+            return
+        try:
+            info = read_run_info(file_name)
+            n_el = info["setup"]["n_el"]
+        except (OSError, ValueError, KeyError) as err:
+            logger.error(f"Invalid run description {file_name}: {err}")
+            return
+        port = f"{REPLAY_PORT}:{file_name},speed=1"
+        self.com_dropdown_sciospec.set(port)
+        sciospec_device_info.com_port = port
+        self.connect_interact_button["state"] = "normal"
+        logger.info(
+            f"Replay of {file_name}, configure {n_el} electrodes "
+            f"and at most {info.get('n_samples', 0)} measurements."
+        )
+
     def connect_interact(self):
         global COM_ScioSpec
 
         if self.connect_interact_button["text"] == "Disconnect":
-            print("Closed serial connection.")
+            logger.info("Closed serial connection.")
             COM_ScioSpec.close()
             sciospec_device_info.connection_established = False
+            sciospec_device_info.configured_setup = None
             self.connect_interact_button["text"] = "Connect ScioSpec"
             blink_btn.blnk_btn["state"] = "disabled"
 
         else:
-            print(
-                f"Connecting to {sciospec_device_info.com_port}...",
-            )
+            # The port name may have been edited, e.g. the speed of a replay.
+            sciospec_device_info.com_port = self.com_dropdown_sciospec.get()
+            logger.info(f"Connecting to {sciospec_device_info.com_port}...")
             try:
-                COM_ScioSpec = connect_COM_port(sciospec_device_info.com_port)
-                print("Initialization done.")
+                COM_ScioSpec = connect_port(sciospec_device_info.com_port)
+                # The setup of the device is unknown until it is written.
+                sciospec_device_info.configured_setup = None
+                logger.info("Initialization done.")
                 sciospec_device_info.connection_established = True
                 self.connect_interact_button["text"] = "Disconnect"
                 blink_btn.blnk_btn["state"] = "normal"
                 scio_spec_config.open_cnf_window_btn["state"] = "normal"
 
             except BaseException:
-                print("Can not open", sciospec_device_info.com_port)
+                logger.exception(f"Can not open {sciospec_device_info.com_port}")
                 sciospec_device_info.connection_established = False
                 self.connect_interact_button["text"] = "Connect ScioSpec"
 
@@ -226,6 +373,8 @@ class BlinkBtn:
         )
 
     def green_on_off(self):
+        from sciopy import GetLEDControl, SetLEDControl
+
         SetLEDControl(COM_ScioSpec, 1, "disable")
         GetLEDControl(COM_ScioSpec, 1, "disable")  # turn ready led off
         time.sleep(1)
@@ -248,44 +397,74 @@ class ScioSpecConfig:
         )
 
     def config_window(self):
+        load_measurement_setup()
         self.sciospec_cnf_wndow = Toplevel(app)
         self.sciospec_cnf_wndow.title("Configure ScioSpec")
         self.sciospec_cnf_wndow.geometry("800x600")
 
+        def read_settings() -> dict:
+            """
+            Setup of the entries, the amplitude in A.
+            """
+            notes_inp = entry_note.get("1.0", END).strip()
+            return {
+                "total_meas_num": int(entry_meas_num.get()),
+                "burst_count": int(entry_burst_count.get()),
+                "n_el": int(n_el_dropdown.get()),
+                "exc_freq": float(etry_exc_freq.get()),
+                "framerate": float(frame_rate.get()),
+                "amplitude": float(amplitude_droptown.get()) / 1000.0,
+                "inj_skip": int(inj_skip_dropdown.get()),
+                "adc_range": int(adc_range_dropdown.get()),
+                "gain": int(gain_dropdown.get()),
+                "notes": notes_inp if notes_inp not in ("", "Notes") else None,
+            }
+
         def set_sciospec_settings():
             """
             Set the configuration of the measurement.
             """
-            global used_channel_groups
-
-            sciospec_measurement_setup.total_meas_num = int(entry_meas_num.get())
-            sciospec_measurement_setup.burst_count = int(entry_burst_count.get())
-            sciospec_measurement_setup.n_el = int(n_el_dropdown.get())
-
-            sciospec_measurement_setup.exc_freq = float(etry_exc_freq.get())
-            sciospec_measurement_setup.inj_skip = int(inj_skip_dropdown.get())
-            sciospec_measurement_setup.adc_range = int(adc_range_dropdown.get())
-            sciospec_measurement_setup.gain = int(gain_dropdown.get())
-            notes_inp = entry_note.get("1.0", END)
-
-            sciospec_measurement_setup.notes = (
-                notes_inp if notes_inp != "Notes\n" else None
-            )
+            try:
+                setup = validate_setup(read_settings())
+            except ValueError as err:
+                logger.warning(err)
+                return
+            apply_profile(setup)
             sciospec_measurement_setup.configured = True
             if (
                 sciospec_device_info.connection_established
                 and sciospec_measurement_setup.configured
             ):
                 send_config.send_cnf_btn["state"] = "normal"
-            sciospec_measurement_setup.amplitude = (
-                sciospec_measurement_setup.amplitude / 1000.0
-            )
+            try:
+                save_profile(LAST_PROFILE, setup)
+            except OSError as err:
+                logger.warning(f"Could not save the setup: {err}")
+            logger.info(sciospec_measurement_setup)
+            self.sciospec_cnf_wndow.destroy()
 
-            sciospec_measurement_setup.channel_group = adjust_channel_group(
-                smc=sciospec_measurement_setup
-            )
-            print(sciospec_measurement_setup)
+        def load_selected_profile():
+            name = profile_dropdown.get()
+            try:
+                setup = load_profile(name)
+            except (OSError, ValueError, ImportError) as err:
+                logger.error(f"Could not load profile {name}: {err}")
+                return
+            apply_profile(setup)
+            logger.info(f"Loaded profile {name}.")
+            # Show the values of the profile
             self.sciospec_cnf_wndow.destroy()
+            self.config_window()
+
+        def save_selected_profile():
+            name = profile_dropdown.get()
+            try:
+                file_name = save_profile(name, read_settings())
+            except (OSError, ValueError) as err:
+                logger.warning(f"Could not save profile {name}: {err}")
+                return
+            profile_dropdown["values"] = list_profiles()
+            logger.info(f"Saved profile {name} to {file_name}.")
 
         # Components of top window configure sciospec
 
@@ -299,6 +478,7 @@ class ScioSpecConfig:
             "Injection skip:",
             "ADC range +/-[V]:",
             "Gain:",
+            "Profile:",
         ]
 
         for i in range(len(labels)):
@@ -327,11 +507,7 @@ class ScioSpecConfig:
         n_el_dropdown.place(
             x=2 * btn_width + 25, y=2 * btn_height + 15, width=3 * btn_width
         )
-        n_el_dropdown.current(
-            np.concatenate(
-                np.where(np.array(n_el_poss) == sciospec_measurement_setup.n_el)
-            )[0]
-        )
+        n_el_dropdown.current(n_el_poss.index(sciospec_measurement_setup.n_el))
 
         def n_el_callback(empty) -> None:
             """
@@ -344,9 +520,9 @@ class ScioSpecConfig:
                 unused
             """
             sciospec_measurement_setup.n_el = int(n_el_dropdown.get())
-            inj_skip_dropdown["values"] = [
-                ele for ele in np.arange(sciospec_measurement_setup.n_el // 2)
-            ]
+            inj_skip_dropdown["values"] = list(
+                range(sciospec_measurement_setup.n_el // 2)
+            )
 
         n_el_dropdown.bind("<<ComboboxSelected>>", n_el_callback)
 
@@ -369,31 +545,52 @@ class ScioSpecConfig:
         amplitude_droptown.place(
             x=2 * btn_width + 25, y=5 * btn_height + 15, width=3 * btn_width
         )
-        amplitude_droptown.insert(0, str(sciospec_measurement_setup.amplitude))
+        amplitude_droptown.insert(0, f"{sciospec_measurement_setup.amplitude * 1000:g}")
 
         # injection pattern skip
         inj_skip_dropdown = ttk.Combobox(
             self.sciospec_cnf_wndow,
-            values=[ele for ele in np.arange(sciospec_measurement_setup.n_el // 2)],
+            values=list(range(sciospec_measurement_setup.n_el // 2)),
         )
-        inj_skip_dropdown.current(0)
+        inj_skip_dropdown.current(sciospec_measurement_setup.inj_skip)
         inj_skip_dropdown.place(
             x=2 * btn_width + 25, y=6 * btn_height + 15, width=3 * btn_width
         )
         # ADC range
         adc_range_dropdown = ttk.Combobox(self.sciospec_cnf_wndow, values=[1, 5, 10])
-        adc_range_dropdown.current(0)
+        adc_range_dropdown.current(
+            [1, 5, 10].index(sciospec_measurement_setup.adc_range)
+        )
         adc_range_dropdown.place(
             x=2 * btn_width + 25, y=7 * btn_height + 15, width=3 * btn_width
         )
 
         # Gain
         gain_dropdown = ttk.Combobox(self.sciospec_cnf_wndow, values=[1, 10, 100, 1000])
-        gain_dropdown.current(0)
+        gain_dropdown.current([1, 10, 100, 1000].index(sciospec_measurement_setup.gain))
         gain_dropdown.place(
             x=2 * btn_width + 25, y=8 * btn_height + 15, width=3 * btn_width
         )
 
+        # named setups, see profiles.py
+        profile_dropdown = ttk.Combobox(self.sciospec_cnf_wndow, values=list_profiles())
+        profile_dropdown.set(LAST_PROFILE)
+        profile_dropdown.place(
+            x=2 * btn_width + 25, y=9 * btn_height + 15, width=3 * btn_width
+        )
+        btn_load_profile = Button(
+            self.sciospec_cnf_wndow, text="Load", command=load_selected_profile
+        )
+        btn_load_profile.place(
+            x=5 * btn_width + 35, y=9 * btn_height + 14, width=2 * btn_width
+        )
+        btn_save_profile = Button(
+            self.sciospec_cnf_wndow, text="Save", command=save_selected_profile
+        )
+        btn_save_profile.place(
+            x=7 * btn_width + 45, y=9 * btn_height + 14, width=2 * btn_width
+        )
+
         # set all configurations
         btn_set_all = Button(
             self.sciospec_cnf_wndow,
@@ -422,7 +619,7 @@ class ScioSpecConfig:
             height=5 * btn_height,
             anchor=NW,
         )
-        entry_note.insert("1.0", "Notes")
+        entry_note.insert("1.0", sciospec_measurement_setup.notes or "Notes")
 
         info_labels = [
             "Total number of measurements.",
@@ -462,7 +659,7 @@ class DataExportConfig:
     def config_window(self):
         self.export_cnf_wndow = Toplevel(app)
         self.export_cnf_wndow.title("Configure ScioSpec")
-        self.export_cnf_wndow.geometry("800x400")
+        self.export_cnf_wndow.geometry("800x580")
 
         def open_path_select():
             store_config.s_path = (
@@ -473,17 +670,33 @@ class DataExportConfig:
             try:
                 os.mkdir(store_config.s_path + gen_dir_name.get())
                 store_config.s_path = store_config.s_path + gen_dir_name.get() + "/"
-                print(
+                logger.info(
                     f"Generated folder {gen_dir_name.get()} at path {store_config.s_path}."
                 )
 
             except BaseException:
-                print("Folder already exist.")
+                logger.warning("Folder already exist.")
 
         def set_save_config():
             store_config.save_format = file_format.get()
+            store_config.queue_size = int(entry_queue_size.get())
+            store_config.queue_policy = queue_policy_dropdown.get()
+            store_config.online_stats = online_stats_dropdown.get() == "on"
+            store_config.reference_bursts = int(entry_reference_bursts.get())
+            store_config.codec = codec_dropdown.get()
+            level = entry_compression_level.get().strip()
+            store_config.compression_level = int(level) if level else None
+            reconstruct = reconstruction_dropdown.get() == "on"
+            if reconstruct and not (
+                store_config.online_stats and store_config.reference_bursts > 0
+            ):
+                logger.warning(
+                    "The reconstruction needs online statistics with reference bursts."
+                )
+                return
+            store_config.reconstruct = reconstruct
             run_measurement.run_btn["state"] = "normal"
-            print(store_config)
+            logger.info(store_config)
             self.export_cnf_wndow.destroy()
 
         # Components of top window export config
@@ -491,6 +704,13 @@ class DataExportConfig:
             "Savepath",
             "Generate folder",
             "Save file format",
+            "Queue size",
+            "Queue full policy",
+            "Online statistics",
+            "Reference bursts",
+            "Compression codec",
+            "Compression level",
+            "Reconstruction",
         ]
 
         for i in range(len(labels)):
@@ -514,11 +734,66 @@ class DataExportConfig:
 
         file_format = ttk.Combobox(
             self.export_cnf_wndow,
-            values=[".npz", "hdf5"],
+            values=save_formats,
         )
         file_format.current(0)
         file_format.place(x=3 * btn_width, y=2 * btn_height + 15, width=3 * btn_width)
 
+        # write-behind queue between acquisition and storage
+        entry_queue_size = Entry(self.export_cnf_wndow)
+        entry_queue_size.place(
+            x=3 * btn_width, y=3 * btn_height + 15, width=3 * btn_width
+        )
+        entry_queue_size.insert(0, str(store_config.queue_size))
+
+        queue_policy_dropdown = ttk.Combobox(
+            self.export_cnf_wndow, values=queue_policies
+        )
+        queue_policy_dropdown.current(queue_policies.index(store_config.queue_policy))
+        queue_policy_dropdown.place(
+            x=3 * btn_width, y=4 * btn_height + 15, width=3 * btn_width
+        )
+
+        # running statistics and reference subtraction during the acquisition
+        online_stats_dropdown = ttk.Combobox(
+            self.export_cnf_wndow, values=["off", "on"]
+        )
+        online_stats_dropdown.current(int(store_config.online_stats))
+        online_stats_dropdown.place(
+            x=3 * btn_width, y=5 * btn_height + 15, width=3 * btn_width
+        )
+
+        entry_reference_bursts = Entry(self.export_cnf_wndow)
+        entry_reference_bursts.place(
+            x=3 * btn_width, y=6 * btn_height + 15, width=3 * btn_width
+        )
+        entry_reference_bursts.insert(0, str(store_config.reference_bursts))
+
+        # codec of the save format "compressed", an empty level is the default
+        codecs = available_codecs()
+        codec_dropdown = ttk.Combobox(self.export_cnf_wndow, values=codecs)
+        if store_config.codec in codecs:
+            codec_dropdown.current(codecs.index(store_config.codec))
+        codec_dropdown.place(
+            x=3 * btn_width, y=7 * btn_height + 15, width=3 * btn_width
+        )
+
+        entry_compression_level = Entry(self.export_cnf_wndow)
+        entry_compression_level.place(
+            x=3 * btn_width, y=8 * btn_height + 15, width=3 * btn_width
+        )
+        if store_config.compression_level is not None:
+            entry_compression_level.insert(0, str(store_config.compression_level))
+
+        # images of the differences to the reference, see reconstruction.py
+        reconstruction_dropdown = ttk.Combobox(
+            self.export_cnf_wndow, values=["off", "on"]
+        )
+        reconstruction_dropdown.current(int(store_config.reconstruct))
+        reconstruction_dropdown.place(
+            x=3 * btn_width, y=9 * btn_height + 15, width=3 * btn_width
+        )
+
         btn_set_all = Button(
             self.export_cnf_wndow,
             text="Set all selections",
@@ -526,7 +801,7 @@ class DataExportConfig:
         )
         btn_set_all.place(
             x=1 * btn_width,
-            y=6 * btn_height + 15,
+            y=10 * btn_height + 15,
             height=btn_height,
             width=3 * btn_width,
         )
@@ -535,7 +810,7 @@ class DataExportConfig:
             self.export_cnf_wndow,
             text="Report required settings to:\n jacob.thoenes@uni-rostock.de",
         )
-        req_text.place(x=7 * btn_width, y=6 * btn_height + 15)
+        req_text.place(x=7 * btn_width, y=10 * btn_height + 15)
 
 
 class WriteScioSpecConfig:
@@ -553,9 +828,38 @@ class WriteScioSpecConfig:
             height=btn_height,
         )
 
-    def write_config(self):
-        set_measurement_config(serial=COM_ScioSpec, ssms=sciospec_measurement_setup)
-        SystemMessageCallback(serial=COM_ScioSpec)
+    def write_config(self) -> bool:
+        """
+        Write the setup to the device, only the parameters that differ from the
+        setup the device was last configured with.
+
+        Returns
+        -------
+        bool
+            True if the device is configured with the setup
+        """
+        # The setup is created with the configuration window, which may not
+        # have been opened yet.
+        load_measurement_setup()
+        configured = sciospec_device_info.configured_setup
+        commands = diff_commands(configured, sciospec_measurement_setup)
+        if not commands:
+            logger.info("The device is already configured with this setup.")
+            return True
+        # Unknown until all commands are acknowledged
+        sciospec_device_info.configured_setup = None
+        try:
+            if isinstance(COM_ScioSpec, ReplayScioSpec):
+                COM_ScioSpec.check_setup(sciospec_measurement_setup)
+            apply_config(COM_ScioSpec, sciospec_measurement_setup, configured)
+        except (TimeoutError, ValueError) as err:
+            logger.error(f"Could not configure the device: {err}")
+            return False
+        sciospec_device_info.configured_setup = dataclasses.replace(
+            sciospec_measurement_setup
+        )
+        logger.info(f"Wrote {len(commands)} configuration commands.")
+        return True
 
 
 class RunMeasurement:
@@ -568,12 +872,28 @@ class RunMeasurement:
             height=btn_height,
         )
 
+        self.mode_dropdown = ttk.Combobox(app, values=acquisition_modes)
+        self.mode_dropdown.current(acquisition_modes.index("stream"))
+        self.mode_dropdown.place(
+            x=spacer, y=450, width=btn_width + spacer, height=btn_height
+        )
+
+        self.stop_btn = Button(
+            app, text="Stop", command=self.stop_measure, state="disabled"
+        )
+        self.stop_btn.place(
+            x=4 * spacer + 6 * btn_width,
+            y=450,
+            width=x_0ff - spacer,
+            height=btn_height,
+        )
+
         # progressbar
         self.progress_bar = ttk.Progressbar(
             app,
             orient="horizontal",
             mode="determinate",
-            length=sciospec_measurement_setup.total_meas_num,
+            length=default_setup["total_meas_num"],
         )
         self.progress_bar.place(
             x=3 * spacer + btn_width,
@@ -592,47 +912,176 @@ class RunMeasurement:
             height=btn_height,
         )
 
-    def measure(self):
-        files_offset = 0
+        self.queue_label = Label(app, text="Queue: 0 | dropped: 0")
+        self.queue_label.place(
+            x=4 * spacer + btn_width + 2 * x_0ff,
+            y=450 + btn_height + spacer,
+            width=x_0ff - 2 * spacer,
+            height=btn_height,
+        )
+
+        self.metrics_label = Label(app, text="", justify="left", anchor=NW)
+        self.metrics_label.place(x=520, y=590, width=150, height=140)
+
+        self.events = queue.Queue()
+        self.worker = None
+        self.live_view = LiveView(app)
+        self.metrics_exporter = MetricsExporter(metrics_config)
+        self.frame_bus = None
+        if frame_bus_config.port is not None:
+            self.frame_bus = FrameBus(frame_bus_config)
+        self.t_metrics = 0.0
+
+    def measure(self, steps: list = None, run_id: str = None, resume: bool = False):
+        # The worker starts from the setup of the window.
+        load_measurement_setup()
+        if not send_config.write_config():
+            return
         self.progress_bar["value"] = 0
-        for i in range(
-            sciospec_measurement_setup.total_meas_num
-            // sciospec_measurement_setup.burst_count
-        ):
-            time.sleep(1)
-            measurement_data_hex = StartStopMeasurement(serial=COM_ScioSpec)
-            measurement_data = del_hex_in_list(measurement_data_hex)
-            # Reshape the full mesaurement buffer. Depending on number of electrodes
-            split_measurement_data = reshape_full_message_in_bursts(
-                measurement_data, sciospec_measurement_setup
-            )
-            measurement_data = split_bursts_in_frames(
-                split_measurement_data, sciospec_measurement_setup
+        self.progress_label["text"] = "0%"
+        self.run_btn["state"] = "disabled"
+        self.stop_btn["state"] = "normal"
+        # The serial connection belongs to the worker until it is done.
+        blink_btn.blnk_btn["state"] = "disabled"
+        send_config.send_cnf_btn["state"] = "disabled"
+        connect_sciospec.connect_interact_button["state"] = "disabled"
+
+        self.worker = MeasurementWorker(
+            serial=COM_ScioSpec,
+            ssms=sciospec_measurement_setup,
+            store_config=store_config,
+            events=self.events,
+            mode=self.mode_dropdown.get(),
+            metrics=Metrics(),
+            steps=steps,
+            run_id=run_id,
+            resume=resume,
+            frame_bus=self.frame_bus,
+        )
+        self.metrics_exporter.track(self.worker.metrics)
+        logger.info(f"Acquisition mode: {self.worker.mode}")
+        self.live_view.reset()
+        self.live_view.open()
+        self.worker.start()
+        app.after(50, self.poll_events)
+
+    def run_sweep(self):
+        """
+        Measure all combinations of the parameter values of a JSON file, e.g.
+        {"exc_freq": [100, 1000, 10000], "inj_skip": [0, 1]}
+        """
+        if self.run_btn["state"] != "normal":
+            logger.warning("Connect and configure the device before a sweep.")
+            return
+        file_name = filedialog.askopenfilename(
+            title="Select sweep", filetypes=[("JSON", "*.json")]
+        )
+        if not file_name:
+            return
+        load_measurement_setup()
+        try:
+            with open(file_name) as file:
+                steps = sweep_steps(sciospec_measurement_setup, **json.load(file))
+        except (OSError, ValueError, TypeError) as err:
+            logger.error(f"Invalid sweep {file_name}: {err}")
+            return
+        logger.info(f"Sweep of {len(steps)} steps from {file_name}")
+        self.measure(steps=steps)
+
+    def resume_run(self):
+        """
+        Continue an interrupted run behind its last stored sample, see
+        `storage.recover_run`.
+        """
+        if self.run_btn["state"] != "normal":
+            logger.warning("Connect and configure the device before resuming a run.")
+            return
+        file_name = filedialog.askopenfilename(
+            title="Select interrupted run",
+            filetypes=[("Run description", "run_*.json")],
+        )
+        if not file_name:
+            return
+        try:
+            info = read_run_info(file_name)
+            # The device is configured like the run, also without a sweep.
+            steps = [setup_from_dict(step) for step in info.get("steps", [])] or [
+                setup_from_dict(info["setup"])
+            ]
+        except (OSError, ValueError, KeyError, TypeError) as err:
+            logger.error(f"Invalid run description {file_name}: {err}")
+            return
+        if info.get("finished"):
+            logger.warning(f"Run {info['run_id']} is already finished.")
+            return
+        store_config.s_path = os.path.join(os.path.dirname(file_name), "")
+        store_config.save_format = info["save_format"]
+        logger.info(f"Resuming run {info['run_id']} from {file_name}")
+        self.measure(steps=steps, run_id=info["run_id"], resume=True)
+
+    def stop_measure(self):
+        if self.worker is not None:
+            logger.info("Stopping measurement after the current block.")
+            self.worker.stop()
+            self.stop_btn["state"] = "disabled"
+
+    def poll_events(self):
+        progress = None
+        while True:
+            try:
+                kind, payload = self.events.get_nowait()
+            except queue.Empty:
+                break
+
+            if kind == "progress":
+                # Only the latest progress of this poll is drawn.
+                progress = payload
+            elif kind == "burst":
+                # The live view draws the latest burst on its own schedule.
+                self.live_view.show(payload[1])
+            elif kind == "error":
+                logger.error(f"Measurement aborted: {payload!r}")
+            elif kind == "done":
+                self.finish_measure(n_samples=payload)
+                return
+
+        if progress is not None:
+            done, total = progress
+            self.progress_bar["value"] = 100 * done / total
+            self.progress_label["text"] = str(int(self.progress_bar["value"])) + "%"
+        if self.worker.writer is not None:
+            self.queue_label["text"] = (
+                f"Queue: {self.worker.writer.depth} | "
+                f"dropped: {self.worker.writer.n_dropped}"
             )
-
-            for bursts in measurement_data:
-                np.savez(
-                    store_config.s_path + "sample_{0:06d}.npz".format(files_offset),
-                    config=sciospec_measurement_setup,
-                    data=bursts,
-                )
-                files_offset += 1
-
-            SystemMessageCallback(COM_ScioSpec, prnt_msg=False)
-
-            print(f"{i=}")
-            self.progress_bar["value"] += 100 / (
-                sciospec_measurement_setup.total_meas_num
-                // sciospec_measurement_setup.burst_count
+        if time.perf_counter() - self.t_metrics > 0.5:
+            self.metrics_label["text"] = self.worker.metrics.summary()
+            self.t_metrics = time.perf_counter()
+        app.after(50, self.poll_events)
+
+    def finish_measure(self, n_samples: int):
+        stopped = self.worker.stopped
+        # A sweep leaves the device configured with its last step.
+        configured = self.worker.configured_setup
+        sciospec_device_info.configured_setup = (
+            None if configured is None else dataclasses.replace(configured)
+        )
+        self.metrics_exporter.untrack()
+        self.metrics_label["text"] = self.worker.metrics.summary()
+        if self.worker.writer is not None and self.worker.writer.n_dropped:
+            logger.warning(
+                f"Dropped {self.worker.writer.n_dropped} bursts, "
+                f"maximum queue depth {self.worker.writer.max_depth}."
             )
-            self.progress_label["text"] = str(int(self.progress_bar["value"])) + "%"
-            app.update_idletasks()
-            if (
-                self.progress_bar["value"]
-                == sciospec_measurement_setup.total_meas_num * 100
-            ):
-                messagebox.showinfo(message="The progress completed!")
-                self.progress_bar["value"] = 0
+        self.worker = None
+        self.run_btn["state"] = "normal"
+        self.stop_btn["state"] = "disabled"
+        blink_btn.blnk_btn["state"] = "normal"
+        send_config.send_cnf_btn["state"] = "normal"
+        connect_sciospec.connect_interact_button["state"] = "normal"
+        logger.info(f"Saved {n_samples} samples to {store_config.s_path}.")
+        if not stopped and self.progress_bar["value"] >= 100:
+            messagebox.showinfo(message="The progress completed!")
         self.progress_bar["value"] = 0
 
 
@@ -646,7 +1095,7 @@ app.grid()
 try:
     app.iconbitmap("../images/ico_sciopy.ico")
 except BaseException:
-    print("\t tkinter.TclError: bitmap not defined")
+    logger.debug("tkinter.TclError: bitmap not defined")
 
 connect_sciospec = ScioSpecConnect(app)
 scio_spec_config = ScioSpecConfig(app)
@@ -659,21 +1108,37 @@ blink_btn = BlinkBtn(app)
 run_measurement = RunMeasurement(app)
 
 
-LOG = Log(app)
-sys.stdout = LOG
+LOG = Log(app, log_buffer, max_lines=log_config.max_lines)
+# Output of libraries that print, e.g. sciopy, ends up in the log as well.
+sys.stdout = StreamToLogger(logging.getLogger("stdout"))
 
 
 dropdown = Menu(app)
 datei_menu = Menu(dropdown, tearoff=0)
+view_menu = Menu(dropdown, tearoff=0)
 help_menu = Menu(dropdown, tearoff=0)
 
+datei_menu.add_command(label="Run sweep...", command=run_measurement.run_sweep)
+datei_menu.add_command(label="Resume run...", command=run_measurement.resume_run)
+datei_menu.add_command(label="Replay run...", command=connect_sciospec.select_replay)
 datei_menu.add_separator()
 datei_menu.add_command(label="Exit", command=app.quit)
 help_menu.add_command(label="Info", command=action_get_info_dialog)
+view_menu.add_command(label="Live view", command=run_measurement.live_view.open)
 dropdown.add_cascade(label="File", menu=datei_menu)
+dropdown.add_cascade(label="View", menu=view_menu)
 dropdown.add_cascade(label="Help", menu=help_menu)
 
 
 app.config(menu=dropdown)
 app.geometry("680x800")
+
+# Probing the hardware may take seconds, the window is shown meanwhile.
+threading.Thread(target=detect_monitor, daemon=True).start()
+connect_sciospec.refresh_ports()
+app.after_idle(log_startup)
 app.mainloop()
+run_measurement.metrics_exporter.close()
+if run_measurement.frame_bus is not None:
+    run_measurement.frame_bus.close()
+log_listener.stop()
@@ -0,0 +1,252 @@
+import bisect
+import json
+import logging
+import logging.handlers
+import threading
+import time
+from contextlib import contextmanager
+
+from workingvariables import MetricsConfig
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the latency histograms in seconds
+latency_buckets = [
+    scale * 10.0**exp for exp in range(-5, 1) for scale in (1.0, 2.5, 5.0)
+] + [10.0]
+
+
+class Histogram:
+    """
+    Latency histogram with fixed buckets, see `latency_buckets`.
+    """
+
+    def __init__(self, buckets: list = latency_buckets) -> None:
+        self.buckets = buckets
+        # The last count holds all values above the largest bucket.
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """
+        Upper bound of the bucket holding the quantile `q`.
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            if cumulative >= rank:
+                return min(bound, self.max)
+        return self.max
+
+
+class Metrics:
+    """
+    Counters and per-stage latency histograms of the acquisition pipeline.
+
+    All methods are thread-safe, the acquisition and the writer thread record
+    into the same instance.
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.t_start = time.time()
+
+    def count(self, name: str, value: int = 1) -> None:
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, stage: str, seconds: float) -> None:
+        with self.lock:
+            if stage not in self.histograms:
+                self.histograms[stage] = Histogram()
+            self.histograms[stage].observe(seconds)
+
+    @contextmanager
+    def timer(self, stage: str):
+        """
+        Record the run time of the enclosed block as latency of `stage`.
+        """
+        t_start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - t_start)
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {
+                "time": time.time(),
+                "uptime_s": time.time() - self.t_start,
+                "counters": dict(self.counters),
+                "stages": {
+                    stage: {
+                        "count": hist.count,
+                        "sum_s": hist.sum,
+                        "p50_s": hist.quantile(0.5),
+                        "p99_s": hist.quantile(0.99),
+                        "max_s": hist.max,
+                    }
+                    for stage, hist in self.histograms.items()
+                },
+            }
+
+    def summary(self) -> str:
+        """
+        Short multi-line overview for the GUI.
+        """
+        snapshot = self.snapshot()
+        counters = snapshot["counters"]
+        lines = [
+            f"bursts: {counters.get('bursts', 0)} "
+            f"dropped: {counters.get('dropped', 0)}",
+            f"read: {counters.get('bytes_read', 0) / 2**20:.1f} MiB",
+        ]
+        if counters.get("bytes_compressed"):
+            ratio = counters["bytes_raw"] / counters["bytes_compressed"]
+            lines.append(f"compression ratio: {ratio:.2f}")
+        lines.append("p50/p99 latency [ms]")
+        for stage, stats in snapshot["stages"].items():
+            lines.append(
+                f"{stage}: {1000 * stats['p50_s']:.4g}/{1000 * stats['p99_s']:.4g}"
+            )
+        return "\n".join(lines)
+
+    def to_prometheus(self, prefix: str = "sciospec") -> str:
+        """
+        Counters and histograms in the Prometheus text exposition format.
+        """
+        lines = []
+        with self.lock:
+            for name, value in sorted(self.counters.items()):
+                lines.append(f"# TYPE {prefix}_{name}_total counter")
+                lines.append(f"{prefix}_{name}_total {value}")
+            name = f"{prefix}_stage_latency_seconds"
+            lines.append(f"# TYPE {name} histogram")
+            for stage, hist in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, count in zip(hist.buckets, hist.counts):
+                    cumulative += count
+                    lines.append(
+                        f'{name}_bucket{{stage="{stage}",le="{bound:g}"}} {cumulative}'
+                    )
+                lines.append(f'{name}_bucket{{stage="{stage}",le="+Inf"}} {hist.count}')
+                lines.append(f'{name}_sum{{stage="{stage}"}} {hist.sum}')
+                lines.append(f'{name}_count{{stage="{stage}"}} {hist.count}')
+        return "\n".join(lines) + "\n"
+
+
+class MetricsExporter:
+    """
+    Writes snapshots of the tracked metrics to a rolling log file and serves
+    them on a local Prometheus text endpoint.
+
+    Parameters
+    ----------
+    config : MetricsConfig
+        export configuration, no file is written if `log_file` is None and no
+        endpoint is served if `prometheus_port` is None
+    """
+
+    def __init__(self, config: MetricsConfig) -> None:
+        self.config = config
+        self.metrics = Metrics()
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.server = None
+
+        self.logger = logging.getLogger("sciospecgui.metrics")
+        self.logger.propagate = False
+        self.logger.setLevel(logging.INFO)
+        self.handler = None
+        if config.log_file:
+            self.handler = logging.handlers.RotatingFileHandler(
+                config.log_file,
+                maxBytes=config.max_bytes,
+                backupCount=config.backup_count,
+                delay=True,
+            )
+            self.logger.addHandler(self.handler)
+
+        if config.prometheus_port is not None:
+            # Only imported if needed, it slows down the start of the GUI.
+            import http.server
+
+            exporter = self
+
+            class Handler(http.server.BaseHTTPRequestHandler):
+                def do_GET(self):
+                    if self.path != "/metrics":
+                        self.send_error(404)
+                        return
+                    body = exporter.metrics.to_prometheus().encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/plain; version=0.0.4")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, *args):
+                    pass
+
+            self.server = http.server.ThreadingHTTPServer(
+                ("127.0.0.1", config.prometheus_port), Handler
+            )
+            threading.Thread(
+                target=self.server.serve_forever, name="MetricsServer", daemon=True
+            ).start()
+            logger.info(
+                "Serving metrics on http://127.0.0.1:%d/metrics",
+                self.server.server_address[1],
+            )
+
+    def track(self, metrics: Metrics) -> None:
+        """
+        Export `metrics` until `untrack` is called.
+        """
+        self.untrack()
+        self.metrics = metrics
+        self.stop_event.clear()
+        if self.handler is not None:
+            self.thread = threading.Thread(
+                target=self.run, name="MetricsExporter", daemon=True
+            )
+            self.thread.start()
+
+    def untrack(self) -> None:
+        """
+        Stop logging after a final snapshot, the endpoint keeps the last values.
+        """
+        if self.thread is not None:
+            self.stop_event.set()
+            self.thread.join()
+            self.thread = None
+
+    def run(self) -> None:
+        while not self.stop_event.wait(self.config.interval):
+            self.log()
+        self.log()
+
+    def log(self) -> None:
+        self.logger.info(json.dumps(self.metrics.snapshot()))
+
+    def close(self) -> None:
+        self.untrack()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+        if self.handler is not None:
+            self.logger.removeHandler(self.handler)
+            self.handler.close()
@@ -0,0 +1,225 @@
+"""
+Named configuration profiles of the measurement setup.
+
+A profile is a JSON file `profiles/<name>.json`:
+
+    {
+        "version": 1,
+        "name": "tank_16",
+        "setup": {
+            "total_meas_num": 100,
+            "burst_count": 1,
+            "n_el": 16,
+            "exc_freq": 10000,
+            "framerate": 5,
+            "amplitude": 0.001,
+            "inj_skip": 0,
+            "gain": 1,
+            "adc_range": 1
+        }
+    }
+
+The amplitude is given in A like in the run description. Profiles written by
+hand may also be TOML files `profiles/<name>.toml` with the same keys. Every
+profile is validated against the ranges of the device when it is saved and
+loaded, see `validate_setup`.
+"""
+import json
+import logging
+import os
+
+from deviceconfig import AMPLITUDE_MAX, AMPLITUDE_MIN, adc_ranges, gains
+
+logger = logging.getLogger(__name__)
+
+try:
+    import tomllib
+except ImportError:
+    tomllib = None
+    logger.info("Could not import module: tomllib")
+
+PROFILE_VERSION = 1
+PROFILE_DIR = "profiles/"
+# Setup set by the configuration window, restored at the next start
+LAST_PROFILE = "last"
+
+n_el_options = [16, 32, 48, 64]
+
+# Fields of `ScioSpecMeasurementSetup` stored in a profile, the channel groups
+# follow from the number of electrodes.
+setup_fields = {
+    "total_meas_num": int,
+    "burst_count": int,
+    "n_el": int,
+    "exc_freq": float,
+    "framerate": float,
+    "amplitude": float,
+    "inj_skip": int,
+    "gain": int,
+    "adc_range": int,
+}
+
+
+def setup_errors(setup: dict) -> list:
+    """
+    Violations of the device ranges, an empty list if the setup is valid.
+    """
+    missing = [name for name in setup_fields if name not in setup]
+    if missing:
+        return [f"missing fields {', '.join(missing)}"]
+    errors = []
+    for name, kind in setup_fields.items():
+        value = setup[name]
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            errors.append(f"{name} is not a number: {value!r}")
+        elif kind is int and value != int(value):
+            errors.append(f"{name} is not an integer: {value!r}")
+    if errors:
+        return errors
+
+    if setup["total_meas_num"] < 1:
+        errors.append("total_meas_num must be at least 1")
+    if not 1 <= setup["burst_count"] <= 10:
+        errors.append("burst_count must be 1 to 10")
+    if setup["n_el"] not in n_el_options:
+        errors.append(f"n_el must be one of {n_el_options}")
+    if not 100 <= setup["exc_freq"] <= 1e6:
+        errors.append("exc_freq must be 100 Hz to 1 MHz")
+    if setup["framerate"] <= 0:
+        errors.append("framerate must be positive")
+    if not AMPLITUDE_MIN <= setup["amplitude"] <= AMPLITUDE_MAX:
+        errors.append(f"amplitude must be {AMPLITUDE_MIN} A to {AMPLITUDE_MAX} A")
+    if not 0 <= setup["inj_skip"] < setup["n_el"] // 2:
+        errors.append("inj_skip must be 0 to n_el/2 - 1")
+    if setup["adc_range"] not in adc_ranges:
+        errors.append(f"adc_range must be one of {list(adc_ranges)}")
+    if setup["gain"] not in gains:
+        errors.append(f"gain must be one of {list(gains)}")
+    return errors
+
+
+def validate_setup(setup: dict) -> dict:
+    """
+    Check a setup against the ranges of the device.
+
+    Parameters
+    ----------
+    setup : dict
+        fields of `ScioSpecMeasurementSetup`, the amplitude in A
+
+    Returns
+    -------
+    dict
+        the profile fields of the setup, converted to their types, and the
+        notes
+
+    Raises
+    ------
+    ValueError
+        listing every violated range
+    """
+    errors = setup_errors(setup)
+    if errors:
+        raise ValueError("Invalid setup: " + "; ".join(errors))
+    validated = {name: kind(setup[name]) for name, kind in setup_fields.items()}
+    validated["notes"] = setup.get("notes")
+    return validated
+
+
+def profile_path(name: str, directory: str = PROFILE_DIR) -> str:
+    """
+    File of a profile, `name` may also be the path of a profile file.
+    """
+    if name.endswith((".json", ".toml")) or os.sep in name:
+        return name
+    toml_file = os.path.join(directory, name + ".toml")
+    if os.path.exists(toml_file):
+        return toml_file
+    return os.path.join(directory, name + ".json")
+
+
+def list_profiles(directory: str = PROFILE_DIR) -> list:
+    """
+    Names of the saved profiles.
+    """
+    if not os.path.isdir(directory):
+        return []
+    return sorted(
+        {
+            os.path.splitext(file_name)[0]
+            for file_name in os.listdir(directory)
+            if file_name.endswith((".json", ".toml"))
+        }
+    )
+
+
+def save_profile(name: str, setup: dict, directory: str = PROFILE_DIR) -> str:
+    """
+    Validate a setup and save it as profile.
+
+    Parameters
+    ----------
+    name : str
+        name of the profile
+    setup : dict
+        fields of `ScioSpecMeasurementSetup`, e.g. `dataclasses.asdict(ssms)`
+    directory : str
+        directory of the profiles
+
+    Returns
+    -------
+    str
+        path of the profile file
+    """
+    if not name or os.sep in name or name.startswith("."):
+        raise ValueError(f"Invalid profile name {name!r}")
+    profile = {
+        "version": PROFILE_VERSION,
+        "name": name,
+        "setup": validate_setup(setup),
+    }
+    os.makedirs(directory, exist_ok=True)
+    file_name = os.path.join(directory, name + ".json")
+    with open(file_name + ".tmp", "w") as file:
+        json.dump(profile, file, indent=2)
+    os.replace(file_name + ".tmp", file_name)
+    return file_name
+
+
+def load_profile(name: str, directory: str = PROFILE_DIR) -> dict:
+    """
+    Load and validate the setup of a profile.
+
+    Parameters
+    ----------
+    name : str
+        name of the profile or path of a profile file
+    directory : str
+        directory of the profiles
+
+    Returns
+    -------
+    dict
+        setup of the profile, see `validate_setup`
+    """
+    file_name = profile_path(name, directory)
+    if file_name.endswith(".toml"):
+        if tomllib is None:
+            raise ImportError("Reading TOML profiles requires Python 3.11.")
+        with open(file_name, "rb") as file:
+            profile = tomllib.load(file)
+    else:
+        with open(file_name) as file:
+            profile = json.load(file)
+    version = profile.get("version")
+    if not isinstance(version, int) or "setup" not in profile:
+        raise ValueError(f"{file_name} is not a configuration profile.")
+    if version > PROFILE_VERSION:
+        raise ValueError(
+            f"{file_name} has version {version}, "
+            f"only versions up to {PROFILE_VERSION} are supported."
+        )
+    try:
+        return validate_setup(profile["setup"])
+    except ValueError as err:
+        raise ValueError(f"{file_name}: {err}") from None
@@ -0,0 +1,372 @@
+"""
+Reconstruction of conductivity images during the acquisition.
+
+The difference of every stored burst to the reference of the online
+statistics (see `runstats.OnlineStats`) is reconstructed with the one-step
+Gauss-Newton solver (JAC) of pyeit. The reconstruction matrix only depends on
+the number of electrodes, the injection skip and the solver parameters. It is
+computed once per configuration and cached on disk under the hash of the
+configuration, so pyeit is only imported when a configuration is new.
+
+The measurement selection, i.e. the voltage between neighbouring electrodes
+`(N, M)` of every excitation stage, and the normalisation by the reference are
+folded into the matrix. A batch of bursts is then reconstructed with a single
+matrix multiplication on the real parts of the channel values:
+
+    images = np.real(differences).reshape(n_bursts, -1) @ matrix.T
+
+The images are appended as float32 rows to `run_<run_id>_images.f32`, the
+sample of every image to `run_<run_id>_images.idx`, see `load_images`.
+"""
+import hashlib
+import json
+import logging
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
+
+import numpy as np
+
+from metrics import Metrics
+from workingvariables import ReconstructionConfig
+
+logger = logging.getLogger(__name__)
+
+RECONSTRUCTION_VERSION = 1
+
+
+def matrix_key(n_el: int, inj_skip: int, config: ReconstructionConfig) -> dict:
+    """
+    Everything the reconstruction matrix depends on.
+    """
+    return {
+        "version": RECONSTRUCTION_VERSION,
+        "n_el": int(n_el),
+        "inj_skip": int(inj_skip),
+        "h0": config.h0,
+        "p": config.p,
+        "lamb": config.lamb,
+        "method": config.method,
+    }
+
+
+def config_hash(key: dict) -> str:
+    return hashlib.sha1(json.dumps(key, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def compute_matrix(n_el: int, inj_skip: int, config: ReconstructionConfig) -> dict:
+    """
+    Mesh, measurement pattern and JAC matrix of a configuration, see
+    `load_matrix`.
+    """
+    try:
+        import pyeit.eit.protocol as protocol
+        import pyeit.mesh as mesh
+        from pyeit.eit.jac import JAC
+    except ImportError:
+        raise ImportError(
+            "Computing the reconstruction requires the module pyeit, "
+            "see requirements-optional.txt."
+        ) from None
+
+    eit_mesh = mesh.create(n_el, h0=config.h0)
+    # The device injects from electrode v to (v + inj_skip) % n_el + 1.
+    eit_protocol = protocol.create(
+        n_el, dist_exc=inj_skip + 1, step_meas=1, parser_meas="std"
+    )
+    solver = JAC(eit_mesh, eit_protocol)
+    solver.setup(
+        p=config.p,
+        lamb=config.lamb,
+        method=config.method,
+        perm=1,
+        jac_normalized=config.normalize,
+    )
+    meas_mat = eit_protocol.meas_mat
+    return {
+        "H": solver.H.astype(np.float32),
+        "node": eit_mesh.node,
+        "element": eit_mesh.element,
+        "el_pos": eit_mesh.el_pos,
+        # Excitation stage and the electrodes N, M of every measurement
+        "exc": np.repeat(np.arange(len(meas_mat)), meas_mat.shape[1]),
+        "n": meas_mat[:, :, 0].ravel(),
+        "m": meas_mat[:, :, 1].ravel(),
+    }
+
+
+def load_matrix(n_el: int, inj_skip: int, config: ReconstructionConfig) -> dict:
+    """
+    Reconstruction matrix of a configuration from the cache, computed and
+    cached if the configuration is new.
+
+    Parameters
+    ----------
+    n_el : int
+        number of electrodes
+    inj_skip : int
+        injection skip
+    config : ReconstructionConfig
+        mesh and solver parameters and the cache directory
+
+    Returns
+    -------
+    dict
+        "H" (n_elements, n_measurements), the mesh "node", "element" and
+        "el_pos", the measurement pattern "exc", "n", "m" and the "hash" of
+        the configuration
+    """
+    key = matrix_key(n_el, inj_skip, config)
+    key_hash = config_hash(key)
+    file_name = os.path.join(config.cache_dir, f"jac_{key_hash}.npz")
+    if os.path.exists(file_name):
+        with np.load(file_name) as cached:
+            matrix = dict(cached)
+        matrix.pop("key", None)
+    else:
+        logger.info(f"Computing the reconstruction matrix {key}")
+        matrix = compute_matrix(n_el, inj_skip, config)
+        os.makedirs(config.cache_dir, exist_ok=True)
+        # Written atomically, several processes may share the cache.
+        with open(file_name + ".tmp", "wb") as file:
+            np.savez(file, key=json.dumps(key), **matrix)
+        os.replace(file_name + ".tmp", file_name)
+    matrix["hash"] = key_hash
+    return matrix
+
+
+def difference_matrix(
+    matrix: dict, reference: np.ndarray, normalize: bool = True
+) -> np.ndarray:
+    """
+    Matrix that maps the real part of the difference of a burst to the
+    reference onto the image.
+
+    Parameters
+    ----------
+    matrix : dict
+        reconstruction matrix, see `load_matrix`
+    reference : np.ndarray
+        reference burst, shape (n_el, n_channels)
+    normalize : bool
+        divide the voltage differences by the reference voltages
+
+    Returns
+    -------
+    np.ndarray
+        shape (n_elements, n_el * n_channels)
+    """
+    n_el, n_channels = reference.shape
+    if n_channels != n_el:
+        raise ValueError(
+            f"The reconstruction needs one channel per electrode, "
+            f"not {n_channels} channels for {n_el} electrodes."
+        )
+    exc, n, m = matrix["exc"], matrix["n"], matrix["m"]
+    # Solution -H dv of the solver, the voltage of a measurement is v_n - v_m
+    weights = -matrix["H"].astype(np.float64)
+    if normalize:
+        reference = np.real(reference)
+        v0 = np.abs(reference[exc, n] - reference[exc, m])
+        weights = weights * np.divide(1.0, v0, out=np.zeros_like(v0), where=v0 > 0)
+    result = np.zeros((len(weights), n_el * n_channels))
+    np.add.at(result.T, exc * n_channels + n, weights.T)
+    np.add.at(result.T, exc * n_channels + m, -weights.T)
+    return result.astype(np.float32)
+
+
+def reconstruct(matrix: np.ndarray, differences: np.ndarray) -> np.ndarray:
+    """
+    Images of a batch of differences, shape (n_bursts, n_el, n_channels).
+    """
+    batch = np.real(differences).reshape(len(differences), -1)
+    return batch.astype(np.float32) @ matrix.T
+
+
+class Reconstructor:
+    """
+    Reconstruction stage of the acquisition pipeline.
+
+    The differences passed to `add` are collected into batches of
+    `config.batch_size`, reconstructed on a thread pool and written in order.
+
+    Parameters
+    ----------
+    s_path : str
+        save path of the run
+    run_id : str
+        identifier of the run
+    config : ReconstructionConfig
+        mesh, solver and batch parameters
+    metrics : Metrics, optional
+        receives the latency of every batch as "reconstruct" and the number
+        of "images"
+    """
+
+    def __init__(
+        self,
+        s_path: str,
+        run_id: str,
+        config: ReconstructionConfig = None,
+        metrics: Metrics = None,
+    ) -> None:
+        self.config = config if config is not None else ReconstructionConfig()
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.s_path = s_path
+        self.run_id = run_id
+        self.files = {
+            "images": f"run_{run_id}_images.f32",
+            "index": f"run_{run_id}_images.idx",
+            "mesh": f"run_{run_id}_mesh.npz",
+        }
+        self.pool = ThreadPoolExecutor(
+            self.config.n_workers, thread_name_prefix="Reconstruction"
+        )
+        self.pending = deque()
+        self.samples = []
+        self.differences = []
+        self.steps = []
+        self.matrix = None
+        self.weights = None
+        self.image_file = None
+        self.index_file = None
+        self.n_images = 0
+        self.closed = False
+
+    def next_step(self, n_el: int, inj_skip: int) -> None:
+        """
+        Start the next sweep step, its images need a new reference.
+        """
+        self.submit()
+        self.matrix = load_matrix(n_el, inj_skip, self.config)
+        self.weights = None
+        self.steps.append({"inj_skip": int(inj_skip), "matrix": self.matrix["hash"]})
+
+    def add(self, sample: int, difference: np.ndarray, reference: np.ndarray) -> None:
+        """
+        Reconstruct the difference of a sample to the reference of its step.
+        """
+        if self.weights is None:
+            self.weights = difference_matrix(
+                self.matrix, reference, self.config.normalize
+            )
+            if self.image_file is None:
+                self.open_files()
+        self.samples.append(sample)
+        self.differences.append(difference)
+        if len(self.samples) >= self.config.batch_size:
+            self.submit()
+        self.write_finished()
+
+    def open_files(self) -> None:
+        np.savez(
+            os.path.join(self.s_path, self.files["mesh"]),
+            node=self.matrix["node"],
+            element=self.matrix["element"],
+            el_pos=self.matrix["el_pos"],
+        )
+        # A resumed run appends its images behind the last complete one.
+        image_name = os.path.join(self.s_path, self.files["images"])
+        index_name = os.path.join(self.s_path, self.files["index"])
+        row_size = 4 * len(self.matrix["H"])
+        self.image_file = open(image_name, "ab")
+        self.index_file = open(index_name, "ab")
+        n_images = min(self.image_file.tell() // row_size, self.index_file.tell() // 8)
+        self.image_file.truncate(n_images * row_size)
+        self.index_file.truncate(n_images * 8)
+
+    def submit(self) -> None:
+        if not self.samples:
+            return
+        samples = np.array(self.samples, dtype="<u8")
+        differences = np.stack(self.differences)
+        self.samples, self.differences = [], []
+        self.pending.append(
+            (samples, self.pool.submit(self.reconstruct, self.weights, differences))
+        )
+
+    def reconstruct(self, weights: np.ndarray, differences: np.ndarray) -> np.ndarray:
+        with self.metrics.timer("reconstruct"):
+            return reconstruct(weights, differences)
+
+    def write_finished(self, wait: bool = False) -> None:
+        """
+        Write the reconstructed batches in order.
+        """
+        while self.pending and (wait or self.pending[0][1].done()):
+            samples, future = self.pending.popleft()
+            images = future.result()
+            self.image_file.write(images.astype("<f4").tobytes())
+            self.index_file.write(samples.tobytes())
+            self.n_images += len(samples)
+            self.metrics.count("images", len(samples))
+
+    def close(self) -> dict:
+        """
+        Reconstruct the remaining samples and close the files.
+
+        Returns
+        -------
+        dict
+            "images" entry of the run description
+        """
+        if not self.closed:
+            self.closed = True
+            try:
+                self.submit()
+                self.write_finished(wait=True)
+            finally:
+                self.pool.shutdown()
+                for file in (self.image_file, self.index_file):
+                    if file is not None:
+                        file.close()
+                self.image_file = self.index_file = None
+            logger.info(f"Reconstructed {self.n_images} images.")
+        n_elements = 0 if self.matrix is None else len(self.matrix["H"])
+        return {
+            **self.files,
+            "n_images": self.n_images,
+            "n_elements": n_elements,
+            "steps": self.steps,
+            "reconstruction": asdict(self.config),
+        }
+
+
+def load_images(file_name: str) -> tuple:
+    """
+    Images reconstructed during a run.
+
+    Parameters
+    ----------
+    file_name : str
+        path of the `run_<run_id>.json` file
+
+    Returns
+    -------
+    tuple
+        sample of every image, images of shape (n_images, n_elements) mapped
+        with `np.memmap` and the mesh with "node", "element" and "el_pos"
+    """
+    with open(file_name) as file:
+        info = json.load(file)
+    if "images" not in info:
+        raise ValueError(f"{file_name} does not contain reconstructed images.")
+    images = info["images"]
+    path = os.path.dirname(file_name)
+    samples = np.fromfile(os.path.join(path, images["index"]), dtype="<u8")
+    image_file = os.path.join(path, images["images"])
+    n_images = min(
+        len(samples), os.path.getsize(image_file) // (4 * images["n_elements"])
+    )
+    if n_images == 0:
+        data = np.zeros((0, images["n_elements"]), dtype="<f4")
+    else:
+        data = np.memmap(
+            image_file,
+            dtype="<f4",
+            mode="r",
+            shape=(n_images, images["n_elements"]),
+        )
+    with np.load(os.path.join(path, images["mesh"])) as mesh:
+        return samples[:n_images], data, dict(mesh)
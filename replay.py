@@ -0,0 +1,249 @@
+"""
+Replay of recorded runs through the acquisition pipeline.
+
+`ReplayScioSpec` has the interface of `serial.Serial` like the simulated
+device, but sends the bursts of a recorded run. It is selected with the port
+
+    REPLAY:data/run_<run_id>.json,speed=0
+
+and connected with `acquisition.connect_port`, so parsing, storage, online
+statistics and the live view run exactly as with a device. Raw captures are
+replayed byte by byte as they were received, including skipped bytes and
+system messages between the frames. The samples of the other save formats
+are encoded to measurement frames again.
+
+`speed` 1 replays in real time following the recorded device timestamps,
+larger values accelerate the replay, 0 sends the bursts as fast as possible.
+`loop=1` starts over at the end of the run.
+"""
+from __future__ import annotations
+
+import logging
+import time
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from frameparser import MEASUREMENT_TAG, MSG_LEN, N_CH
+from runreader import RunReader
+from simdevice import SimulatedScioSpec, frame_dtype, parse_options
+
+if TYPE_CHECKING:
+    from sciopy.sciopy_dataclasses import ScioSpecMeasurementSetup
+
+logger = logging.getLogger(__name__)
+
+REPLAY_PORT = "REPLAY"
+
+
+def is_replay(port: str) -> bool:
+    return port.upper().startswith(REPLAY_PORT + ":")
+
+
+def parse_replay_port(port: str) -> tuple:
+    """
+    Read the run and the options of a replay port, e.g.
+    "REPLAY:data/run_<run_id>.json,speed=10,loop=1".
+
+    Parameters
+    ----------
+    port : str
+        port name
+
+    Returns
+    -------
+    tuple
+        path of the run description and keyword arguments of `ReplayScioSpec`
+    """
+    _, _, opts = port.partition(":")
+    file_name, *opts = opts.split(",")
+    return file_name, parse_options(opts)
+
+
+def encode_bursts(
+    data: np.ndarray,
+    timestamps: np.ndarray,
+    excitation_stgs: np.ndarray,
+    channel_group: list,
+) -> bytes:
+    """
+    Measurement frames of a run of bursts, in the order the device sends them.
+
+    Parameters
+    ----------
+    data : np.ndarray
+        complex channel values, shape (n_bursts, n_el, 16 * len(channel_group))
+    timestamps : np.ndarray
+        timestamps, shape (n_bursts, n_el)
+    excitation_stgs : np.ndarray
+        excitation settings, shape (n_bursts, n_el, 2)
+    channel_group : list
+        channel groups of the columns of `data`
+
+    Returns
+    -------
+    bytes
+        `n_bursts * n_el * len(channel_group)` frames of length `MSG_LEN`
+    """
+    n_bursts, n_el, _ = data.shape
+    n_cg = len(channel_group)
+    frames = np.zeros((n_bursts, n_el, n_cg), dtype=frame_dtype)
+    frames["tag"] = frames["end"] = MEASUREMENT_TAG
+    frames["len"] = MSG_LEN - 3
+    frames["cg"] = channel_group
+    frames["es"] = excitation_stgs[:, :, np.newaxis, :]
+    # The timestamp of a stage is the one of its last channel group.
+    frames["ts"] = timestamps[:, :, np.newaxis]
+    frames["ch"] = data.reshape(n_bursts, n_el, n_cg, N_CH)
+    return frames.tobytes()
+
+
+class ReplayScioSpec(SimulatedScioSpec):
+    """
+    Sends the bursts of a recorded run instead of simulated ones.
+
+    All commands are acknowledged and the burst count is evaluated like by
+    `SimulatedScioSpec`. Every start command continues behind the last sent
+    burst. At the end of the run, the replay stops or starts over.
+
+    Parameters
+    ----------
+    file_name : str
+        path of the `run_<run_id>.json` file
+    port : str
+        port name
+    speed : float
+        factor to the recorded timing, 0 sends the bursts as fast as possible
+    loop : bool
+        start over at the end of the run
+    timeout : float
+        read timeout in seconds
+    chunk_size : int
+        number of bursts loaded at once
+    """
+
+    def __init__(
+        self,
+        file_name: str,
+        port: str = REPLAY_PORT,
+        speed: float = 1.0,
+        loop: bool = False,
+        timeout: float = 1.0,
+        chunk_size: int = 64,
+    ) -> None:
+        super().__init__(port=port, speed=speed, timeout=timeout)
+        self.reader = RunReader(file_name)
+        if len(self.reader) == 0:
+            raise ValueError(f"{file_name} does not contain any samples.")
+        self.loop = bool(loop)
+        self.chunk_size = chunk_size
+        self.channel_group = self.reader.info["setup"]["channel_group"]
+        # Seconds since the first sample, a resumed run restarts the clock.
+        self.times = np.maximum.accumulate(self.reader.elapsed())
+        n_samples = len(self.times)
+        period = self.times[-1] / (n_samples - 1) if n_samples > 1 else 0.0
+        self.duration = self.times[-1] + period
+        # Next sample to send and the first sample after the last start
+        self.position = 0
+        self.first = 0
+        self.chunk_start = -1
+        self.chunk = b""
+        self.bounds = np.zeros(1, dtype=np.int64)
+
+    @classmethod
+    def from_port(cls, port: str):
+        """
+        Create the replay described by the port name.
+        """
+        file_name, options = parse_replay_port(port)
+        return cls(file_name, port=port, **options)
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def check_setup(self, ssms: ScioSpecMeasurementSetup) -> None:
+        """
+        Raise a ValueError if the setup does not match the recorded run, the
+        replayed frames would not fit the bursts of the parser.
+        """
+        n_el = self.reader.info["setup"]["n_el"]
+        if ssms.n_el != n_el or list(ssms.channel_group) != list(self.channel_group):
+            raise ValueError(
+                f"{self.reader.file_name} was recorded with {n_el} electrodes "
+                f"and channel groups {list(self.channel_group)}, not with "
+                f"{ssms.n_el} electrodes and channel groups {list(ssms.channel_group)}."
+            )
+
+    def close(self) -> None:
+        super().close()
+        self.reader.close()
+
+    def start(self) -> None:
+        self.measuring = True
+        self.bursts_sent = 0
+        self.first = self.position
+        self.t_start = time.perf_counter()
+
+    def replay_time(self, position: int) -> float:
+        """
+        Recorded time of the `position`-th sent sample, counting every loop.
+        """
+        n_loops, sample = divmod(position, len(self))
+        return n_loops * self.duration + self.times[sample]
+
+    def next_burst_due(self) -> float:
+        if not self.measuring or self.speed <= 0:
+            return time.perf_counter()
+        elapsed = self.replay_time(self.position) - self.replay_time(self.first)
+        return self.t_start + elapsed / self.speed
+
+    def produce(self) -> None:
+        """
+        Append all bursts that are due until now to the output buffer.
+        """
+        while self.measuring:
+            if self.burst_count and self.bursts_sent >= self.burst_count:
+                self.measuring = False
+            elif self.position >= len(self) and not self.loop:
+                logger.info(f"Replay of {len(self)} samples finished.")
+                self.measuring = False
+            elif self.speed > 0 and self.next_burst_due() > time.perf_counter():
+                return
+            elif self.speed <= 0 and len(self.out_buffer) >= 1 << 20:
+                # As fast as possible, limited by a buffer of about 1 MiB
+                return
+            else:
+                self.out_buffer += self.burst_bytes(self.position % len(self))
+                self.position += 1
+                self.bursts_sent += 1
+
+    def burst_bytes(self, sample: int) -> memoryview:
+        """
+        Bytes of a sample as received from the device.
+        """
+        if not self.chunk_start <= sample < self.chunk_start + len(self.bounds) - 1:
+            self.load_chunk(sample - sample % self.chunk_size)
+        row = sample - self.chunk_start
+        return memoryview(self.chunk)[self.bounds[row] : self.bounds[row + 1]]
+
+    def load_chunk(self, start: int) -> None:
+        stop = min(start + self.chunk_size, len(self))
+        if self.reader.save_format == "raw":
+            # From the first frame of a sample to the first frame of the next
+            capture = self.reader.capture
+            offsets = capture.offsets.reshape(len(capture), -1)
+            bounds = offsets[start:stop].min(axis=1).astype(np.int64)
+            if stop < len(capture):
+                end = int(offsets[stop].min())
+            else:
+                end = int(offsets[-1].max()) + MSG_LEN
+            self.chunk = capture.raw[bounds[0] : end].tobytes()
+            self.bounds = np.append(bounds, end) - bounds[0]
+        else:
+            run = self.reader.frames(start, stop)
+            self.chunk = encode_bursts(
+                run.data, run.timestamps, run.excitation_stgs, self.channel_group
+            )
+            burst_len = len(self.chunk) // (stop - start)
+            self.bounds = np.arange(stop - start + 1, dtype=np.int64) * burst_len
+        self.chunk_start = start
@@ -0,0 +1,332 @@
+"""
+Random access to recorded runs.
+
+Every writer saves an index `run_<run_id>_index.npy` with one entry per sample
+(see `storage.index_dtype`) when the run is closed. `index_run` builds it for
+runs recorded without one. `RunReader` uses the index to load sample ranges,
+time windows, sweep steps and channel subsets of a run of any save format
+without touching the other samples:
+
+    with RunReader("data/run_2024-01-01_12-00-00.json") as reader:
+        run = reader.time_window(10.0, 20.0, channels=[0, 1, 2])
+
+The samples are read chunk by chunk, adjacent chunks with a single read, and
+the decoded chunks are kept in an LRU cache.
+"""
+import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import numpy as np
+
+from storage import (
+    RawCapture,
+    RunData,
+    build_index,
+    chunk_dtype,
+    chunk_end,
+    decode_chunk,
+    read_run_info,
+    read_timestamps,
+    require_h5py,
+    run_codec,
+    sample_arrays,
+    setup_from_dict,
+    write_run_info,
+)
+
+
+def index_run(file_name: str, n_workers: int = None) -> np.ndarray:
+    """
+    Build the index of a run from its data files and save it next to the run.
+
+    Parameters
+    ----------
+    file_name : str
+        path of the `run_<run_id>.json` file
+    n_workers : int, optional
+        number of threads reading the samples of a .npz run
+
+    Returns
+    -------
+    np.ndarray
+        index, see `storage.index_dtype`
+    """
+    info = read_run_info(file_name)
+    path = os.path.dirname(file_name)
+    index = build_index(info, path, read_timestamps(file_name, info, n_workers))
+    info["frame_index"] = f"run_{info['run_id']}_index.npy"
+    np.save(os.path.join(path, info["frame_index"]), index)
+    write_run_info(file_name, info)
+    return index
+
+
+def load_index(file_name: str) -> np.ndarray:
+    """
+    Index of a run, built by `index_run` if the run does not have one yet.
+    """
+    info = read_run_info(file_name)
+    if "frame_index" in info:
+        index_file = os.path.join(os.path.dirname(file_name), info["frame_index"])
+        if os.path.exists(index_file):
+            return np.load(index_file, mmap_mode="r")
+    return index_run(file_name)
+
+
+class RunReader:
+    """
+    Random access to the samples of a recorded run.
+
+    Parameters
+    ----------
+    file_name : str
+        path of the `run_<run_id>.json` file
+    cache_size : int
+        number of decoded chunks kept in memory
+    n_workers : int, optional
+        number of threads decoding chunks, by default the number of CPUs
+    """
+
+    def __init__(
+        self, file_name: str, cache_size: int = 32, n_workers: int = None
+    ) -> None:
+        self.file_name = file_name
+        self.index = load_index(file_name)
+        self.info = read_run_info(file_name)
+        self.path = os.path.dirname(file_name)
+        self.save_format = self.info["save_format"]
+        self.shapes = sample_arrays(setup_from_dict(self.info["setup"]))
+        self.chunk_size = self.info.get("chunk_size", 1)
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.n_hits = 0
+        self.n_misses = 0
+        self.pool = ThreadPoolExecutor(n_workers, thread_name_prefix="RunReader")
+
+        self.file = None
+        if self.save_format == "hdf5":
+            h5py = require_h5py("Reading hdf5 runs")
+            self.file = h5py.File(os.path.join(self.path, self.info["files"]), "r")
+        elif self.save_format == "compressed":
+            self.codec = run_codec(self.info)
+            self.records = np.fromfile(
+                os.path.join(self.path, self.info["index"]), dtype=chunk_dtype
+            )
+            self.file = open(os.path.join(self.path, self.info["files"]), "rb")
+        elif self.save_format == "raw":
+            self.capture = RawCapture(file_name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def close(self) -> None:
+        self.pool.shutdown()
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def elapsed(self) -> np.ndarray:
+        """
+        Device time of every sample in seconds since the first sample.
+        """
+        # Differences of the uint32 milli seconds are taken modulo 2**32.
+        diff = np.diff(self.index["timestamp"]).astype(np.int32)
+        return np.concatenate([[0], np.cumsum(diff, dtype=np.int64)]) / 1000.0
+
+    def times(self) -> np.ndarray:
+        """
+        Host time of every sample in seconds since the epoch, see
+        `storage.shared_time`.
+        """
+        sync = self.info.get("sync")
+        if sync is None:
+            raise ValueError("The run description does not contain a sync entry.")
+        # Every resumed part of the run has its own device clock and sync entry.
+        segments = [(0, sync)] + [
+            (resumed["n_samples"], resumed["sync"])
+            for resumed in self.info.get("resumed", [])
+            if "sync" in resumed
+        ]
+        timestamps = self.index["timestamp"]
+        times = np.empty(len(timestamps))
+        for i, (start, sync) in enumerate(segments):
+            stop = segments[i + 1][0] if i + 1 < len(segments) else len(timestamps)
+            elapsed_ms = (
+                timestamps[start:stop] - np.uint32(sync["timestamp_ms"])
+            ).astype(np.int32)
+            times[start:stop] = sync["host_time_ns"] / 1e9 + elapsed_ms / 1000.0
+        return times
+
+    def frames(self, start: int = 0, stop: int = None, channels=None) -> RunData:
+        """
+        Samples `start` to `stop`.
+
+        Parameters
+        ----------
+        start : int
+            first sample
+        stop : int, optional
+            end of the sample range, by default the last sample
+        channels : list, optional
+            indices of the channels to load, by default all
+
+        Returns
+        -------
+        RunData
+            samples of the range
+        """
+        return self.select(np.arange(*slice(start, stop).indices(len(self))), channels)
+
+    def time_window(self, t_start: float, t_stop: float, channels=None) -> RunData:
+        """
+        Samples measured from `t_start` until before `t_stop`, in seconds since
+        the first sample, see `elapsed`.
+        """
+        elapsed = self.elapsed()
+        return self.select(
+            np.flatnonzero((elapsed >= t_start) & (elapsed < t_stop)), channels
+        )
+
+    def step(self, step: int, channels=None) -> RunData:
+        """
+        Samples of a sweep step.
+        """
+        return self.select(np.flatnonzero(self.index["step"] == step), channels)
+
+    def select(self, samples: np.ndarray, channels=None) -> RunData:
+        """
+        Load arbitrary samples.
+
+        Parameters
+        ----------
+        samples : np.ndarray
+            sample indices
+        channels : list, optional
+            indices of the channels to load, by default all
+
+        Returns
+        -------
+        RunData
+            samples in the given order
+        """
+        samples = np.asarray(samples, dtype=np.int64)
+        entries = self.index[samples]
+        # Group the samples by chunk: positions[bounds[i]:bounds[i + 1]] are the
+        # positions of the samples inside the i-th chunk.
+        positions = np.argsort(entries["chunk"], kind="stable")
+        chunk_numbers, bounds = np.unique(
+            entries["chunk"][positions], return_index=True
+        )
+        bounds = np.append(bounds, len(samples))
+        chunks = self.load_chunks(chunk_numbers)
+
+        arrays = {}
+        for name, (shape, dtype) in self.shapes.items():
+            if name == "data" and channels is not None:
+                shape = (shape[0], len(channels))
+            arrays[name] = np.empty((len(samples), *shape), dtype=dtype)
+        for i, chunk in enumerate(chunk_numbers):
+            where = positions[bounds[i] : bounds[i + 1]]
+            rows = entries["row"][where]
+            for name, array in chunks[int(chunk)].items():
+                if name == "data" and channels is not None:
+                    arrays[name][where] = array[rows][..., channels]
+                else:
+                    arrays[name][where] = array[rows]
+        return RunData(info=self.info, **arrays)
+
+    def load_chunks(self, chunks: np.ndarray) -> dict:
+        """
+        Decoded chunks by number, from the cache if possible.
+        """
+        chunks = [int(chunk) for chunk in chunks]
+        missing = [chunk for chunk in chunks if chunk not in self.cache]
+        self.n_hits += len(chunks) - len(missing)
+        self.n_misses += len(missing)
+        loaded = self.read_chunks(missing) if missing else {}
+        result = {}
+        for chunk in chunks:
+            if chunk in loaded:
+                values = loaded[chunk]
+                self.cache[chunk] = values
+            else:
+                values = self.cache[chunk]
+            self.cache.move_to_end(chunk)
+            result[chunk] = values
+        while len(self.cache) > max(self.cache_size, 0):
+            self.cache.popitem(last=False)
+        return result
+
+    def read_chunks(self, chunks: list) -> dict:
+        """
+        Read and decode chunks, consecutive chunks with a single read.
+        """
+        if self.save_format == ".npz":
+            return dict(zip(chunks, self.pool.map(self.read_npz, chunks)))
+
+        result = {}
+        for first, last in consecutive(chunks):
+            if self.save_format == "compressed":
+                records = self.records[first : last + 1]
+                start = int(records["offset"][0])
+                end = int(chunk_end(records[-1]))
+                self.file.seek(start)
+                buffer = memoryview(self.file.read(end - start))
+                decoded = self.pool.map(partial(self.decode, buffer, start), records)
+                result.update(zip(range(first, last + 1), decoded))
+                continue
+
+            start = first * self.chunk_size
+            stop = (last + 1) * self.chunk_size
+            if self.save_format == "hdf5":
+                values = {name: self.file[name][start:stop] for name in self.shapes}
+            else:
+                values = {
+                    "data": self.capture.bursts(start, stop)
+                    .astype(np.complex64)
+                    .reshape(-1, *self.shapes["data"][0]),
+                    "timestamps": self.capture.timestamps(start, stop).astype(
+                        np.uint32
+                    ),
+                    "excitation_stgs": self.capture.excitation_stgs(start, stop).copy(),
+                }
+            for chunk in range(first, last + 1):
+                offset = (chunk - first) * self.chunk_size
+                result[chunk] = {
+                    name: array[offset : offset + self.chunk_size]
+                    for name, array in values.items()
+                }
+        return result
+
+    def decode(self, buffer: memoryview, start: int, record: np.void) -> dict:
+        """
+        Decode a compressed chunk inside `buffer`, read from the file offset
+        `start`.
+        """
+        offset = int(record["offset"]) - start
+        return decode_chunk(buffer[offset:], record, self.codec, self.shapes)
+
+    def read_npz(self, chunk: int) -> dict:
+        file_name = os.path.join(self.path, self.info["files"].format(chunk))
+        with np.load(file_name) as sample:
+            return {name: sample[name][np.newaxis] for name in self.shapes}
+
+
+def consecutive(chunks: list) -> list:
+    """
+    Ranges (first, last) of consecutive numbers of the sorted `chunks`.
+    """
+    ranges = []
+    for chunk in chunks:
+        if ranges and ranges[-1][1] == chunk - 1:
+            ranges[-1][1] = chunk
+        else:
+            ranges.append([chunk, chunk])
+    return [tuple(chunk_range) for chunk_range in ranges]
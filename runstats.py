@@ -0,0 +1,126 @@
+import numpy as np
+
+
+class RunningStats:
+    """
+    Running mean, variance and magnitude range of complex channel values.
+
+    Batches are merged with the parallel form of Welford's algorithm, so the
+    statistics are exact without keeping the samples.
+
+    Parameters
+    ----------
+    shape : tuple
+        shape of a single sample
+    """
+
+    def __init__(self, shape: tuple) -> None:
+        self.shape = tuple(shape)
+        self.count = 0
+        self.mean = np.zeros(shape, dtype=np.complex128)
+        # Sum of the squared distances |x - mean|^2
+        self.m2 = np.zeros(shape, dtype=np.float64)
+        self.min_abs = np.full(shape, np.inf)
+        self.max_abs = np.zeros(shape)
+
+    def update(self, samples: np.ndarray) -> None:
+        """
+        Add a single sample or a batch of samples with a leading axis.
+        """
+        samples = np.asarray(samples)
+        if samples.shape == self.shape:
+            samples = samples[np.newaxis]
+        n_new = len(samples)
+        if not n_new:
+            return
+        batch_mean = samples.mean(axis=0, dtype=np.complex128)
+        delta = batch_mean - self.mean
+        n_total = self.count + n_new
+
+        self.mean += delta * (n_new / n_total)
+        if n_new > 1:
+            self.m2 += (np.abs(samples - batch_mean) ** 2).sum(axis=0)
+        self.m2 += np.abs(delta) ** 2 * (self.count * n_new / n_total)
+        self.count = n_total
+
+        magnitude = np.abs(samples)
+        np.minimum(self.min_abs, magnitude.min(axis=0), out=self.min_abs)
+        np.maximum(self.max_abs, magnitude.max(axis=0), out=self.max_abs)
+
+    @property
+    def variance(self) -> np.ndarray:
+        """
+        Sample variance E|x - mean|^2, the sum of the variances of the real and
+        imaginary parts.
+        """
+        if self.count < 2:
+            return np.zeros(self.shape)
+        return self.m2 / (self.count - 1)
+
+
+class OnlineStats:
+    """
+    Statistics stage of the acquisition pipeline.
+
+    Every stored burst updates the running statistics of the current step. The
+    first `reference_bursts` bursts of a step are averaged to a reference
+    frame, `update` returns the difference of every following burst to it.
+
+    Parameters
+    ----------
+    shape : tuple
+        shape of the data of a burst
+    reference_bursts : int
+        number of bursts averaged to the reference, 0 disables the reference
+        subtraction
+    """
+
+    def __init__(self, shape: tuple, reference_bursts: int = 0) -> None:
+        self.shape = tuple(shape)
+        self.reference_bursts = reference_bursts
+        self.stats = []
+        self.references = []
+
+    def next_step(self) -> None:
+        """
+        Start the statistics and the reference of the next sweep step.
+        """
+        self.stats.append(RunningStats(self.shape))
+        self.references.append(RunningStats(self.shape))
+
+    def update(self, data: np.ndarray) -> np.ndarray:
+        """
+        Add the data of a burst.
+
+        Returns
+        -------
+        np.ndarray
+            difference to the reference, None until the reference is complete
+        """
+        if not self.stats:
+            self.next_step()
+        self.stats[-1].update(data)
+        reference = self.references[-1]
+        if reference.count < self.reference_bursts:
+            reference.update(data)
+            return None
+        if not self.reference_bursts:
+            return None
+        return (data - reference.mean).astype(np.complex64)
+
+    def arrays(self) -> dict:
+        """
+        Statistics of all steps, every array has the step as first axis.
+        """
+        return {
+            "count": np.array([stats.count for stats in self.stats]),
+            "mean": np.array([stats.mean for stats in self.stats]),
+            "variance": np.array([stats.variance for stats in self.stats]),
+            "min_abs": np.array([stats.min_abs for stats in self.stats]),
+            "max_abs": np.array([stats.max_abs for stats in self.stats]),
+            "reference_count": np.array([ref.count for ref in self.references]),
+            "reference": np.array([ref.mean for ref in self.references]),
+        }
+
+    def save(self, file_name: str) -> None:
+        np.savez(file_name, **self.arrays())
@@ -0,0 +1,262 @@
+import struct
+import threading
+import time
+
+import numpy as np
+
+from frameparser import ACK, MEASUREMENT_TAG, MSG_LEN, N_CH
+
+SIM_PORT = "SIM"
+
+# Measurement frame as sent by the device, see `frameparser.encode_frame`
+frame_dtype = np.dtype(
+    [
+        ("tag", "u1"),
+        ("len", "u1"),
+        ("cg", "u1"),
+        ("es", "u1", (2,)),
+        ("fr", "u1", (2,)),
+        ("ts", ">u4"),
+        ("ch", ">c8", (N_CH,)),
+        ("end", "u1"),
+    ]
+)
+assert frame_dtype.itemsize == MSG_LEN
+
+
+def is_simulated(port: str) -> bool:
+    return port.upper().startswith(SIM_PORT)
+
+
+def parse_sim_port(port: str) -> dict:
+    """
+    Read the options of a simulated port, e.g. "SIM:speed=10,noise=0.001".
+
+    Parameters
+    ----------
+    port : str
+        port name
+
+    Returns
+    -------
+    dict
+        keyword arguments of `SimulatedScioSpec`
+    """
+    _, _, opts = port.partition(":")
+    return parse_options(opts.split(","))
+
+
+def parse_options(opts: list) -> dict:
+    """
+    Numbers of the options "key=value" of a port name.
+    """
+    options = {}
+    for opt in filter(None, opts):
+        key, _, value = opt.partition("=")
+        try:
+            options[key.strip()] = int(value)
+        except ValueError:
+            options[key.strip()] = float(value)
+    return options
+
+
+class SimulatedScioSpec:
+    """
+    Software stand-in for a ScioSpec device with the interface of `serial.Serial`.
+
+    All commands are acknowledged. The commands of `deviceconfig.config_commands` for
+    burst count, framerate, excitation frequency, amplitude and injection
+    pattern are evaluated. After the start command, bursts of correctly framed
+    measurement data are produced at `framerate * speed` bursts per second
+    until the burst count is reached or the stop command is received. Every
+    burst contains `n_el` excitation stages with `n_channel_groups` frames.
+
+    Parameters
+    ----------
+    port : str
+        port name
+    speed : float
+        factor to the configured framerate, 0 produces data as fast as possible
+    n_channel_groups : int
+        number of channel groups sent per excitation stage
+    noise : float
+        standard deviation of the added noise relative to the amplitude
+    timeout : float
+        read timeout in seconds
+    seed : int
+        seed of the random generator
+    record_times : bool
+        if true, the `time.perf_counter` of every produced burst is appended
+        to `burst_times`
+    """
+
+    def __init__(
+        self,
+        port: str = SIM_PORT,
+        speed: float = 1.0,
+        n_channel_groups: int = 4,
+        noise: float = 1e-3,
+        timeout: float = 1.0,
+        seed: int = 0,
+        record_times: bool = False,
+    ) -> None:
+        self.name = port
+        self.port = port
+        self.speed = speed
+        self.n_channel_groups = n_channel_groups
+        self.noise = noise
+        self.timeout = timeout
+        self.rng = np.random.default_rng(seed)
+        self.is_open = True
+
+        # Device state
+        self.burst_count = 1
+        self.framerate = 10.0
+        self.exc_freq = 10_000.0
+        self.amplitude = 0.01
+        self.injections = [(el, el % 16 + 1) for el in range(1, 17)]
+
+        self.lock = threading.Lock()
+        self.cmd_buffer = bytearray()
+        self.out_buffer = bytearray()
+        self.measuring = False
+        self.t_start = 0.0
+        self.bursts_sent = 0
+        self.n_bytes_sent = 0
+        self.record_times = record_times
+        self.burst_times = []
+
+    @classmethod
+    def from_port(cls, port: str):
+        """
+        Create the simulated device described by the port name.
+        """
+        return cls(port=port, **parse_sim_port(port))
+
+    @property
+    def n_el(self) -> int:
+        return len(self.injections)
+
+    @property
+    def in_waiting(self) -> int:
+        with self.lock:
+            self.produce()
+            return len(self.out_buffer)
+
+    def close(self) -> None:
+        self.is_open = False
+
+    def reset_input_buffer(self) -> None:
+        with self.lock:
+            self.out_buffer.clear()
+
+    def write(self, data) -> int:
+        with self.lock:
+            self.cmd_buffer += bytes(data)
+            while len(self.cmd_buffer) >= 2:
+                end = self.cmd_buffer[1] + 3
+                if len(self.cmd_buffer) < end:
+                    break
+                cmd = bytes(self.cmd_buffer[:end])
+                del self.cmd_buffer[:end]
+                self.command(cmd)
+        return len(data)
+
+    def read(self, size: int = 1) -> bytes:
+        deadline = time.perf_counter() + self.timeout
+        while True:
+            with self.lock:
+                self.produce()
+                if len(self.out_buffer) >= size or time.perf_counter() >= deadline:
+                    data = bytes(self.out_buffer[:size])
+                    del self.out_buffer[:size]
+                    self.n_bytes_sent += len(data)
+                    return data
+                wait = self.next_burst_due() - time.perf_counter()
+            time.sleep(min(max(wait, 0.0005), max(deadline - time.perf_counter(), 0)))
+
+    def command(self, cmd: bytes) -> None:
+        tag, data = cmd[0], cmd[2:-1]
+        if tag == 0xB0 and data[:1] == b"\x01":
+            # Reset the measurement setup
+            self.injections = []
+        elif tag == 0xB0 and data[:1] == b"\x02":
+            self.burst_count = int.from_bytes(data[1:3], "big")
+        elif tag == 0xB0 and data[:1] == b"\x03":
+            self.framerate = struct.unpack(">f", data[1:5])[0]
+        elif tag == 0xB0 and data[:1] == b"\x04":
+            self.exc_freq = struct.unpack(">f", data[1:5])[0]
+        elif tag == 0xB0 and data[:1] == b"\x05":
+            self.amplitude = struct.unpack(">d", data[1:9])[0]
+        elif tag == 0xB0 and data[:1] == b"\x06":
+            self.injections.append((data[1], data[2]))
+        elif tag == 0xB4 and data == b"\x01":
+            self.start()
+        elif tag == 0xB4 and data == b"\x00":
+            self.measuring = False
+        self.out_buffer += ACK
+
+    def start(self) -> None:
+        n_frames = self.n_el * self.n_channel_groups
+        self.template = np.zeros(n_frames, dtype=frame_dtype)
+        self.template["tag"] = self.template["end"] = MEASUREMENT_TAG
+        self.template["len"] = MSG_LEN - 3
+        self.template["cg"] = np.tile(
+            np.arange(1, self.n_channel_groups + 1), self.n_el
+        )
+        self.template["es"] = np.repeat(self.injections, self.n_channel_groups, axis=0)
+
+        # Potentials of a homogeneous tank, smallest next to the injecting electrodes
+        n_ch = N_CH * self.n_channel_groups
+        stg = np.arange(self.n_el)[:, None]
+        ch = np.arange(n_ch)[None, :]
+        angle = 2 * np.pi * (ch - stg) / self.n_el
+        self.potentials = (self.amplitude * (1.5 - np.cos(angle))).astype(np.complex64)
+        self.potentials *= np.exp(-1j * 1e-6 * self.exc_freq)
+
+        self.measuring = True
+        self.bursts_sent = 0
+        self.t_start = time.perf_counter()
+
+    def next_burst_due(self) -> float:
+        if not self.measuring or self.speed <= 0:
+            return time.perf_counter()
+        return self.t_start + (self.bursts_sent + 1) / (self.framerate * self.speed)
+
+    def produce(self) -> None:
+        """
+        Append all bursts that are due until now to the output buffer.
+        """
+        if not self.measuring:
+            return
+        if self.speed > 0:
+            elapsed = time.perf_counter() - self.t_start
+            due = int(elapsed * self.framerate * self.speed) - self.bursts_sent
+        else:
+            # As fast as possible, limited by a buffer of about 1 MiB
+            burst_len = len(self.template) * MSG_LEN
+            due = -(-max((1 << 20) - len(self.out_buffer), 0) // max(burst_len, 1))
+        if self.burst_count:
+            due = min(due, self.burst_count - self.bursts_sent)
+        for _ in range(max(due, 0)):
+            self.out_buffer += self.encode_burst()
+            self.bursts_sent += 1
+            if self.record_times:
+                self.burst_times.append(time.perf_counter())
+        if self.burst_count and self.bursts_sent >= self.burst_count:
+            self.measuring = False
+
+    def encode_burst(self) -> bytes:
+        n_frames = len(self.template)
+        frames = self.template.copy()
+        # Device time in ms, one excitation stage after the other
+        t_burst = 1000.0 * self.bursts_sent / self.framerate
+        frames["ts"] = t_burst + np.arange(n_frames) * 1000.0 / (
+            self.framerate * n_frames
+        )
+        values = self.potentials + self.noise * self.amplitude * (
+            self.rng.standard_normal(self.potentials.shape)
+            + 1j * self.rng.standard_normal(self.potentials.shape)
+        )
+        frames["ch"] = values.reshape(n_frames, N_CH)
+        return frames.tobytes()
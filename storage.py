@@ -0,0 +1,1604 @@
+# sciopy and h5py are imported on first use, importing them delays the start
+# of the GUI.
+from __future__ import annotations
+
+import array
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import zipfile
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, fields
+from datetime import datetime
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from compression import Codec
+from frameparser import CH_OFFSET, MSG_LEN, N_CH, TS_OFFSET, Burst
+from metrics import Metrics
+from workingvariables import StoreConfig
+
+if TYPE_CHECKING:
+    from sciopy.sciopy_dataclasses import ScioSpecMeasurementSetup
+
+logger = logging.getLogger(__name__)
+
+RUN_FORMAT_VERSION = 1
+
+
+def require_h5py(purpose: str):
+    """
+    Import h5py, raising an ImportError naming `purpose` if it is missing.
+    """
+    try:
+        import h5py
+    except ImportError:
+        raise ImportError(f"{purpose} requires the module h5py.") from None
+    return h5py
+
+
+def to_builtin(value):
+    """
+    Convert NumPy scalars and arrays for the JSON encoder.
+    """
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def write_run_info(file_name: str, info: dict) -> None:
+    """
+    Write the run description. The file is replaced atomically.
+
+    Parameters
+    ----------
+    file_name : str
+        path of the json file
+    info : dict
+        run description
+    """
+    with open(file_name + ".tmp", "w") as file:
+        json.dump(info, file, indent=2, default=to_builtin)
+    os.replace(file_name + ".tmp", file_name)
+
+
+def read_run_info(file_name: str) -> dict:
+    """
+    Read the run description written by a writer.
+
+    Parameters
+    ----------
+    file_name : str
+        path of the `run_<run_id>.json` file
+
+    Returns
+    -------
+    dict
+        run description
+    """
+    with open(file_name) as file:
+        info = json.load(file)
+    if info.get("version", 0) > RUN_FORMAT_VERSION:
+        raise ValueError(
+            f"Run format version {info['version']} is newer than {RUN_FORMAT_VERSION}."
+        )
+    return info
+
+
+def setup_from_dict(setup: dict) -> ScioSpecMeasurementSetup:
+    """
+    Create the measurement setup from a dictionary, e.g. the "setup" of a run
+    description. `channel_group` defaults to the channel groups used by `n_el`.
+
+    Parameters
+    ----------
+    setup : dict
+        fields of `ScioSpecMeasurementSetup`
+
+    Returns
+    -------
+    ScioSpecMeasurementSetup
+        measurement setup
+    """
+    from sciopy.sciopy_dataclasses import ScioSpecMeasurementSetup
+
+    names = [field.name for field in fields(ScioSpecMeasurementSetup)]
+    unknown = set(setup) - set(names)
+    if unknown:
+        raise ValueError(f"Unknown setup fields: {', '.join(sorted(unknown))}")
+    setup = {"notes": None, "configured": True, **setup}
+    setup.setdefault("channel_group", list(range(1, setup["n_el"] // 16 + 1)))
+    missing = set(names) - set(setup)
+    if missing:
+        raise ValueError(f"Missing setup fields: {', '.join(sorted(missing))}")
+    return ScioSpecMeasurementSetup(**setup)
+
+
+def sample_arrays(ssms: ScioSpecMeasurementSetup) -> dict:
+    """
+    Shape and type of the arrays of a single burst by name.
+    """
+    n_ch = 16 * len(ssms.channel_group)
+    return {
+        "data": ((ssms.n_el, n_ch), np.complex64),
+        "timestamps": ((ssms.n_el,), np.uint32),
+        "excitation_stgs": ((ssms.n_el, 2), np.uint8),
+    }
+
+
+# Index entry of a sample: device timestamp of the first excitation stage in
+# ms, sweep step, chunk holding the sample, row inside the chunk and byte
+# offset of the chunk (compressed) or of the first frame (raw) in the file.
+index_dtype = np.dtype(
+    [
+        ("timestamp", "<u4"),
+        ("step", "<u2"),
+        ("chunk", "<u4"),
+        ("row", "<u4"),
+        ("offset", "<u8"),
+    ]
+)
+
+
+class RunWriter:
+    """
+    Base class of the writers for a single run.
+
+    The configuration of the run is written once to `run_<run_id>.json` next to
+    the data. It holds the format version, the measurement setup and, after
+    `close`, the number of stored samples. The samples themselves only carry
+    the run id and their index.
+
+    On `close`, an array of `index_dtype` with one entry per sample is saved to
+    `run_<run_id>_index.npy`, see `runreader.RunReader`. Samples are read in
+    chunks of `chunk_size`, the unit a writer stores together.
+
+    While the run is written, `flush` appends the number of samples that are
+    on disk and the sizes of the data files to the journal
+    `run_<run_id>.journal`, at most every `journal_interval` seconds. After a
+    crash, `recover_run` restores the run to the last journal entry plus the
+    complete samples written after it, and a writer created with `resume`
+    continues the run at the next sample.
+
+    Parameters
+    ----------
+    s_path : str
+        save path
+    ssms : ScioSpecMeasurementSetup
+        measurement setup
+    run_id : str
+        identifier of the run
+    save_format : str
+        save format of the writer
+    resume : bool
+        continue the existing run `run_id` instead of starting a new one
+    """
+
+    files = ""
+    chunk_size = 1
+    journal_interval = 1.0
+
+    def __init__(
+        self,
+        s_path: str,
+        ssms: ScioSpecMeasurementSetup,
+        run_id: str,
+        save_format: str,
+        resume: bool = False,
+    ) -> None:
+        self.s_path = s_path
+        self.ssms = ssms
+        self.run_id = run_id
+        self.n_samples = 0
+        self.frame_timestamps = array.array("L")
+        self.info_file = s_path + f"run_{run_id}.json"
+        if resume:
+            self.info = recover_run(self.info_file)
+            if self.info["save_format"] != save_format:
+                raise ValueError(
+                    f"Run {run_id} was saved as {self.info['save_format']}, "
+                    f"not as {save_format}."
+                )
+            self.n_samples = self.info["n_samples"]
+            self.frame_timestamps.extend(
+                read_timestamps(self.info_file, self.info).tolist()
+            )
+            self.info["finished"] = None
+            self.info.setdefault("resumed", []).append(
+                {
+                    "time": datetime.now().isoformat(timespec="seconds"),
+                    "n_samples": self.n_samples,
+                }
+            )
+            logger.info(f"Resuming run {run_id} at sample {self.n_samples}.")
+        else:
+            self.info = {
+                "version": RUN_FORMAT_VERSION,
+                "run_id": run_id,
+                "save_format": save_format,
+                "files": self.files.format(run_id=run_id),
+                "journal": f"run_{run_id}.journal",
+                "created": datetime.now().isoformat(timespec="seconds"),
+                "finished": None,
+                "n_samples": 0,
+                "shape": [ssms.n_el, 16 * len(ssms.channel_group)],
+                "chunk_size": self.chunk_size,
+                "setup": asdict(ssms),
+            }
+        write_run_info(self.info_file, self.info)
+        self.journal = open(s_path + f"run_{run_id}.journal", "a")
+        self.t_commit = time.monotonic()
+        self.info_committed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def write(self, burst: Burst) -> None:
+        raise NotImplementedError
+
+    def add_sample(self, burst: Burst) -> None:
+        """
+        Count a written burst and remember its timestamp for the index.
+        """
+        self.n_samples += 1
+        self.frame_timestamps.append(int(burst.timestamps[0]))
+
+    def flush(self) -> None:
+        self.commit()
+
+    @property
+    def n_committed(self) -> int:
+        """
+        Number of samples written to the data files.
+        """
+        return self.n_samples
+
+    def sync_files(self) -> dict:
+        """
+        Write the data files through to the disk.
+
+        Returns
+        -------
+        dict
+            sizes of the data files in bytes by name, stored in the journal
+        """
+        return {}
+
+    def commit(self, force: bool = False) -> None:
+        """
+        Append the committed samples to the journal, at most every
+        `journal_interval` seconds unless `force` is set.
+        """
+        if self.journal.closed:
+            return
+        if not force and time.monotonic() - self.t_commit < self.journal_interval:
+            return
+        self.t_commit = time.monotonic()
+        n_committed = self.n_committed
+        if n_committed and not self.info_committed:
+            # The sync entry and the sweep steps are set before the first burst.
+            write_run_info(self.info_file, self.info)
+            self.info_committed = True
+        entry = {"n_samples": n_committed, "sizes": self.sync_files()}
+        self.journal.write(json.dumps(entry) + "\n")
+        self.journal.flush()
+        os.fsync(self.journal.fileno())
+
+    @classmethod
+    def recover(cls, info: dict, path: str, entry: dict) -> int:
+        """
+        Remove incomplete data of an interrupted run.
+
+        Parameters
+        ----------
+        info : dict
+            run description
+        path : str
+            directory of the run
+        entry : dict
+            last journal entry
+
+        Returns
+        -------
+        int
+            number of complete samples
+        """
+        return entry["n_samples"]
+
+    @classmethod
+    def chunk_layout(cls, info: dict, path: str, n_samples: int) -> tuple:
+        """
+        Chunk, row inside the chunk and byte offset of the first `n_samples`
+        samples of a run.
+        """
+        samples = np.arange(n_samples)
+        chunk_size = info.get("chunk_size", cls.chunk_size)
+        return (
+            samples // chunk_size,
+            samples % chunk_size,
+            np.zeros(n_samples, dtype=np.uint64),
+        )
+
+    def write_index(self) -> None:
+        self.info["frame_index"] = f"run_{self.run_id}_index.npy"
+        timestamps = np.asarray(self.frame_timestamps, dtype=np.uint32)
+        index = build_index(self.info, self.s_path, timestamps)
+        np.save(self.s_path + self.info["frame_index"], index)
+
+    def close(self) -> None:
+        self.flush()
+        self.commit(force=True)
+        self.journal.close()
+        self.info["finished"] = datetime.now().isoformat(timespec="seconds")
+        self.info["n_samples"] = self.n_samples
+        self.write_index()
+        write_run_info(self.info_file, self.info)
+
+
+class NpzWriter(RunWriter):
+    """
+    Stores every burst in a single `sample_{:06d}.npz` file.
+
+    Every file is written to a temporary file first and renamed when it is
+    complete, so a crash never leaves a partially written sample behind.
+    """
+
+    files = "sample_{{:06d}}.npz"
+
+    def __init__(
+        self,
+        s_path: str,
+        ssms: ScioSpecMeasurementSetup,
+        run_id: str,
+        resume: bool = False,
+    ):
+        super().__init__(s_path, ssms, run_id, ".npz", resume=resume)
+
+    def write(self, burst: Burst) -> None:
+        file_name = self.s_path + "sample_{0:06d}.npz".format(self.n_samples)
+        with open(file_name + ".tmp", "wb") as file:
+            np.savez(
+                file,
+                run_id=self.run_id,
+                frame_idx=self.n_samples,
+                data=burst.data,
+                timestamps=burst.timestamps,
+                excitation_stgs=burst.excitation_stgs,
+            )
+        os.replace(file_name + ".tmp", file_name)
+        self.add_sample(burst)
+
+    @classmethod
+    def recover(cls, info: dict, path: str, entry: dict) -> int:
+        def complete(idx: int) -> bool:
+            try:
+                with np.load(os.path.join(path, info["files"].format(idx))) as sample:
+                    return str(sample["run_id"]) == info["run_id"]
+            except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+                return False
+
+        n_samples = entry["n_samples"]
+        # The journal may lag behind the renamed files or, after a power
+        # failure, be ahead of the files that reached the disk.
+        while n_samples > 0 and not complete(n_samples - 1):
+            n_samples -= 1
+        while complete(n_samples):
+            n_samples += 1
+        tmp_file = os.path.join(path, info["files"].format(n_samples) + ".tmp")
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        return n_samples
+
+
+class HDF5Writer(RunWriter):
+    """
+    Appends all bursts of a run to one HDF5 file `run_<run_id>.h5`.
+
+    The bursts are stored in chunked datasets that grow along the first axis:
+
+    - data: (n_samples, n_el, 16 * len(channel_group)) complex64
+    - timestamps: (n_samples, n_el) uint32
+    - excitation_stgs: (n_samples, n_el, 2) uint8
+
+    The run id, format version and measurement setup are stored as attributes
+    of the file. Bursts are collected in memory and written once per chunk, so
+    the datasets are only resized every `chunk_size` bursts.
+
+    Parameters
+    ----------
+    s_path : str
+        save path
+    ssms : ScioSpecMeasurementSetup
+        measurement setup
+    run_id : str
+        identifier of the run
+    chunk_size : int
+        number of bursts per chunk
+    resume : bool
+        continue the existing run `run_id`
+    """
+
+    files = "run_{run_id}.h5"
+    chunk_size = 64
+
+    def __init__(
+        self,
+        s_path: str,
+        ssms: ScioSpecMeasurementSetup,
+        run_id: str,
+        chunk_size: int = 64,
+        resume: bool = False,
+    ) -> None:
+        h5py = require_h5py("Saving as hdf5")
+        self.chunk_size = chunk_size
+        super().__init__(s_path, ssms, run_id, "hdf5", resume=resume)
+
+        self.file_name = s_path + self.info["files"]
+        self.datasets = {}
+        self.buffers = {}
+        if resume:
+            self.file = h5py.File(self.file_name, "a")
+            for name, (shape, dtype) in sample_arrays(ssms).items():
+                self.datasets[name] = self.file[name]
+                self.buffers[name] = np.empty((chunk_size, *shape), dtype=dtype)
+        else:
+            self.file = h5py.File(self.file_name, "w")
+            self.file.attrs["version"] = RUN_FORMAT_VERSION
+            self.file.attrs["run_id"] = run_id
+            for key, value in asdict(ssms).items():
+                self.file.attrs[key] = value if value is not None else "None"
+
+            for name, (shape, dtype) in sample_arrays(ssms).items():
+                self.datasets[name] = self.file.create_dataset(
+                    name,
+                    shape=(0, *shape),
+                    maxshape=(None, *shape),
+                    chunks=(chunk_size, *shape),
+                    dtype=dtype,
+                )
+                self.buffers[name] = np.empty((chunk_size, *shape), dtype=dtype)
+        self.n_buffered = 0
+
+    def write(self, burst: Burst) -> None:
+        self.buffers["data"][self.n_buffered] = burst.data
+        self.buffers["timestamps"][self.n_buffered] = burst.timestamps
+        self.buffers["excitation_stgs"][self.n_buffered] = burst.excitation_stgs
+        self.n_buffered += 1
+        self.add_sample(burst)
+        if self.n_buffered == self.chunk_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Append the buffered bursts to the datasets.
+        """
+        if self.n_buffered == 0:
+            return
+        for name, dset in self.datasets.items():
+            start = dset.shape[0]
+            dset.resize(start + self.n_buffered, axis=0)
+            dset[start:] = self.buffers[name][: self.n_buffered]
+        self.n_buffered = 0
+        self.file.flush()
+        self.commit()
+
+    @property
+    def n_committed(self) -> int:
+        return self.n_samples - self.n_buffered
+
+    @classmethod
+    def recover(cls, info: dict, path: str, entry: dict) -> int:
+        h5py = require_h5py("Recovering hdf5 runs")
+        # HDF5 files are not crash-safe, only the journaled samples are kept.
+        with h5py.File(os.path.join(path, info["files"]), "a") as file:
+            n_samples = min(entry["n_samples"], len(file["data"]))
+            for name in sample_arrays(setup_from_dict(info["setup"])):
+                file[name].resize(n_samples, axis=0)
+        return n_samples
+
+    def close(self) -> None:
+        if self.file:
+            super().close()
+            self.file.close()
+
+
+# Index record of a compressed chunk: offset inside the data file, number of
+# bursts, compressed size of each array and CRC-32 of the compressed chunk.
+chunk_dtype = np.dtype(
+    [
+        ("offset", "<u8"),
+        ("n_samples", "<u4"),
+        ("data", "<u4"),
+        ("timestamps", "<u4"),
+        ("excitation_stgs", "<u4"),
+        ("crc32", "<u4"),
+    ]
+)
+
+
+def chunk_end(records: np.ndarray) -> np.ndarray:
+    """
+    End of the chunks inside the data file.
+    """
+    return (
+        records["offset"]
+        + records["data"]
+        + records["timestamps"]
+        + records["excitation_stgs"]
+    )
+
+
+class CompressedWriter(RunWriter):
+    """
+    Appends all bursts of a run in compressed chunks to `run_<run_id>.cbin`.
+
+    Like in `HDF5Writer`, the bursts are collected into chunks of `chunk_size`
+    bursts. Every full chunk is handed to a thread pool, which compresses the
+    data, timestamps and excitation settings of the chunk separately with
+    `codec`. `write` and `flush` only append the chunks that are finished, in
+    order, so the codec runs in parallel to the writer thread. Only if more
+    than two chunks per worker are pending, `write` waits for the oldest one.
+
+    For every chunk a record of `chunk_dtype` is appended to
+    `run_<run_id>.cidx`. The codec and, after `close`, the raw and compressed
+    size and the compression time are stored in the "compression" entry of
+    the run description. A resumed run keeps the codec it was started with.
+
+    Parameters
+    ----------
+    s_path : str
+        save path
+    ssms : ScioSpecMeasurementSetup
+        measurement setup
+    run_id : str
+        identifier of the run
+    codec : Codec, optional
+        codec of the chunks, by default zlib
+    chunk_size : int
+        number of bursts per chunk
+    n_workers : int, optional
+        number of compression threads, by default the number of CPUs
+    metrics : Metrics, optional
+        records the latency of "compress" and the "bytes_raw" and
+        "bytes_compressed" counters
+    resume : bool
+        continue the existing run `run_id`
+    """
+
+    files = "run_{run_id}.cbin"
+    chunk_size = 64
+
+    def __init__(
+        self,
+        s_path: str,
+        ssms: ScioSpecMeasurementSetup,
+        run_id: str,
+        codec: Codec = None,
+        chunk_size: int = 64,
+        n_workers: int = None,
+        metrics: Metrics = None,
+        resume: bool = False,
+    ) -> None:
+        self.chunk_size = chunk_size
+        super().__init__(s_path, ssms, run_id, "compressed", resume=resume)
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.n_workers = n_workers or os.cpu_count() or 1
+        if resume:
+            self.codec = run_codec(self.info)
+        else:
+            self.codec = codec if codec is not None else Codec()
+            self.info["index"] = f"run_{run_id}.cidx"
+            self.info["compression"] = {
+                **self.codec.to_dict(),
+                "chunk_size": chunk_size,
+            }
+            write_run_info(self.info_file, self.info)
+
+        self.buffers = {
+            name: np.empty((chunk_size, *shape), dtype=dtype)
+            for name, (shape, dtype) in sample_arrays(ssms).items()
+        }
+        self.n_buffered = 0
+        self.pending = deque()
+        self.pool = ThreadPoolExecutor(self.n_workers, thread_name_prefix="Compress")
+        mode = "ab" if resume else "wb"
+        self.data_file = open(s_path + self.info["files"], mode)
+        self.idx_file = open(s_path + self.info["index"], mode)
+        self.n_appended = self.n_samples
+        compression = self.info["compression"]
+        self.bytes_raw = compression.get("bytes_raw", 0)
+        self.bytes_compressed = compression.get("bytes_compressed", 0)
+        self.compress_s = compression.get("compress_s", 0.0)
+
+    @classmethod
+    def chunk_layout(cls, info: dict, path: str, n_samples: int) -> tuple:
+        # Chunks of a resumed run are not all of the same size.
+        records = np.fromfile(os.path.join(path, info["index"]), dtype=chunk_dtype)
+        n_per_chunk = records["n_samples"].astype(np.int64)
+        first = np.cumsum(n_per_chunk) - n_per_chunk
+        chunk = np.repeat(np.arange(len(records)), n_per_chunk)[:n_samples]
+        row = np.arange(n_samples) - first[chunk]
+        return chunk, row, records["offset"][chunk]
+
+    @property
+    def n_committed(self) -> int:
+        return self.n_appended
+
+    def sync_files(self) -> dict:
+        for file in (self.data_file, self.idx_file):
+            file.flush()
+            os.fsync(file.fileno())
+        return {"data": self.data_file.tell(), "index": self.idx_file.tell()}
+
+    @classmethod
+    def recover(cls, info: dict, path: str, entry: dict) -> int:
+        data_file = os.path.join(path, info["files"])
+        idx_file = os.path.join(path, info["index"])
+        data_size = os.path.getsize(data_file)
+        records = np.fromfile(idx_file, dtype=chunk_dtype)
+        # The journaled chunks are complete, the following ones are checked.
+        n_valid = entry.get("sizes", {}).get("index", 0) // chunk_dtype.itemsize
+        with open(data_file, "rb") as file:
+            for record in records[n_valid:]:
+                if chunk_end(record) > data_size:
+                    break
+                file.seek(int(record["offset"]))
+                chunk = file.read(int(chunk_end(record) - record["offset"]))
+                if zlib.crc32(chunk) != record["crc32"]:
+                    break
+                n_valid += 1
+        records = records[:n_valid]
+        os.truncate(idx_file, n_valid * chunk_dtype.itemsize)
+        os.truncate(data_file, int(chunk_end(records[-1])) if n_valid else 0)
+        return int(records["n_samples"].sum())
+
+    def compress_chunk(self, arrays: dict) -> tuple:
+        """
+        Compress the arrays of a chunk, runs on a thread of the pool.
+        """
+        t_start = time.perf_counter()
+        blobs = {name: self.codec.compress(array) for name, array in arrays.items()}
+        duration = time.perf_counter() - t_start
+        self.metrics.observe("compress", duration)
+        return arrays, blobs, duration
+
+    def submit(self) -> None:
+        """
+        Pass the buffered bursts to the thread pool.
+        """
+        if self.n_buffered == 0:
+            return
+        arrays = {
+            name: buffer[: self.n_buffered].copy()
+            for name, buffer in self.buffers.items()
+        }
+        self.pending.append(self.pool.submit(self.compress_chunk, arrays))
+        self.n_buffered = 0
+
+    def append_finished(self, wait: bool = False) -> None:
+        """
+        Append the finished chunks in order. If `wait` is set, all pending
+        chunks are appended.
+        """
+        while self.pending and (wait or self.pending[0].done()):
+            arrays, blobs, duration = self.pending.popleft().result()
+            record = np.zeros(1, dtype=chunk_dtype)
+            record["offset"] = self.data_file.tell()
+            record["n_samples"] = len(arrays["data"])
+            crc = 0
+            for name, blob in blobs.items():
+                record[name] = len(blob)
+                crc = zlib.crc32(blob, crc)
+                self.data_file.write(blob)
+            record["crc32"] = crc
+            self.idx_file.write(record.tobytes())
+            self.n_appended += int(record["n_samples"][0])
+
+            n_raw = sum(array.nbytes for array in arrays.values())
+            n_compressed = sum(len(blob) for blob in blobs.values())
+            self.bytes_raw += n_raw
+            self.bytes_compressed += n_compressed
+            self.compress_s += duration
+            self.metrics.count("bytes_raw", n_raw)
+            self.metrics.count("bytes_compressed", n_compressed)
+
+    def write(self, burst: Burst) -> None:
+        self.buffers["data"][self.n_buffered] = burst.data
+        self.buffers["timestamps"][self.n_buffered] = burst.timestamps
+        self.buffers["excitation_stgs"][self.n_buffered] = burst.excitation_stgs
+        self.n_buffered += 1
+        self.add_sample(burst)
+        if self.n_buffered == self.chunk_size:
+            self.submit()
+            self.append_finished()
+            # Bound the memory of the pending chunks.
+            while len(self.pending) > 2 * self.n_workers:
+                self.pending[0].result()
+                self.append_finished()
+
+    def flush(self) -> None:
+        """
+        Append the finished chunks. Partial chunks stay buffered, so flushing
+        during the acquisition does not shrink the chunks.
+        """
+        self.append_finished()
+        self.data_file.flush()
+        self.idx_file.flush()
+        self.commit()
+
+    def close(self) -> None:
+        if self.data_file.closed:
+            return
+        self.submit()
+        self.append_finished(wait=True)
+        self.pool.shutdown()
+        self.info["compression"].update(
+            bytes_raw=self.bytes_raw,
+            bytes_compressed=self.bytes_compressed,
+            ratio=self.bytes_raw / max(self.bytes_compressed, 1),
+            compress_s=self.compress_s,
+            throughput_mib_s=self.bytes_raw / 2**20 / max(self.compress_s, 1e-9),
+        )
+        super().close()
+        self.data_file.close()
+        self.idx_file.close()
+        logger.info(
+            "Compressed %.1f MiB to %.1f MiB with %s (ratio %.2f, %.0f MiB/s).",
+            self.bytes_raw / 2**20,
+            self.bytes_compressed / 2**20,
+            self.codec.name,
+            self.info["compression"]["ratio"],
+            self.info["compression"]["throughput_mib_s"],
+        )
+
+
+def run_codec(info: dict) -> Codec:
+    """
+    Codec of a run written by `CompressedWriter`.
+    """
+    compression = info["compression"]
+    return Codec(compression["codec"], compression["level"], compression["shuffle"])
+
+
+def decode_chunk(buffer, record: np.void, codec: Codec, shapes: dict) -> dict:
+    """
+    Decompress a chunk of a `CompressedWriter`.
+
+    Parameters
+    ----------
+    buffer : bytes-like
+        bytes of the data file, starting at the offset of the chunk
+    record : np.void
+        index record of the chunk, see `chunk_dtype`
+    codec : Codec
+        codec of the run
+    shapes : dict
+        arrays of a single burst, see `sample_arrays`
+
+    Returns
+    -------
+    dict
+        arrays "data", "timestamps" and "excitation_stgs" of the chunk
+    """
+    n = int(record["n_samples"])
+    arrays = {}
+    pos = 0
+    for name, (shape, dtype) in shapes.items():
+        size = int(record[name])
+        arrays[name] = codec.decompress(buffer[pos : pos + size], dtype, (n, *shape))
+        pos += size
+    return arrays
+
+
+def read_compressed(file_name: str, info: dict) -> dict:
+    """
+    Decompress all chunks of a run written by `CompressedWriter`.
+
+    Parameters
+    ----------
+    file_name : str
+        path of the `run_<run_id>.json` file
+    info : dict
+        run description
+
+    Returns
+    -------
+    dict
+        arrays "data", "timestamps" and "excitation_stgs" of all samples
+    """
+    path = os.path.dirname(file_name)
+    codec = run_codec(info)
+    shapes = sample_arrays(setup_from_dict(info["setup"]))
+    index = np.fromfile(os.path.join(path, info["index"]), dtype=chunk_dtype)
+    n_samples = int(index["n_samples"].sum())
+    arrays = {
+        name: np.empty((n_samples, *shape), dtype=dtype)
+        for name, (shape, dtype) in shapes.items()
+    }
+    with open(os.path.join(path, info["files"]), "rb") as file:
+        start = 0
+        for record in index:
+            file.seek(int(record["offset"]))
+            size = int(chunk_end(record) - record["offset"])
+            n = int(record["n_samples"])
+            chunk = decode_chunk(file.read(size), record, codec, shapes)
+            for name, values in chunk.items():
+                arrays[name][start : start + n] = values
+            start += n
+    return arrays
+
+
+class RawCaptureWriter(RunWriter):
+    """
+    Appends the undecoded byte stream of the device to `run_<run_id>.raw`.
+
+    The stream offset of every decoded measurement frame is appended to
+    `run_<run_id>.idx` as little endian uint64. Both files can be opened with
+    `np.memmap`, see `RawCapture`. The bursts themselves are only counted.
+
+    Parameters
+    ----------
+    s_path : str
+        save path
+    ssms : ScioSpecMeasurementSetup
+        measurement setup
+    run_id : str
+        identifier of the run
+    resume : bool
+        continue the existing run `run_id`, the stream offsets of the new
+        frames start behind the recorded stream
+    """
+
+    files = "run_{run_id}.raw"
+    chunk_size = 64
+
+    def __init__(
+        self,
+        s_path: str,
+        ssms: ScioSpecMeasurementSetup,
+        run_id: str,
+        resume: bool = False,
+    ):
+        super().__init__(s_path, ssms, run_id, "raw", resume=resume)
+        if not resume:
+            self.info["index"] = f"run_{run_id}.idx"
+            write_run_info(self.info_file, self.info)
+        mode = "ab" if resume else "wb"
+        self.raw_file = open(s_path + self.info["files"], mode)
+        self.idx_file = open(s_path + self.info["index"], mode)
+        self.stream_offset = self.raw_file.tell()
+
+    def write_raw(self, chunk: bytes, frame_offsets: list) -> None:
+        """
+        Append a chunk of the byte stream and the offsets of its frames.
+
+        Parameters
+        ----------
+        chunk : bytes
+            bytes read from the serial connection
+        frame_offsets : list
+            stream offsets of the measurement frames decoded from the chunk
+        """
+        self.raw_file.write(chunk)
+        if frame_offsets:
+            offsets = np.asarray(frame_offsets, dtype="<u8") + np.uint64(
+                self.stream_offset
+            )
+            self.idx_file.write(offsets.tobytes())
+
+    @classmethod
+    def chunk_layout(cls, info: dict, path: str, n_samples: int) -> tuple:
+        chunk, row, offset = super().chunk_layout(info, path, n_samples)
+        if n_samples:
+            setup = info["setup"]
+            n_frames = setup["n_el"] * len(setup["channel_group"])
+            frame_offsets = np.fromfile(os.path.join(path, info["index"]), dtype="<u8")
+            offset[:] = frame_offsets[: n_samples * n_frames : n_frames]
+        return chunk, row, offset
+
+    def write(self, burst: Burst) -> None:
+        self.add_sample(burst)
+
+    def flush(self) -> None:
+        self.raw_file.flush()
+        self.idx_file.flush()
+        self.commit()
+
+    def sync_files(self) -> dict:
+        for file in (self.raw_file, self.idx_file):
+            file.flush()
+            os.fsync(file.fileno())
+        return {"data": self.raw_file.tell(), "index": self.idx_file.tell()}
+
+    @classmethod
+    def recover(cls, info: dict, path: str, entry: dict) -> int:
+        setup = info["setup"]
+        n_frames = setup["n_el"] * len(setup["channel_group"])
+        raw_file = os.path.join(path, info["files"])
+        idx_file = os.path.join(path, info["index"])
+        raw_size = os.path.getsize(raw_file)
+        # The journaled offsets are valid, the following ones are checked.
+        n_journaled = entry.get("sizes", {}).get("index", 0) // 8
+        tail = np.fromfile(idx_file, dtype="<u8", offset=8 * n_journaled)
+        complete = tail + MSG_LEN <= raw_size
+        n_valid = n_journaled + (
+            int(np.argmin(complete)) if not complete.all() else len(tail)
+        )
+        # Only complete bursts, the next frames have to start a new burst.
+        n_samples = n_valid // n_frames
+        os.truncate(idx_file, 8 * n_samples * n_frames)
+        if n_samples:
+            last = np.fromfile(
+                idx_file, dtype="<u8", count=1, offset=8 * (n_samples * n_frames - 1)
+            )
+            os.truncate(raw_file, int(last[0]) + MSG_LEN)
+        else:
+            os.truncate(raw_file, 0)
+        return n_samples
+
+    def close(self) -> None:
+        if not self.raw_file.closed:
+            super().close()
+            self.raw_file.close()
+            self.idx_file.close()
+
+
+class RawCapture:
+    """
+    Zero-copy access to a run captured by `RawCaptureWriter`.
+
+    The raw file is mapped with `np.memmap`. As long as the frames of the
+    requested samples lie at regular distances inside the stream, which is the
+    case for an undisturbed stream, `bursts` and `timestamps` return strided
+    views into the mapped file. Otherwise the frames are gathered into a copy.
+
+    Parameters
+    ----------
+    file_name : str
+        path of the `run_<run_id>.json` file
+    """
+
+    def __init__(self, file_name: str) -> None:
+        self.info = read_run_info(file_name)
+        if self.info["save_format"] != "raw":
+            raise ValueError(f"{file_name} is not a raw capture.")
+        path = os.path.dirname(file_name)
+        setup = self.info["setup"]
+        self.n_el = setup["n_el"]
+        self.n_cg = len(setup["channel_group"])
+
+        raw_file = os.path.join(path, self.info["files"])
+        idx_file = os.path.join(path, self.info["index"])
+        # np.memmap can not map empty files
+        if os.path.getsize(idx_file) == 0:
+            self.raw = np.zeros(0, dtype=np.uint8)
+            self.offsets = np.zeros(0, dtype="<u8")
+        else:
+            self.raw = np.memmap(raw_file, mode="r")
+            self.offsets = np.memmap(idx_file, dtype="<u8", mode="r")
+        # Only complete bursts, the index may end with the frames of a stopped burst
+        self.n_samples = len(self.offsets) // (self.n_el * self.n_cg)
+        self.offsets = self.offsets[: self.n_samples * self.n_el * self.n_cg].reshape(
+            self.n_samples, self.n_el, self.n_cg
+        )
+
+    def __len__(self) -> int:
+        return self.n_samples
+
+    def strides(self, offsets: np.ndarray):
+        """
+        Byte strides of the frames along (sample, stage, channel group) or None
+        if the frames do not lie at regular distances.
+        """
+        strides = []
+        for axis in range(3):
+            diff = np.diff(offsets.astype(np.int64), axis=axis)
+            if diff.size == 0:
+                strides.append(MSG_LEN)
+            elif np.all(diff == diff.flat[0]):
+                strides.append(int(diff.flat[0]))
+            else:
+                return None
+        return strides
+
+    def view(self, start: int, stop: int, offset: int, dtype, count: int):
+        """
+        Array of `count` values of type `dtype` at `offset` inside every frame of
+        the samples `start` to `stop`, shape (n, n_el, n_channel_groups, count).
+        """
+        offsets = self.offsets[start:stop]
+        shape = offsets.shape + (count,)
+        if offsets.size == 0:
+            return np.zeros(shape, dtype=dtype)
+        strides = self.strides(offsets)
+        if strides is None:
+            # Irregular stream, gather the frames one by one
+            return np.stack(
+                [
+                    np.ndarray(count, dtype, buffer=self.raw, offset=int(off) + offset)
+                    for off in offsets.flat
+                ]
+            ).reshape(shape)
+        return np.ndarray(
+            shape,
+            dtype,
+            buffer=self.raw,
+            offset=int(offsets.flat[0]) + offset,
+            strides=tuple(strides) + (dtype.itemsize,),
+        )
+
+    def bursts(self, start: int = 0, stop: int = None) -> np.ndarray:
+        """
+        Complex channel values of the samples `start` to `stop`.
+
+        Parameters
+        ----------
+        start : int
+            first sample
+        stop : int, optional
+            end of the sample range, by default the last sample
+
+        Returns
+        -------
+        np.ndarray
+            big endian complex64, shape (n, n_el, n_channel_groups, 16)
+        """
+        stop = self.n_samples if stop is None else min(stop, self.n_samples)
+        return self.view(start, stop, CH_OFFSET, np.dtype(">c8"), N_CH)
+
+    def timestamps(self, start: int = 0, stop: int = None) -> np.ndarray:
+        """
+        Timestamps of the excitation stages of the samples `start` to `stop`,
+        like the FrameParser the timestamp of the last channel group.
+
+        Returns
+        -------
+        np.ndarray
+            big endian uint32, shape (n, n_el)
+        """
+        stop = self.n_samples if stop is None else min(stop, self.n_samples)
+        return self.view(start, stop, TS_OFFSET, np.dtype(">u4"), 1)[..., -1, 0]
+
+    def excitation_stgs(self, start: int = 0, stop: int = None) -> np.ndarray:
+        """
+        Excitation settings [ESout, ESin] of the samples `start` to `stop`.
+
+        Returns
+        -------
+        np.ndarray
+            uint8, shape (n, n_el, 2)
+        """
+        stop = self.n_samples if stop is None else min(stop, self.n_samples)
+        return self.view(start, stop, 3, np.dtype(np.uint8), 2)[..., 0, :]
+
+
+queue_policies = ["block", "drop"]
+
+
+class WriteBehind(threading.Thread):
+    """
+    Bounded write-behind queue in front of a writer.
+
+    `write` only puts the burst into the queue, a separate thread takes the
+    bursts out in batches and passes them to the writer. If the queue is full,
+    the policy "block" waits for free space and "drop" discards the burst and
+    counts it in `n_dropped`. The writer is flushed whenever the queue runs
+    empty, but at least every `flush_interval` seconds.
+
+    Parameters
+    ----------
+    writer : RunWriter
+        writer the bursts are passed to
+    maxsize : int
+        maximum number of bursts inside the queue
+    policy : str
+        "block" or "drop"
+    batch_size : int
+        maximum number of bursts written in one batch
+    metrics : Metrics, optional
+        records the latency of "write" and "flush" and the "dropped" bursts
+    flush_interval : float
+        maximum time between two flushes in seconds
+    """
+
+    def __init__(
+        self,
+        writer,
+        maxsize: int = 256,
+        policy: str = "block",
+        batch_size: int = 64,
+        metrics: Metrics = None,
+        flush_interval: float = 1.0,
+    ) -> None:
+        super().__init__(name="WriteBehind", daemon=True)
+        if policy not in queue_policies:
+            raise ValueError(f"Unknown queue policy {policy!r}")
+        self.writer = writer
+        self.policy = policy
+        self.batch_size = batch_size
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.flush_interval = flush_interval
+        self.n_dropped = 0
+        self.max_depth = 0
+        self.error = None
+        self.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    @property
+    def depth(self) -> int:
+        """
+        Number of bursts waiting to be written.
+        """
+        return self.queue.qsize()
+
+    @property
+    def n_samples(self) -> int:
+        return self.writer.n_samples
+
+    def write(self, burst: Burst) -> bool:
+        """
+        Queue a burst for writing.
+
+        Parameters
+        ----------
+        burst : Burst
+            burst to write
+
+        Returns
+        -------
+        bool
+            False if the burst was dropped
+        """
+        if self.error is not None:
+            raise self.error
+        if self.policy == "block":
+            self.queue.put(burst)
+        else:
+            try:
+                self.queue.put_nowait(burst)
+            except queue.Full:
+                self.n_dropped += 1
+                self.metrics.count("dropped")
+                return False
+        self.max_depth = max(self.max_depth, self.queue.qsize())
+        return True
+
+    def write_raw(self, chunk: bytes, frame_offsets: list) -> None:
+        """
+        Queue a chunk of the raw byte stream. Raw chunks are never dropped.
+        """
+        if self.error is not None:
+            raise self.error
+        self.queue.put((chunk, frame_offsets))
+
+    def run(self) -> None:
+        closed = False
+        t_flush = time.monotonic()
+        while not closed:
+            batch = [self.queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            # Before writing, a failing write must not hide the close request.
+            closed = any(burst is None for burst in batch)
+            try:
+                for burst in batch:
+                    if burst is None:
+                        continue
+                    elif self.error is not None:
+                        continue
+                    elif isinstance(burst, Burst):
+                        with self.metrics.timer("write"):
+                            self.writer.write(burst)
+                    else:
+                        with self.metrics.timer("write"):
+                            self.writer.write_raw(*burst)
+                # Flush while the acquisition leaves time for it.
+                if self.error is None and (
+                    self.queue.empty()
+                    or time.monotonic() - t_flush > self.flush_interval
+                ):
+                    with self.metrics.timer("flush"):
+                        self.writer.flush()
+                    t_flush = time.monotonic()
+            except BaseException as err:
+                self.error = err
+
+    def close(self) -> None:
+        """
+        Write all queued bursts and close the writer.
+        """
+        self.queue.put(None)
+        self.join()
+        self.writer.close()
+        if self.error is not None:
+            raise self.error
+
+
+writers = {
+    ".npz": NpzWriter,
+    "hdf5": HDF5Writer,
+    "raw": RawCaptureWriter,
+    "compressed": CompressedWriter,
+}
+save_formats = list(writers)
+
+
+def new_run_id() -> str:
+    return datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+
+
+def open_writer(
+    store_config: StoreConfig,
+    ssms: ScioSpecMeasurementSetup,
+    run_id: str = None,
+    metrics: Metrics = None,
+    resume: bool = False,
+):
+    """
+    Create the writer of the selected save format.
+
+    Parameters
+    ----------
+    store_config : StoreConfig
+        export configuration
+    ssms : ScioSpecMeasurementSetup
+        measurement setup
+    run_id : str, optional
+        identifier of the run, defaults to the current time
+    metrics : Metrics, optional
+        passed to writers recording metrics
+    resume : bool
+        continue the interrupted run `run_id`, see `recover_run`
+
+    Returns
+    -------
+    RunWriter
+        writer for the bursts of a single run
+
+    Raises
+    ------
+    ValueError
+        for an unknown save format or the save format raw with the queue
+        policy "drop"
+    """
+    try:
+        writer = writers[store_config.save_format]
+    except KeyError:
+        raise ValueError(f"Unknown save format {store_config.save_format!r}")
+    if writer is RawCaptureWriter and store_config.queue_policy == "drop":
+        # The frame offsets of the stream are written for every burst, a
+        # dropped burst would shift the index against the samples.
+        raise ValueError('The save format raw requires the queue policy "block".')
+    if run_id is None:
+        run_id = new_run_id()
+    if writer is CompressedWriter:
+        codec = Codec(
+            store_config.codec, store_config.compression_level, store_config.shuffle
+        )
+        return writer(
+            store_config.s_path,
+            ssms,
+            run_id,
+            codec=codec,
+            metrics=metrics,
+            resume=resume,
+        )
+    return writer(store_config.s_path, ssms, run_id, resume=resume)
+
+
+@dataclass
+class RunData:
+    """
+    All samples of a run as contiguous arrays.
+
+    Parameters
+    ----------
+    info : dict
+        run description, see `RunWriter`
+    data : np.ndarray
+        complex channel values, shape (n_samples, n_el, 16 * len(channel_group))
+    timestamps : np.ndarray
+        timestamps, shape (n_samples, n_el)
+    excitation_stgs : np.ndarray
+        excitation settings, shape (n_samples, n_el, 2)
+    """
+
+    info: dict
+    data: np.ndarray
+    timestamps: np.ndarray
+    excitation_stgs: np.ndarray
+
+
+def load_run(file_name: str) -> RunData:
+    """
+    Load all samples of a run without unpickling anything.
+
+    Parameters
+    ----------
+    file_name : str
+        path of the `run_<run_id>.json` file
+
+    Returns
+    -------
+    RunData
+        samples of the run
+    """
+    info = read_run_info(file_name)
+    path = os.path.dirname(file_name)
+    n_samples = info["n_samples"]
+
+    if info["save_format"] == "hdf5":
+        h5py = require_h5py("Loading hdf5 runs")
+        with h5py.File(os.path.join(path, info["files"]), "r") as file:
+            return RunData(
+                info=info,
+                data=file["data"][:n_samples],
+                timestamps=file["timestamps"][:n_samples],
+                excitation_stgs=file["excitation_stgs"][:n_samples],
+            )
+
+    if info["save_format"] == "compressed":
+        return RunData(info=info, **read_compressed(file_name, info))
+
+    if info["save_format"] == "raw":
+        capture = RawCapture(file_name)
+        return RunData(
+            info=info,
+            data=capture.bursts()
+            .astype(np.complex64)
+            .reshape(capture.n_samples, *info["shape"]),
+            timestamps=capture.timestamps().astype(np.uint32),
+            excitation_stgs=capture.excitation_stgs().copy(),
+        )
+
+    n_el, n_ch = info["shape"]
+    run = RunData(
+        info=info,
+        data=np.empty((n_samples, n_el, n_ch), dtype=np.complex64),
+        timestamps=np.empty((n_samples, n_el), dtype=np.uint32),
+        excitation_stgs=np.empty((n_samples, n_el, 2), dtype=np.uint8),
+    )
+    for idx in range(n_samples):
+        with np.load(os.path.join(path, info["files"].format(idx))) as sample:
+            if str(sample["run_id"]) != info["run_id"]:
+                raise ValueError(f"Sample {idx} does not belong to this run.")
+            run.data[idx] = sample["data"]
+            run.timestamps[idx] = sample["timestamps"]
+            run.excitation_stgs[idx] = sample["excitation_stgs"]
+    return run
+
+
+def shared_time(run: RunData) -> np.ndarray:
+    """
+    Host time of every excitation stage of a run in seconds since the epoch.
+
+    The device timestamps are mapped onto the host clock with the "sync" entry
+    of the run description, so runs of several devices measured at the same
+    time can be aligned.
+
+    Parameters
+    ----------
+    run : RunData
+        samples of the run
+
+    Returns
+    -------
+    np.ndarray
+        host time, shape (n_samples, n_el)
+    """
+    sync = run.info.get("sync")
+    if sync is None:
+        raise ValueError("The run description does not contain a sync entry.")
+    # Differences of the uint32 milli seconds are taken modulo 2**32.
+    elapsed_ms = (run.timestamps - np.uint32(sync["timestamp_ms"])).astype(np.int32)
+    return sync["host_time_ns"] / 1e9 + elapsed_ms / 1000.0
+
+
+def read_journal(file_name: str) -> dict:
+    """
+    Last complete entry of a journal, None if there is none.
+    """
+    entry = None
+    try:
+        with open(file_name) as file:
+            for line in file:
+                # A line is only complete with its line break.
+                if not line.endswith("\n"):
+                    break
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+    except FileNotFoundError:
+        pass
+    return entry
+
+
+def recover_run(file_name: str) -> dict:
+    """
+    Restore an interrupted run to a consistent state.
+
+    The data files are cut back to the last journal entry plus the complete
+    samples written after it, so recovery only checks the data written during
+    the last `RunWriter.journal_interval`. Finished runs are not changed.
+
+    Parameters
+    ----------
+    file_name : str
+        path of the `run_<run_id>.json` file
+
+    Returns
+    -------
+    dict
+        run description with the number of recovered samples
+    """
+    info = read_run_info(file_name)
+    if info["finished"] is not None:
+        return info
+    path = os.path.dirname(file_name)
+    journal = os.path.join(path, info.get("journal", f"run_{info['run_id']}.journal"))
+    entry = read_journal(journal) or {"n_samples": 0}
+    n_samples = writers[info["save_format"]].recover(info, path, entry)
+    logger.info(
+        f"Recovered {n_samples} samples of run {info['run_id']}, "
+        f"{entry['n_samples']} were journaled."
+    )
+    info["n_samples"] = n_samples
+    write_run_info(file_name, info)
+    return info
+
+
+def read_timestamps(file_name: str, info: dict, n_workers: int = None) -> np.ndarray:
+    """
+    Timestamp of the first excitation stage of every stored sample, read from
+    the data files of the run.
+    """
+    path = os.path.dirname(file_name)
+    save_format = info["save_format"]
+
+    if save_format == ".npz":
+        n_samples = info["n_samples"]
+        if not n_samples:
+            # Unfinished run, count the samples on disk.
+            while os.path.exists(os.path.join(path, info["files"].format(n_samples))):
+                n_samples += 1
+
+        def first_timestamp(idx: int) -> int:
+            with np.load(os.path.join(path, info["files"].format(idx))) as sample:
+                return sample["timestamps"][0]
+
+        with ThreadPoolExecutor(n_workers) as pool:
+            return np.fromiter(
+                pool.map(first_timestamp, range(n_samples)),
+                dtype=np.uint32,
+                count=n_samples,
+            )
+
+    if save_format == "hdf5":
+        h5py = require_h5py("Indexing hdf5 runs")
+        with h5py.File(os.path.join(path, info["files"]), "r") as file:
+            return file["timestamps"][:, 0]
+
+    if save_format == "compressed":
+        codec = run_codec(info)
+        n_el = info["setup"]["n_el"]
+        records = np.fromfile(os.path.join(path, info["index"]), dtype=chunk_dtype)
+        timestamps = []
+        with open(os.path.join(path, info["files"]), "rb") as file:
+            for record in records:
+                # Only the timestamps, they follow the data of the chunk.
+                file.seek(int(record["offset"] + record["data"]))
+                timestamps.append(
+                    codec.decompress(
+                        file.read(int(record["timestamps"])),
+                        np.uint32,
+                        (int(record["n_samples"]), n_el),
+                    )[:, 0]
+                )
+        if not timestamps:
+            return np.zeros(0, dtype=np.uint32)
+        return np.concatenate(timestamps)
+
+    if save_format == "raw":
+        # Like the FrameParser, the timestamp of the last channel group.
+        capture = RawCapture(file_name)
+        timestamps = capture.view(0, len(capture), TS_OFFSET, np.dtype(">u4"), 1)
+        return timestamps[:, 0, -1, 0].astype(np.uint32)
+
+    raise ValueError(f"Unknown save format {save_format!r}")
+
+
+def build_index(info: dict, path: str, timestamps: np.ndarray) -> np.ndarray:
+    """
+    Index of the samples of a run, see `index_dtype`.
+
+    Parameters
+    ----------
+    info : dict
+        run description
+    path : str
+        directory of the run
+    timestamps : np.ndarray
+        timestamp of the first excitation stage of every sample
+
+    Returns
+    -------
+    np.ndarray
+        one entry per sample
+    """
+    n_samples = len(timestamps)
+    index = np.zeros(n_samples, dtype=index_dtype)
+    index["timestamp"] = timestamps
+    index["step"] = sample_steps(info, n_samples)
+    writer = writers[info["save_format"]]
+    index["chunk"], index["row"], index["offset"] = writer.chunk_layout(
+        info, path, n_samples
+    )
+    return index
+
+
+def sample_steps(info: dict, n_samples: int = None) -> np.ndarray:
+    """
+    Index of the sweep step every sample of a run was measured with.
+
+    Parameters
+    ----------
+    info : dict
+        run description, see `RunWriter`
+    n_samples : int, optional
+        number of samples, by default the "n_samples" of the description
+
+    Returns
+    -------
+    np.ndarray
+        step index, shape (n_samples,)
+    """
+    if n_samples is None:
+        n_samples = info["n_samples"]
+    steps = np.zeros(n_samples, dtype=int)
+    for step in info.get("sweep", []):
+        start = step["first_sample"]
+        steps[start : start + step["n_samples"]] = step["step"]
+    return steps
+
+
+def load_run_stats(file_name: str) -> dict:
+    """
+    Load the statistics computed during the acquisition of a run.
+
+    Parameters
+    ----------
+    file_name : str
+        path of the `run_<run_id>.json` file
+
+    Returns
+    -------
+    dict
+        arrays of `runstats.OnlineStats.arrays`, the first axis is the step
+    """
+    info = read_run_info(file_name)
+    if "stats" not in info:
+        raise ValueError("The run was measured without online statistics.")
+    path = os.path.join(os.path.dirname(file_name), info["stats"]["file"])
+    with np.load(path) as stats:
+        return dict(stats)
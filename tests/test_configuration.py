@@ -0,0 +1,53 @@
+import json
+import time
+
+import cli
+from acquisition import connect_port, run_devices
+from storage import setup_from_dict
+from workingvariables import StoreConfig
+
+
+def setup(**changes) -> dict:
+    return {
+        "total_meas_num": 3,
+        "burst_count": 1,
+        "n_el": 16,
+        "exc_freq": 10000,
+        "framerate": 100,
+        "amplitude": 0.001,
+        "inj_skip": 0,
+        "gain": 1,
+        "adc_range": 1,
+        **changes,
+    }
+
+
+def test_run_devices_writes_amplitude_in_ampere(tmp_path):
+    serial = connect_port("SIM:speed=0,timeout=0.05")
+    ssms = setup_from_dict(setup(amplitude=0.005))
+    result = run_devices(
+        {"SIM": serial}, ssms, StoreConfig(str(tmp_path) + "/", ".npz")
+    )
+    assert serial.amplitude == 0.005
+    assert result["devices"]["SIM"]["n_samples"] == 3
+
+
+def test_stream_stops_without_waiting_for_the_timeout(tmp_path):
+    serial = connect_port("SIM:speed=0,timeout=2")
+    ssms = setup_from_dict(setup(total_meas_num=5))
+    t_start = time.perf_counter()
+    result = run_devices(
+        {"SIM": serial}, ssms, StoreConfig(str(tmp_path) + "/", ".npz")
+    )
+    assert result["devices"]["SIM"]["n_samples"] == 5
+    assert time.perf_counter() - t_start < 1.5
+
+
+def test_cli_measures_a_simulated_device(tmp_path):
+    config = tmp_path / "config.json"
+    config.write_text(json.dumps({"setup": setup(total_meas_num=4)}))
+    stats_file = tmp_path / "stats.json"
+    argv = [str(config), "--port", "SIM:speed=0,timeout=0.05", "--out"]
+    argv += [str(tmp_path / "data"), "--stats-json", str(stats_file)]
+    assert cli.main(argv) == 0
+    assert json.loads(stats_file.read_text())["n_samples"] == 4
@@ -0,0 +1,37 @@
+import os
+
+import numpy as np
+import pytest
+
+from framebus import FrameBus, FrameSubscriber
+from frameparser import Burst
+from workingvariables import FrameBusConfig
+
+
+def burst() -> Burst:
+    return Burst(
+        np.ones((16, 16), dtype=np.complex64),
+        np.arange(16, dtype=np.uint32),
+        np.zeros((16, 2), dtype=np.uint8),
+    )
+
+
+def test_default_name_is_unique_per_producer():
+    with FrameBus(FrameBusConfig(port=0)) as first, FrameBus(
+        FrameBusConfig(port=0)
+    ) as second:
+        assert first.shm.name != second.shm.name
+        assert str(os.getpid()) in first.shm.name
+        assert str(first.port) in first.shm.name
+
+
+def test_existing_shared_memory_is_not_removed():
+    name = f"test_frames_{os.getpid()}"
+    with FrameBus(FrameBusConfig(port=0, name=name)) as bus:
+        with pytest.raises(FileExistsError):
+            FrameBus(FrameBusConfig(port=0, name=name))
+        with FrameSubscriber(bus.port) as subscriber:
+            bus.publish(0, burst())
+            frame = next(subscriber.frames(timeout=1))
+        assert frame.sample == 0
+        np.testing.assert_array_equal(frame.data, burst().data)
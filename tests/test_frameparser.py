@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+from frameparser import ACK, MSG_LEN, FrameParser, encode_frame
+
+
+def burst_stream(n_el: int, channel_groups: list, seed: int = 0) -> tuple:
+    """
+    Frames of one burst and the channel values, shape (n_el, 16 * n_cg).
+    """
+    rng = np.random.default_rng(seed)
+    values = (
+        rng.standard_normal((n_el, 16 * len(channel_groups)))
+        + 1j * rng.standard_normal((n_el, 16 * len(channel_groups)))
+    ).astype(np.complex64)
+    frames = [
+        encode_frame(
+            cg,
+            [stg + 1, (stg + 1) % n_el + 1],
+            100 * stg + i,
+            values[stg, 16 * i : 16 * (i + 1)],
+        )
+        for stg in range(n_el)
+        for i, cg in enumerate(channel_groups)
+    ]
+    return frames, values
+
+
+def test_decodes_a_burst():
+    frames, values = burst_stream(32, [1, 2])
+    parser = FrameParser(32, [1, 2])
+    (burst,) = parser.feed(b"".join(frames))
+    np.testing.assert_array_equal(burst.data, values)
+    # Timestamp of the last channel group of every stage
+    np.testing.assert_array_equal(burst.timestamps, 100 * np.arange(32) + 1)
+    np.testing.assert_array_equal(burst.excitation_stgs[:, 0], np.arange(1, 33))
+    assert parser.n_frames == 64
+    assert parser.n_skipped == 0
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 139, 141, 500])
+def test_frames_split_across_chunks(size):
+    # Chunk sizes that split the header, the body and the closing tag
+    frames, values = burst_stream(16, [1])
+    stream = b"".join(frames) * 3
+    parser = FrameParser(16, [1], record_offsets=True)
+    bursts = []
+    for i in range(0, len(stream), size):
+        bursts += parser.feed(stream[i : i + size])
+    assert len(bursts) == 3
+    for burst in bursts:
+        np.testing.assert_array_equal(burst.data, values)
+    assert parser.frame_offsets == list(range(0, 3 * 16 * MSG_LEN, MSG_LEN))
+
+
+def test_resync_after_garbage():
+    frames, values = burst_stream(16, [1])
+    garbage = bytes([0xB4, 0x05, 0x01, 0x02]) + bytes(range(40))
+    stream = garbage + b"".join(frames[:7]) + garbage + b"".join(frames[7:])
+    parser = FrameParser(16, [1])
+    (burst,) = parser.feed(stream)
+    np.testing.assert_array_equal(burst.data, values)
+    assert parser.n_skipped > 0
+    assert parser.n_frames == 16
+
+
+def test_counts_acknowledges():
+    frames, values = burst_stream(16, [1])
+    stream = ACK + b"".join(frames[:5]) + ACK + ACK + b"".join(frames[5:]) + ACK
+    parser = FrameParser(16, [1])
+    bursts = []
+    for i in range(0, len(stream), 7):
+        bursts += parser.feed(stream[i : i + 7])
+    assert parser.n_acks == 4
+    assert len(bursts) == 1
+    np.testing.assert_array_equal(bursts[0].data, values)
+
+
+def test_drops_unused_channel_groups():
+    frames, values = burst_stream(16, [1, 2])
+    parser = FrameParser(16, [1])
+    (burst,) = parser.feed(b"".join(frames))
+    np.testing.assert_array_equal(burst.data, values[:, :16])
@@ -0,0 +1,105 @@
+import dataclasses
+import json
+
+import pytest
+
+from deviceconfig import (
+    ACK,
+    amplitude_command,
+    apply_config,
+    config_commands,
+    diff_commands,
+    frequency_command,
+    gain_command,
+)
+from profiles import list_profiles, load_profile, save_profile, validate_setup
+from storage import setup_from_dict
+
+from test_configuration import setup
+
+
+def test_diff_commands_write_only_changed_parameters():
+    old = setup_from_dict(setup())
+    assert diff_commands(None, old) == config_commands(old)
+    assert diff_commands(old, dataclasses.replace(old)) == []
+    new = dataclasses.replace(old, exc_freq=2000.0, gain=10, notes="changed")
+    assert diff_commands(old, new) == [gain_command(10), frequency_command(2000.0)]
+
+
+def test_diff_commands_reset_for_the_injection_pattern():
+    old = setup_from_dict(setup())
+    new = dataclasses.replace(old, inj_skip=2, exc_freq=2000.0)
+    assert diff_commands(old, new) == config_commands(new)
+
+
+def test_amplitude_outside_of_the_device_range():
+    assert amplitude_command(0.005)
+    for amplitude in [50e-9, 0.011]:
+        with pytest.raises(ValueError, match="Amplitude"):
+            amplitude_command(amplitude)
+
+
+class SilentDevice:
+    """
+    Acknowledges only the first `n_acks` commands.
+    """
+
+    def __init__(self, n_acks: int) -> None:
+        self.out = ACK * n_acks
+        self.in_waiting = 0
+
+    def write(self, data: bytes) -> int:
+        return len(data)
+
+    def read(self, size: int = 1) -> bytes:
+        data, self.out = self.out[:size], self.out[size:]
+        return data
+
+
+def test_apply_config_raises_on_missing_acknowledges():
+    old = setup_from_dict(setup())
+    new = dataclasses.replace(old, exc_freq=2000.0, gain=10)
+    assert apply_config(SilentDevice(2), new, old) == 2
+    with pytest.raises(TimeoutError, match="Only 1 of 2"):
+        apply_config(SilentDevice(1), new, old)
+
+
+def test_profile_round_trip(tmp_path):
+    directory = str(tmp_path)
+    path = save_profile("tank_16", {**setup(), "notes": "tank"}, directory)
+    assert list_profiles(directory) == ["tank_16"]
+    profile = load_profile("tank_16", directory)
+    assert profile == {**validate_setup(setup()), "notes": "tank"}
+    assert load_profile(path) == profile
+    with open(path) as file:
+        assert json.load(file)["version"] == 1
+
+
+def test_invalid_setups_list_every_violation(tmp_path):
+    with pytest.raises(ValueError) as err:
+        save_profile("bad", setup(n_el=20, amplitude=0.02, gain=3), str(tmp_path))
+    message = str(err.value)
+    assert "n_el must be one of" in message
+    assert "amplitude must be" in message
+    assert "gain must be one of" in message
+    assert list_profiles(str(tmp_path)) == []
+    with pytest.raises(ValueError, match="Invalid profile name"):
+        save_profile("../tank", setup(), str(tmp_path))
+
+
+def test_newer_profile_versions_are_rejected(tmp_path):
+    (tmp_path / "future.json").write_text(
+        json.dumps({"version": 2, "name": "future", "setup": setup()})
+    )
+    with pytest.raises(ValueError, match="only versions up to 1"):
+        load_profile("future", str(tmp_path))
+
+
+def test_toml_profile(tmp_path):
+    pytest.importorskip("tomllib")
+    lines = [f"{name} = {value!r}" for name, value in setup(framerate=2.5).items()]
+    (tmp_path / "hand.toml").write_text(
+        "version = 1\n[setup]\n" + "\n".join(lines) + "\n"
+    )
+    assert list_profiles(str(tmp_path)) == ["hand"]
+    assert load_profile("hand", str(tmp_path))["framerate"] == 2.5
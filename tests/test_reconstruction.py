@@ -0,0 +1,99 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+from acquisition import connect_port, run_devices
+from reconstruction import difference_matrix, load_images, load_matrix, reconstruct
+from storage import load_run, setup_from_dict
+from workingvariables import ReconstructionConfig, StoreConfig
+
+from test_configuration import setup
+
+
+def jac_solver(n_el: int, inj_skip: int, config: ReconstructionConfig):
+    protocol = pytest.importorskip("pyeit.eit.protocol")
+    mesh = pytest.importorskip("pyeit.mesh")
+    from pyeit.eit.jac import JAC
+
+    eit_protocol = protocol.create(
+        n_el, dist_exc=inj_skip + 1, step_meas=1, parser_meas="std"
+    )
+    solver = JAC(mesh.create(n_el, h0=config.h0), eit_protocol)
+    solver.setup(
+        p=config.p,
+        lamb=config.lamb,
+        method=config.method,
+        perm=1,
+        jac_normalized=config.normalize,
+    )
+    return solver, eit_protocol
+
+
+@pytest.mark.parametrize("inj_skip", [0, 3])
+def test_matches_the_jac_solver(tmp_path, inj_skip):
+    config = ReconstructionConfig(cache_dir=str(tmp_path))
+    solver, eit_protocol = jac_solver(16, inj_skip, config)
+    matrix = load_matrix(16, inj_skip, config)
+
+    rng = np.random.default_rng(0)
+    reference = (1 + rng.random((16, 16))).astype(np.complex64)
+    bursts = reference + 0.01 * rng.standard_normal((3, 16, 16)).astype(np.complex64)
+    images = reconstruct(difference_matrix(matrix, reference), bursts - reference)
+
+    def voltages(burst):
+        meas = eit_protocol.meas_mat
+        exc = np.repeat(np.arange(len(meas)), meas.shape[1])
+        real = np.real(burst).astype(np.float64)
+        return real[exc, meas[:, :, 0].ravel()] - real[exc, meas[:, :, 1].ravel()]
+
+    for burst, image in zip(bursts, images):
+        expected = solver.solve(voltages(burst), voltages(reference), normalize=True)
+        np.testing.assert_allclose(image, expected, atol=1e-4 * np.abs(expected).max())
+
+
+def test_cached_matrix_needs_no_pyeit(tmp_path, monkeypatch):
+    pytest.importorskip("pyeit")
+    config = ReconstructionConfig(cache_dir=str(tmp_path))
+    computed = load_matrix(16, 0, config)
+    for name in ["pyeit", *[name for name in sys.modules if name.startswith("pyeit.")]]:
+        monkeypatch.setitem(sys.modules, name, None)
+    cached = load_matrix(16, 0, config)
+    assert cached["hash"] == computed["hash"]
+    np.testing.assert_array_equal(cached["H"], computed["H"])
+    # Other solver parameters need another matrix.
+    with pytest.raises(ImportError):
+        load_matrix(16, 0, ReconstructionConfig(cache_dir=str(tmp_path), lamb=0.1))
+
+
+def test_images_of_a_measured_run(tmp_path):
+    pytest.importorskip("pyeit")
+    serial = connect_port("SIM:speed=0,noise=0.01,timeout=0.05")
+    ssms = setup_from_dict(setup(total_meas_num=20))
+    store_config = StoreConfig(
+        str(tmp_path) + "/",
+        ".npz",
+        online_stats=True,
+        reference_bursts=5,
+        reconstruct=True,
+    )
+    config = ReconstructionConfig(cache_dir=str(tmp_path / "cache"), batch_size=4)
+    run_devices(
+        {"SIM": serial},
+        ssms,
+        store_config,
+        subdirectories=False,
+        reconstruction=config,
+    )
+
+    (run_file,) = [name for name in os.listdir(tmp_path) if name.endswith(".json")]
+    samples, images, _ = load_images(os.path.join(tmp_path, run_file))
+    np.testing.assert_array_equal(samples, np.arange(5, 20))
+    run = load_run(os.path.join(tmp_path, run_file))
+    reference = run.data[:5].mean(axis=0)
+    matrix = load_matrix(16, 0, config)
+    expected = reconstruct(
+        difference_matrix(matrix, reference), run.data[5:] - reference
+    )
+    np.testing.assert_allclose(images, expected, atol=1e-3 * np.abs(expected).max())
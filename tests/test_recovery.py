@@ -0,0 +1,109 @@
+import importlib.util
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pytest
+
+from storage import load_run, read_journal, recover_run
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+setup = {
+    "total_meas_num": 100_000,
+    "burst_count": 1,
+    "n_el": 16,
+    "exc_freq": 10000,
+    "framerate": 200,
+    "amplitude": 0.001,
+    "inj_skip": 0,
+    "gain": 1,
+    "adc_range": 1,
+}
+
+
+def journaled(path: str) -> int:
+    journals = [name for name in os.listdir(path) if name.endswith(".journal")]
+    if not journals:
+        return 0
+    entry = read_journal(os.path.join(path, journals[0]))
+    return entry["n_samples"] if entry else 0
+
+
+@pytest.mark.skipif(not hasattr(signal, "SIGKILL"), reason="needs SIGKILL")
+@pytest.mark.parametrize("save_format", [".npz", "hdf5", "raw", "compressed"])
+def test_recover_killed_run(tmp_path, save_format):
+    if save_format == "hdf5" and importlib.util.find_spec("h5py") is None:
+        pytest.skip("needs h5py")
+    config = tmp_path / "config.json"
+    config.write_text(json.dumps({"mode": "stream", "setup": setup}))
+    out = tmp_path / "data"
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            os.path.join(root, "cli.py"),
+            str(config),
+            "--port",
+            "SIM:speed=1,timeout=0.05",
+            "--format",
+            save_format,
+            "--out",
+            str(out),
+            "--log-level",
+            "WARNING",
+        ],
+        cwd=tmp_path,
+    )
+    try:
+        deadline = time.monotonic() + 30
+        while not (out.exists() and journaled(out)):
+            assert process.poll() is None, "the measurement ended early"
+            assert time.monotonic() < deadline, "nothing was journaled"
+            time.sleep(0.05)
+        # Killed while writing the bursts after the journal entry
+        time.sleep(0.3)
+        process.send_signal(signal.SIGKILL)
+    finally:
+        process.kill()
+        process.wait()
+
+    n_journaled = journaled(out)
+    (run_file,) = [
+        name
+        for name in os.listdir(out)
+        if name.startswith("run_") and name.endswith(".json")
+    ]
+    info = recover_run(os.path.join(out, run_file))
+    assert info["n_samples"] >= n_journaled
+
+    run = load_run(os.path.join(out, run_file))
+    assert run.data.shape == (info["n_samples"], 16, 16)
+    assert run.timestamps.shape == (info["n_samples"], 16)
+    assert np.all(np.diff(run.timestamps[:, 0].astype(np.int64)) >= 0)
+    assert np.all(np.isfinite(run.data)) and np.any(run.data != 0)
+
+
+def test_recover_hdf5_without_h5py(tmp_path, monkeypatch):
+    import storage
+
+    run_file = tmp_path / "run_1.json"
+    storage.write_run_info(
+        str(run_file),
+        {
+            "version": storage.RUN_FORMAT_VERSION,
+            "run_id": "1",
+            "save_format": "hdf5",
+            "files": "run_1.h5",
+            "finished": None,
+            "n_samples": 0,
+            "setup": setup,
+        },
+    )
+    # An entry None in sys.modules makes the import fail.
+    monkeypatch.setitem(sys.modules, "h5py", None)
+    with pytest.raises(ImportError, match="requires the module h5py"):
+        recover_run(str(run_file))
@@ -0,0 +1,56 @@
+import os
+
+import pytest
+
+from acquisition import MeasurementWorker, connect_port, run_devices
+from storage import setup_from_dict
+from workingvariables import StoreConfig
+
+from test_configuration import setup
+
+
+@pytest.fixture
+def recorded_run(tmp_path) -> str:
+    serial = connect_port("SIM:speed=0,timeout=0.05")
+    ssms = setup_from_dict(setup(total_meas_num=4))
+    run_devices(
+        {"SIM": serial},
+        ssms,
+        StoreConfig(str(tmp_path) + "/", ".npz"),
+        subdirectories=False,
+    )
+    (run_file,) = [
+        name
+        for name in os.listdir(tmp_path)
+        if name.startswith("run_") and name.endswith(".json")
+    ]
+    return os.path.join(tmp_path, run_file)
+
+
+def test_replay_rejects_other_number_of_electrodes(tmp_path, recorded_run):
+    serial = connect_port(f"REPLAY:{recorded_run},speed=0")
+    try:
+        with pytest.raises(ValueError, match="recorded with 16 electrodes"):
+            MeasurementWorker(
+                serial,
+                setup_from_dict(setup(n_el=32)),
+                StoreConfig(str(tmp_path / "replay") + "/", ".npz"),
+                events=None,
+            )
+    finally:
+        serial.close()
+
+
+def test_replay_with_recorded_setup(tmp_path, recorded_run):
+    serial = connect_port(f"REPLAY:{recorded_run},speed=0,timeout=0.05")
+    out = tmp_path / "replay"
+    out.mkdir()
+    try:
+        result = run_devices(
+            {"REPLAY": serial},
+            setup_from_dict(setup(total_meas_num=4)),
+            StoreConfig(str(out) + "/", ".npz"),
+        )
+    finally:
+        serial.close()
+    assert result["devices"]["REPLAY"]["n_samples"] == 4
@@ -0,0 +1,75 @@
+import os
+
+import numpy as np
+import pytest
+
+from runreader import RunReader
+from storage import (
+    open_writer,
+    read_run_info,
+    save_formats,
+    setup_from_dict,
+    write_run_info,
+)
+from workingvariables import StoreConfig
+
+from test_configuration import setup
+from test_storage import random_bursts
+
+
+def write_run(tmp_path, save_format: str, n_bursts: int = 150) -> tuple:
+    ssms = setup_from_dict(setup())
+    bursts = random_bursts(ssms, n_bursts)
+    writer = open_writer(StoreConfig(str(tmp_path) + "/", save_format), ssms, "1")
+    for burst in bursts:
+        writer.write(burst)
+    writer.close()
+    return str(tmp_path / "run_1.json"), bursts
+
+
+@pytest.mark.parametrize("save_format", [".npz", "hdf5", "compressed"])
+def test_random_access(tmp_path, save_format):
+    if save_format == "hdf5":
+        pytest.importorskip("h5py")
+    run_file, bursts = write_run(tmp_path, save_format)
+    data = np.stack([burst.data for burst in bursts])
+    timestamps = np.stack([burst.timestamps for burst in bursts])
+    samples = np.random.default_rng(0).permutation(len(bursts))[:40]
+    channels = [0, 3, 15]
+    with RunReader(run_file) as reader:
+        assert len(reader) == 150
+        run = reader.select(samples, channels=channels)
+        np.testing.assert_array_equal(run.data, data[samples][..., channels])
+        np.testing.assert_array_equal(run.timestamps, timestamps[samples])
+        run = reader.frames(60, 70)
+        np.testing.assert_array_equal(run.data, data[60:70])
+        # The first stage of sample i is measured at 16 * i ms.
+        run = reader.time_window(0.016 * 10, 0.016 * 20)
+        np.testing.assert_array_equal(run.timestamps, timestamps[10:20])
+
+
+def test_least_recently_used_chunks_are_evicted(tmp_path):
+    run_file, _ = write_run(tmp_path, "compressed")
+    with RunReader(run_file, cache_size=2) as reader:
+        assert reader.chunk_size == 64
+        reader.frames(0, 10)
+        reader.frames(70, 72)
+        reader.frames(1, 2)
+        assert list(reader.cache) == [1, 0]
+        # Chunk 1 is the least recently used one.
+        reader.frames(130, 131)
+        assert list(reader.cache) == [0, 2]
+        reader.frames(5, 6)
+        reader.frames(70, 71)
+        assert (reader.n_hits, reader.n_misses) == (2, 4)
+
+
+def test_run_without_index_is_indexed_on_first_access(tmp_path):
+    run_file, bursts = write_run(tmp_path, ".npz", 20)
+    info = read_run_info(run_file)
+    os.remove(tmp_path / info.pop("frame_index"))
+    write_run_info(run_file, info)
+    with RunReader(run_file) as reader:
+        run = reader.frames(3, 5)
+    np.testing.assert_array_equal(run.data, np.stack([b.data for b in bursts[3:5]]))
+    assert "frame_index" in read_run_info(run_file)
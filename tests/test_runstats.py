@@ -0,0 +1,75 @@
+import os
+
+import numpy as np
+import pytest
+
+from acquisition import connect_port, run_devices
+from runstats import OnlineStats, RunningStats
+from storage import load_run, load_run_stats, setup_from_dict
+from workingvariables import StoreConfig
+
+from test_configuration import setup
+
+
+def complex_samples(n: int, shape: tuple, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return (
+        3 + rng.standard_normal((n, *shape)) + 1j * rng.standard_normal((n, *shape))
+    ).astype(np.complex64)
+
+
+@pytest.mark.parametrize("batches", [[1] * 50, [7, 1, 30, 12], [50]])
+def test_running_stats_match_numpy(batches):
+    samples = complex_samples(sum(batches), (4, 5))
+    stats = RunningStats((4, 5))
+    start = 0
+    for n in batches:
+        if n == 1:
+            stats.update(samples[start])
+        else:
+            stats.update(samples[start : start + n])
+        start += n
+
+    assert stats.count == len(samples)
+    np.testing.assert_allclose(stats.mean, samples.mean(axis=0, dtype=np.complex128))
+    expected = samples.real.var(axis=0, ddof=1) + samples.imag.var(axis=0, ddof=1)
+    np.testing.assert_allclose(stats.variance, expected, rtol=1e-5)
+    np.testing.assert_allclose(stats.min_abs, np.abs(samples).min(axis=0))
+    np.testing.assert_allclose(stats.max_abs, np.abs(samples).max(axis=0))
+
+
+def test_online_stats_subtract_the_reference_of_every_step():
+    samples = complex_samples(20, (2, 3))
+    online = OnlineStats((2, 3), reference_bursts=4)
+    differences = [online.update(sample) for sample in samples[:10]]
+    assert differences[:4] == [None] * 4
+    reference = samples[:4].mean(axis=0, dtype=np.complex128)
+    np.testing.assert_allclose(differences[4], samples[4] - reference, rtol=1e-5)
+
+    online.next_step()
+    assert online.update(samples[10]) is None
+    arrays = online.arrays()
+    np.testing.assert_array_equal(arrays["count"], [10, 1])
+    np.testing.assert_array_equal(arrays["reference_count"], [4, 1])
+    np.testing.assert_allclose(arrays["reference"][0], reference)
+
+
+def test_statistics_of_a_measured_run(tmp_path):
+    serial = connect_port("SIM:speed=0,noise=0.01,timeout=0.05")
+    ssms = setup_from_dict(setup(total_meas_num=20))
+    config = StoreConfig(
+        str(tmp_path) + "/", ".npz", online_stats=True, reference_bursts=5
+    )
+    run_devices({"SIM": serial}, ssms, config, subdirectories=False)
+
+    (run_file,) = [name for name in os.listdir(tmp_path) if name.endswith(".json")]
+    run = load_run(os.path.join(tmp_path, run_file))
+    stats = load_run_stats(os.path.join(tmp_path, run_file))
+    np.testing.assert_allclose(
+        stats["mean"][0], run.data.mean(axis=0, dtype=np.complex128), rtol=1e-5
+    )
+    np.testing.assert_allclose(
+        stats["reference"][0],
+        run.data[:5].mean(axis=0, dtype=np.complex128),
+        rtol=1e-5,
+    )
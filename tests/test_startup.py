@@ -0,0 +1,36 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+heavy_modules = ["sciopy", "h5py", "zstandard", "lz4", "blosc", "pyeit"]
+
+
+def test_heavy_modules_are_imported_on_first_use():
+    code = (
+        "import sys\n"
+        "import acquisition, cli, compression, runreader, storage\n"
+        "compression.available_codecs()\n"
+        f"print([name for name in {heavy_modules!r} if name in sys.modules])\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=root,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert result.stdout.strip() == "[]"
+
+
+def test_missing_pyeit_names_the_optional_requirements(tmp_path, monkeypatch):
+    from reconstruction import load_matrix
+    from workingvariables import ReconstructionConfig
+
+    for name in ["pyeit", *[name for name in sys.modules if name.startswith("pyeit.")]]:
+        monkeypatch.setitem(sys.modules, name, None)
+    with pytest.raises(ImportError, match="requirements-optional.txt"):
+        load_matrix(16, 0, ReconstructionConfig(cache_dir=str(tmp_path)))
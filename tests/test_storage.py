@@ -0,0 +1,221 @@
+import importlib.util
+
+import numpy as np
+import pytest
+
+from frameparser import ACK, MSG_LEN, Burst, FrameParser
+from replay import encode_bursts
+from runreader import RunReader
+from simdevice import frame_dtype
+from storage import (
+    HDF5Writer,
+    NpzWriter,
+    RawCapture,
+    load_run,
+    open_writer,
+    read_run_info,
+    save_formats,
+    setup_from_dict,
+)
+from workingvariables import StoreConfig
+
+from test_configuration import setup
+
+
+def device_stream(ssms, n_bursts: int) -> bytes:
+    """
+    Frames like the device sends them, every channel group of a stage has its
+    own timestamp.
+    """
+    rng = np.random.default_rng(0)
+    n_cg = len(ssms.channel_group)
+    shape = (n_bursts, ssms.n_el, 16 * n_cg)
+    data = (rng.standard_normal(shape) + 1j * rng.standard_normal(shape)).astype(
+        np.complex64
+    )
+    timestamps = np.arange(n_bursts * ssms.n_el, dtype=np.uint32).reshape(
+        n_bursts, ssms.n_el
+    )
+    # The parser takes the stage from the injecting electrode.
+    injections = np.arange(1, ssms.n_el + 1)
+    excitation_stgs = np.stack([injections, injections % ssms.n_el + 1], axis=1)
+    excitation_stgs = np.broadcast_to(excitation_stgs, (n_bursts, ssms.n_el, 2))
+    stream = encode_bursts(
+        data, 10 * timestamps, excitation_stgs.astype(np.uint8), ssms.channel_group
+    )
+    frames = np.frombuffer(stream, dtype=frame_dtype).copy()
+    frames = frames.reshape(n_bursts, ssms.n_el, n_cg)
+    frames["ts"] += np.arange(n_cg, dtype=np.uint32)
+    return frames.tobytes()
+
+
+@pytest.mark.parametrize("save_format", save_formats)
+def test_every_format_reads_back_the_parsed_bursts(tmp_path, save_format):
+    if save_format == "hdf5" and importlib.util.find_spec("h5py") is None:
+        pytest.skip("needs h5py")
+    ssms = setup_from_dict(setup(n_el=32, total_meas_num=70))
+    stream = device_stream(ssms, 70)
+    parser = FrameParser(ssms.n_el, ssms.channel_group, record_offsets=True)
+    bursts = parser.feed(stream)
+    assert len(bursts) == 70
+
+    writer = open_writer(StoreConfig(str(tmp_path) + "/", save_format), ssms, "1")
+    if save_format == "raw":
+        writer.write_raw(stream, parser.frame_offsets)
+    for burst in bursts:
+        writer.write(burst)
+    writer.close()
+
+    data = np.stack([burst.data for burst in bursts])
+    timestamps = np.stack([burst.timestamps for burst in bursts])
+    excitation_stgs = np.stack([burst.excitation_stgs for burst in bursts])
+    # The timestamp of a stage is the one of its last channel group.
+    np.testing.assert_array_equal(timestamps[0, :2], [1, 11])
+
+    run_file = str(tmp_path / "run_1.json")
+    run = load_run(run_file)
+    np.testing.assert_array_equal(run.data, data)
+    np.testing.assert_array_equal(run.timestamps, timestamps)
+    np.testing.assert_array_equal(run.excitation_stgs, excitation_stgs)
+    with RunReader(run_file) as reader:
+        part = reader.frames(5, 67)
+    np.testing.assert_array_equal(part.data, data[5:67])
+    np.testing.assert_array_equal(part.timestamps, timestamps[5:67])
+    np.testing.assert_array_equal(part.excitation_stgs, excitation_stgs[5:67])
+
+
+def test_raw_capture_cannot_drop_bursts(tmp_path):
+    ssms = setup_from_dict(setup())
+    config = StoreConfig(str(tmp_path) + "/", "raw", queue_policy="drop")
+    with pytest.raises(ValueError, match="queue policy"):
+        open_writer(config, ssms, "1")
+
+
+def random_bursts(ssms, n_bursts: int) -> list:
+    rng = np.random.default_rng(1)
+    shape = (ssms.n_el, 16 * len(ssms.channel_group))
+    return [
+        Burst(
+            (rng.standard_normal(shape) + 1j * rng.standard_normal(shape)).astype(
+                np.complex64
+            ),
+            np.arange(i * ssms.n_el, (i + 1) * ssms.n_el, dtype=np.uint32),
+            rng.integers(1, ssms.n_el + 1, (ssms.n_el, 2)).astype(np.uint8),
+        )
+        for i in range(n_bursts)
+    ]
+
+
+def test_hdf5_writes_whole_chunks(tmp_path):
+    h5py = pytest.importorskip("h5py")
+    ssms = setup_from_dict(setup())
+    bursts = random_bursts(ssms, 21)
+    writer = HDF5Writer(str(tmp_path) + "/", ssms, "1", chunk_size=8)
+    for burst in bursts[:17]:
+        writer.write(burst)
+    # Two complete chunks are written, the third one is buffered.
+    assert writer.datasets["data"].shape == (16, 16, 16)
+    assert writer.datasets["data"].chunks == (8, 16, 16)
+    for burst in bursts[17:]:
+        writer.write(burst)
+    writer.close()
+
+    with h5py.File(tmp_path / "run_1.h5", "r") as file:
+        assert file.attrs["run_id"] == "1"
+        assert file.attrs["n_el"] == 16
+        np.testing.assert_array_equal(
+            file["data"][:], np.stack([burst.data for burst in bursts])
+        )
+    run = load_run(str(tmp_path / "run_1.json"))
+    assert run.info["n_samples"] == 21
+    np.testing.assert_array_equal(
+        run.excitation_stgs, np.stack([burst.excitation_stgs for burst in bursts])
+    )
+
+
+def test_unknown_save_format(tmp_path):
+    ssms = setup_from_dict(setup())
+    with pytest.raises(ValueError, match="Unknown save format"):
+        open_writer(StoreConfig(str(tmp_path) + "/", ".mat"), ssms, "1")
+
+
+def test_npz_samples_hold_no_pickles(tmp_path):
+    ssms = setup_from_dict(setup(exc_freq=12345.0, notes="tank"))
+    bursts = random_bursts(ssms, 3)
+    writer = NpzWriter(str(tmp_path) + "/", ssms, "1")
+    for burst in bursts:
+        writer.write(burst)
+    writer.close()
+
+    for i, burst in enumerate(bursts):
+        with np.load(tmp_path / f"sample_{i:06d}.npz", allow_pickle=False) as sample:
+            assert set(sample.files) == {
+                "run_id",
+                "frame_idx",
+                "data",
+                "timestamps",
+                "excitation_stgs",
+            }
+            assert str(sample["run_id"]) == "1"
+            assert int(sample["frame_idx"]) == i
+            np.testing.assert_array_equal(sample["data"], burst.data)
+
+    # The setup is stored once, in the run description.
+    info = read_run_info(str(tmp_path / "run_1.json"))
+    assert info["n_samples"] == 3
+    assert setup_from_dict(info["setup"]) == ssms
+
+
+def test_setup_from_dict_rejects_unknown_fields():
+    with pytest.raises(ValueError, match="Unknown setup fields: frequency"):
+        setup_from_dict(setup(frequency=1000))
+    incomplete = setup()
+    del incomplete["gain"]
+    with pytest.raises(ValueError, match="Missing setup fields: gain"):
+        setup_from_dict(incomplete)
+
+
+def write_raw_capture(tmp_path, ssms, stream: bytes) -> list:
+    parser = FrameParser(ssms.n_el, ssms.channel_group, record_offsets=True)
+    writer = open_writer(StoreConfig(str(tmp_path) + "/", "raw"), ssms, "1")
+    # Chunks like read from the serial connection
+    bursts = []
+    for i in range(0, len(stream), 1000):
+        new = parser.feed(stream[i : i + 1000])
+        writer.write_raw(stream[i : i + 1000], parser.frame_offsets)
+        parser.frame_offsets = []
+        for burst in new:
+            writer.write(burst)
+        bursts += new
+    writer.close()
+    return bursts
+
+
+def test_raw_capture_maps_the_stream(tmp_path):
+    ssms = setup_from_dict(setup(n_el=32))
+    bursts = write_raw_capture(tmp_path, ssms, device_stream(ssms, 10))
+    capture = RawCapture(str(tmp_path / "run_1.json"))
+    assert len(capture) == 10
+    values = capture.bursts(2, 6)
+    # A view into the mapped file, nothing is copied.
+    assert np.shares_memory(values, capture.raw)
+    np.testing.assert_array_equal(
+        values.reshape(4, 32, 32), np.stack([burst.data for burst in bursts[2:6]])
+    )
+    np.testing.assert_array_equal(
+        capture.timestamps(), np.stack([burst.timestamps for burst in bursts])
+    )
+
+
+def test_raw_capture_gathers_irregular_frames(tmp_path):
+    ssms = setup_from_dict(setup())
+    frames = device_stream(ssms, 4)
+    # An acknowledge between two bursts breaks the regular frame distance.
+    stream = frames[: 2 * 16 * MSG_LEN] + ACK + frames[2 * 16 * MSG_LEN :]
+    bursts = write_raw_capture(tmp_path, ssms, stream)
+    capture = RawCapture(str(tmp_path / "run_1.json"))
+    values = capture.bursts()
+    assert not np.shares_memory(values, capture.raw)
+    np.testing.assert_array_equal(
+        values.reshape(4, 16, 16), np.stack([burst.data for burst in bursts])
+    )
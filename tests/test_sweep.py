@@ -0,0 +1,57 @@
+import os
+
+import numpy as np
+import pytest
+
+from acquisition import connect_port, run_devices
+from deviceconfig import config_commands, sweep_steps
+from storage import load_run, read_run_info, sample_steps, setup_from_dict
+from workingvariables import StoreConfig
+
+from test_configuration import setup
+
+
+def test_sweep_steps_vary_reset_fields_slowest():
+    base = setup_from_dict(setup(gain=10))
+    steps = sweep_steps(base, exc_freq=[100, 1000, 10000], inj_skip=[0, 1])
+    assert [(step.inj_skip, step.exc_freq) for step in steps] == [
+        (0, 100),
+        (0, 1000),
+        (0, 10000),
+        (1, 100),
+        (1, 1000),
+        (1, 10000),
+    ]
+    assert all(step.gain == 10 and step.n_el == 16 for step in steps)
+    # The base setup is not changed.
+    assert base.exc_freq == 10000 and base.inj_skip == 0
+
+
+def test_sweep_steps_rejects_the_number_of_electrodes():
+    with pytest.raises(ValueError, match="can not be swept: n_el"):
+        sweep_steps(setup_from_dict(setup()), n_el=[16, 32])
+
+
+def test_sweep_measures_every_step(tmp_path):
+    serial = connect_port("SIM:speed=0,timeout=0.05")
+    ssms = setup_from_dict(setup(total_meas_num=3))
+    steps = sweep_steps(ssms, exc_freq=[1000, 2000], inj_skip=[0, 1])
+    result = run_devices(
+        {"SIM": serial},
+        ssms,
+        StoreConfig(str(tmp_path) + "/", ".npz"),
+        steps=steps,
+        subdirectories=False,
+    )
+    assert result["devices"]["SIM"]["n_samples"] == 12
+    assert serial.exc_freq == 2000
+
+    (run_file,) = [name for name in os.listdir(tmp_path) if name.endswith(".json")]
+    info = read_run_info(os.path.join(tmp_path, run_file))
+    assert [step["first_sample"] for step in info["sweep"]] == [0, 3, 6, 9]
+    # Only the frequency changes between the steps of an injection skip.
+    n_commands = [step["n_commands"] for step in info["sweep"]]
+    assert n_commands == [1, 1, len(config_commands(steps[2])), 1]
+    np.testing.assert_array_equal(sample_steps(info), np.repeat(np.arange(4), 3))
+    run = load_run(os.path.join(tmp_path, run_file))
+    assert len(run.data) == 12
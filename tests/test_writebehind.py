@@ -0,0 +1,86 @@
+import threading
+import time
+
+import numpy as np
+
+from frameparser import Burst
+from storage import WriteBehind
+
+
+class FailingWriter:
+    """
+    Writer that fails on the `fail_at`-th burst. The first write waits for
+    `gate`, so the following bursts and the close request end up in one batch.
+    """
+
+    def __init__(self, fail_at: int) -> None:
+        self.fail_at = fail_at
+        self.n_samples = 0
+        self.closed = False
+        self.gate = threading.Event()
+
+    def write(self, burst: Burst) -> None:
+        self.gate.wait(5)
+        if self.n_samples + 1 == self.fail_at:
+            raise OSError("No space left on device")
+        self.n_samples += 1
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+
+def burst() -> Burst:
+    return Burst(
+        np.zeros((16, 16), dtype=np.complex64),
+        np.zeros(16, dtype=np.uint32),
+        np.zeros((16, 2), dtype=np.uint8),
+    )
+
+
+def close_within(write_behind: WriteBehind, timeout: float) -> list:
+    """
+    Close on a separate thread, a deadlock fails the test instead of hanging it.
+    """
+    errors = []
+
+    def close():
+        try:
+            write_behind.close()
+        except BaseException as err:
+            errors.append(err)
+
+    closer = threading.Thread(target=close, daemon=True)
+    closer.start()
+    closer.join(timeout)
+    assert not closer.is_alive(), "close() did not return"
+    return errors
+
+
+def test_close_after_failed_write_in_last_batch():
+    writer = FailingWriter(fail_at=9)
+    write_behind = WriteBehind(writer, batch_size=64)
+    write_behind.write(burst())
+    # The first burst is taken alone, the writer waits for the gate.
+    while write_behind.depth:
+        time.sleep(0.001)
+    for _ in range(19):
+        write_behind.write(burst())
+    # The close request is queued in the same batch as the failing burst.
+    threading.Timer(0.2, writer.gate.set).start()
+    errors = close_within(write_behind, timeout=5)
+    assert len(errors) == 1 and isinstance(errors[0], OSError)
+    assert writer.closed
+    assert writer.n_samples == 8
+
+
+def test_close_reraises_write_error():
+    writer = FailingWriter(fail_at=1)
+    write_behind = WriteBehind(writer)
+    writer.gate.set()
+    write_behind.write(burst())
+    errors = close_within(write_behind, timeout=5)
+    assert len(errors) == 1 and isinstance(errors[0], OSError)
+    assert writer.closed
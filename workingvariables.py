@@ -5,12 +5,60 @@ from dataclasses import dataclass
 class StoreConfig:
     s_path: str
     save_format: str
+    queue_size: int = 256
+    queue_policy: str = "block"
+    online_stats: bool = False
+    reference_bursts: int = 0
+    codec: str = "zlib"
+    compression_level: int = None
+    shuffle: bool = True
+    reconstruct: bool = False
+
+
+@dataclass
+class ReconstructionConfig:
+    cache_dir: str = "cache/"
+    batch_size: int = 32
+    n_workers: int = 2
+    h0: float = 0.1
+    p: float = 0.5
+    lamb: float = 0.01
+    method: str = "kotre"
+    normalize: bool = True
+
+
+@dataclass
+class MetricsConfig:
+    log_file: str = None
+    interval: float = 1.0
+    max_bytes: int = 2**20
+    backup_count: int = 3
+    prometheus_port: int = None
+
+
+@dataclass
+class FrameBusConfig:
+    port: int = None
+    # None names the shared memory after the process and the port
+    name: str = None
+    n_slots: int = 256
+
+
+@dataclass
+class LogConfig:
+    level: str = "INFO"
+    log_file: str = None
+    max_bytes: int = 2**20
+    backup_count: int = 3
+    max_lines: int = 1000
 
 
 @dataclass
 class ScioSpecDeviceInfo:
     com_port: str
     connection_established: bool
+    # Setup last written to the device, None if unknown
+    configured_setup: object = None
 
 
 @dataclass